@@ -1,13 +1,21 @@
 # api/cosmetic.py
 
 from fastapi import APIRouter, HTTPException, Query
-from typing import List
+from typing import List, Optional
 from db.database import get_db
-from schemas.cosmetics import ProductRecommendation, ReasonRequest
+from schemas.cosmetics import (
+    ProductRecommendation,
+    ReasonBatchRequest,
+    ReasonRequest,
+)
 from services.cosmetic_recommend import get_gpt_response, recommend_cosmetics
+from services.recommendation_reason import reason_generator
 import traceback
 from schemas.cosmetics import CosmeticSearchResult
 from services.cosmetic_services import search_by_id, search_cosmetics
+from services.product_catalog import catalog_refresher
+from services.recommendation_materialize import recommendation_materializer
+from services.user import get_user_by_id
 
 router = APIRouter(
     prefix="/cosmetics",
@@ -28,6 +36,17 @@ async def search_cosmetics_by_name(
     return await search_cosmetics(db, q, limit)
 
 
+@router.get("/catalog/stats")
+async def get_catalog_stats():
+    """
+    추천용 제품 카탈로그의 상태(갱신 방식, 버전, 제품/성분 수)를 조회합니다.
+    """
+    return {
+        **catalog_refresher.stats(),
+        "materialized": recommendation_materializer.stats(),
+    }
+
+
 @router.get("/{product_id}", response_model=CosmeticSearchResult)
 async def search_cosmetic_by_id(product_id: str):
     """
@@ -43,10 +62,20 @@ async def get_recommendations(
     cosmetic_types: str,
     allergic_ingredients: List[str],
     budget: int,
+    user_id: Optional[str] = None,
+    top_k: int = Query(3, gt=0, le=100),
 ):
     """
     사용자 피부 타입, 고민, 선호 화장품 종류, 알레르기 성분, 예산을 입력받아 화장품을 추천합니다.
+    user_id 를 주면 사용자에게 저장된 비선호 성분(avoid_ingredients)도 함께 제외합니다.
+    top_k 로 반환할 추천 개수를 정합니다. (기본 3개)
     """
+    if user_id is not None:
+        user = await get_user_by_id(user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        allergic_ingredients = allergic_ingredients + (user.avoid_ingredients or [])
+
     try:
         recommendations = await recommend_cosmetics(
             user_skin_type=user_skin_type,
@@ -54,6 +83,7 @@ async def get_recommendations(
             cosmetic_types=cosmetic_types,
             allergic_ingredients=allergic_ingredients,
             budget=budget,
+            top_k=top_k,
         )
 
         if not recommendations:
@@ -83,4 +113,16 @@ async def get_recommendation_reason(request: ReasonRequest):
         request.matching_ingredients,
         request.user_skin_type,
         request.user_concerns,
+        product_id=request.product_id,
+    )
+
+
+@router.post("/recommendation/reasons", response_model=List[ProductRecommendation])
+async def get_recommendation_reasons(request: ReasonBatchRequest):
+    """
+    추천 결과 목록의 추천 이유를 한 번에 생성해 채워서 반환합니다.
+    제품별 요청은 동시에 처리되며, 같은 조건으로 생성한 이유는 캐시에서 재사용합니다.
+    """
+    return await reason_generator.fill_reasons(
+        request.recommendations, request.user_skin_type, request.user_concerns
     )
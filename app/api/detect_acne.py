@@ -1,17 +1,54 @@
 # api/detect_acne.py
 
+import json
 import traceback
+import uuid
+from contextlib import AsyncExitStack
+from typing import List, Optional
 from fastapi import APIRouter, Form, UploadFile, File, HTTPException
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
-from services.detect_acne import detect_acne
-from PIL import Image
-import io
-import base64
+from core.config import settings
+from services.acne_batch import acne_batch_pool, detect_acne_batch
+from services.detect_acne import (
+    IMAGE_MEDIA_TYPES,
+    AcneOutputOptions,
+    acne_detector,
+    detect_acne_upload,
+    to_json_result,
+)
+from services.upload import read_upload
+from services.worker_pool import PoolSaturatedError, worker_pool
 
 
 class AcneDetectionResponse(BaseModel):
-    processed_image: str  # Base64로 인코딩된 이미지 문자열
+    processed_image: Optional[str] = None  # Base64로 인코딩된 이미지 문자열
     score: int  # 여드름 감지 점수
+    polygons: Optional[List[List[List[int]]]] = (
+        None  # output=polygons 일 때 윤곽선 좌표
+    )
+
+
+def multipart_response(result: dict, options: AcneOutputOptions) -> Response:
+    """
+    Base64 없이 JSON 파트(score, polygons)와 이미지 바이너리 파트로 나눈 multipart/mixed 응답을 만듭니다.
+    """
+    boundary = uuid.uuid4().hex
+    metadata = {key: value for key, value in result.items() if key != "image"}
+    parts = [
+        b"Content-Type: application/json\r\n\r\n"
+        + json.dumps(metadata, ensure_ascii=False).encode("utf-8")
+    ]
+    if "image" in result:
+        parts.append(
+            f"Content-Type: {IMAGE_MEDIA_TYPES[options.format]}\r\n"
+            f'Content-Disposition: attachment; filename="acne.{options.format}"\r\n\r\n'.encode()
+            + result["image"]
+        )
+    delimiter = f"--{boundary}\r\n".encode()
+    body = b"".join(delimiter + part + b"\r\n" for part in parts)
+    body += f"--{boundary}--\r\n".encode()
+    return Response(content=body, media_type=f"multipart/mixed; boundary={boundary}")
 
 
 router = APIRouter(
@@ -21,26 +58,123 @@ router = APIRouter(
 )
 
 
-@router.post("/", response_model=AcneDetectionResponse)
-async def detect_acne_endpoint(bbox: str = Form(...), file: UploadFile = File(...)):
+@router.post(
+    "/", response_model=AcneDetectionResponse, response_model_exclude_none=True
+)
+async def detect_acne_endpoint(
+    bbox: str = Form(...),
+    file: UploadFile = File(...),
+    output: str = Form("jpeg"),
+    quality: int = Form(75),
+    max_side: int = Form(0),
+    response_format: str = Form("json"),
+):
     """
     여드름 감지를 수행하는 엔드포인트입니다.
+
+    - output: jpeg(기본) / webp / png / polygons (이미지 없이 윤곽선 좌표만)
+    - quality: jpeg, webp 품질, max_side: 미리보기 이미지의 최대 변 길이 (0 이면 원본 크기)
+    - response_format: json(Base64 이미지) 또는 multipart(이미지 바이너리)
     """
     try:
+        if response_format not in ("json", "multipart"):
+            raise ValueError(f"Unknown response format: {response_format}")
+        options = AcneOutputOptions(format=output, quality=quality, max_side=max_side)
+
         # 업로드된 파일 읽기
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents)).convert("RGB")
+        contents = await read_upload(file)
 
         bbox_list = [int(x.strip()) for x in bbox.split(",")]
-        # 여드름 감지 함수 호출
-        result_image, score = detect_acne(image, bbox_list)
-
-        # 처리된 이미지를 Base64로 인코딩
-        buffered = io.BytesIO()
-        result_image.save(buffered, format="JPEG")
-        img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
+        # 여드름 감지 함수 호출 (워커 풀에서 실행)
+        result = await detect_acne_upload(contents, bbox_list, options)
 
-        return AcneDetectionResponse(processed_image=img_str, score=score)
+        if response_format == "multipart":
+            return multipart_response(result, options)
+        return AcneDetectionResponse(**to_json_result(result))
+    except HTTPException:
+        raise
+    except PoolSaturatedError as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": "1"}
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail="내부 서버 오류가 발생했습니다.")
+
+
+@router.post("/batch")
+async def detect_acne_batch_endpoint(
+    bboxes: str = Form(...),
+    files: List[UploadFile] = File(...),
+    include_image: bool = Form(True),
+    output: str = Form("jpeg"),
+    quality: int = Form(75),
+    max_side: int = Form(0),
+):
+    """
+    여러 장의 사진을 한 번에 여드름 감지합니다. 결과는 끝나는 순서대로 NDJSON 으로 스트리밍됩니다.
+
+    bboxes 는 files 와 같은 순서의 JSON 배열입니다. 예시: [[x1, y1, x2, y2], "x1,y1,x2,y2"]
+    output, quality, max_side 는 단건 엔드포인트와 같습니다.
+    각 줄은 {"index", "score", "processed_image" 또는 "polygons"} 또는 {"index", "error"} 이고,
+    마지막 줄은 워커별 처리량을 담은 {"summary": ...} 입니다.
+    """
+    stack = AsyncExitStack()
+    try:
+        options = AcneOutputOptions(format=output, quality=quality, max_side=max_side)
+        bbox_items = json.loads(bboxes)
+        if not isinstance(bbox_items, list) or len(bbox_items) != len(files):
+            raise ValueError("bboxes must be a JSON array with one bbox per file")
+        if len(files) > settings.acne_batch_max_items:
+            raise ValueError(
+                f"Too many files in one batch (limit {settings.acne_batch_max_items})"
+            )
+        bbox_lists = [
+            (
+                [int(x.strip()) for x in bbox.split(",")]
+                if isinstance(bbox, str)
+                else [int(x) for x in bbox]
+            )
+            for bbox in bbox_items
+        ]
+        # 배치 요청 동시 처리 수 제한 (스트리밍이 끝날 때 슬롯 반환)
+        await stack.enter_async_context(worker_pool.admit("acne_detection_batch"))
+        # 파일은 detect_acne_batch 가 풀에 넘기기 직전에 하나씩 읽음
+        items = list(zip(files, bbox_lists))
+    except HTTPException:
+        await stack.aclose()
+        raise
+    except PoolSaturatedError as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": "1"}
+        )
+    except ValueError as e:
+        await stack.aclose()
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        await stack.aclose()
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail="내부 서버 오류가 발생했습니다.")
+
+    async def stream():
+        async with stack:
+            async for result in detect_acne_batch(items, options):
+                if not include_image:
+                    result.pop("processed_image", None)
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@router.get("/metrics")
+async def get_acne_detection_metrics():
+    """이 프로세스에서 실행된 여드름 감지의 단계별 누적/평균 소요 시간(ms)을 반환합니다."""
+    return acne_detector.stats()
+
+
+@router.get("/batch/stats")
+async def get_acne_batch_stats():
+    """배치 프로세스 풀의 워커별 누적 처리 건수와 처리량을 반환합니다."""
+    return acne_batch_pool.stats()
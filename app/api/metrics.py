@@ -0,0 +1,27 @@
+# api/metrics.py
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from core.error_logging import error_logging_stats
+from core.metrics import registry
+
+router = APIRouter(tags=["Metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    라우트별 지연 시간, 내부 처리 단계, MongoDB 명령 지연 시간을 Prometheus 텍스트 형식으로 반환합니다.
+    """
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@router.get("/metrics/error-logging")
+async def get_error_logging_metrics():
+    """
+    에러 로그 큐에 쌓인 레코드 수, 큐가 가득 차 버린 레코드 수, 샘플링 중인 에러 종류 수를 조회합니다.
+    """
+    return error_logging_stats()
@@ -1,9 +1,15 @@
 # api/predict.py
 
+import json
 import traceback
 from fastapi import APIRouter, UploadFile, File, HTTPException, Form
-from services.predict_resnet import predict_image
-from schemas.prediction import PredictionResponse
+from services.inference_backend import backend_stats
+from services.inference_scheduler import inference_scheduler
+from services.model_loader import load_stats
+from services.result_cache import cache_stats
+from services.predict_resnet import predict_face, predict_image
+from services.worker_pool import PoolSaturatedError, worker_pool
+from schemas.prediction import FacePredictionResponse, PredictionResponse
 
 router = APIRouter(
     prefix="/predict",
@@ -12,12 +18,65 @@ router = APIRouter(
 )
 
 
+def parse_bbox(bbox) -> list:
+    if isinstance(bbox, str):
+        return [int(x.strip()) for x in bbox.split(",")]
+    return [int(x) for x in bbox]
+
+
+@router.get("/metrics")
+async def get_inference_metrics():
+    """
+    추론 배칭 스케줄러의 큐 길이, 배치 크기 분포, 대기 시간 지표와 워커 풀, 모델 로딩, backend, 결과 캐시 상태를 반환합니다.
+    """
+    return {
+        **inference_scheduler.stats(),
+        "worker_pool": worker_pool.stats(),
+        "model_loading": load_stats(),
+        "backend": backend_stats(),
+        "result_cache": cache_stats(),
+    }
+
+
+@router.post("/face", response_model=FacePredictionResponse)
+async def predict_whole_face(bboxes: str = Form(...), file: UploadFile = File(...)):
+    """
+    얼굴 사진 한 장과 부위별 bbox로 모든 부위를 한 번에 예측합니다.
+
+    bboxes 예시: {"forehead": [x1, y1, x2, y2], "l_cheek": "x1,y1,x2,y2"}
+    """
+    try:
+        bbox_map = json.loads(bboxes)
+        if not isinstance(bbox_map, dict):
+            raise ValueError("bboxes must be a JSON object")
+        bbox_lists = {area: parse_bbox(bbox) for area, bbox in bbox_map.items()}
+        return await predict_face(file, bbox_lists)
+    except HTTPException:
+        raise
+    except PoolSaturatedError as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": "1"}
+        )
+    except ValueError as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
 @router.post("/{area_name}", response_model=PredictionResponse)
 async def predict(area_name: str, bbox: str = Form(...), file: UploadFile = File(...)):
     try:
-        bbox_list = [int(x.strip()) for x in bbox.split(",")]
+        bbox_list = parse_bbox(bbox)
         result = await predict_image(area_name, file, bbox_list)
         return result
+    except HTTPException:
+        raise
+    except PoolSaturatedError as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": "1"}
+        )
     except ValueError as e:
         traceback.print_exc()
         raise HTTPException(status_code=400, detail=str(e))
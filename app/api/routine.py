@@ -6,6 +6,7 @@ from services.routine import (
     get_routine_records,
     save_routine_record,
 )
+from services.routine_cache import routine_cache
 from services.routine_generate import get_routine
 from fastapi import APIRouter, HTTPException, status
 from schemas.routine import (
@@ -63,6 +64,14 @@ async def generate_routine(request: RoutineCreateRequest):
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
+@router.get("/cache/stats")
+async def get_routine_cache_stats():
+    """
+    루틴 생성 캐시의 크기, 적중률, 무효화 횟수를 조회합니다.
+    """
+    return routine_cache.stats()
+
+
 @router.get("/{routine_id}", response_model=Routine)
 async def get_by_id(routine_id: str):
     routine = await get_routine_by_id(routine_id)
@@ -0,0 +1,120 @@
+# benchmarks/routine_solver.py
+"""
+루틴 생성 비용 최적화 비교: 분기 한정법(exact_optimization_step), 담금질(cost_optimization_step),
+병렬 템퍼링(population_optimization_step)
+
+    cd app && python -m benchmarks.routine_solver [--mongo] [--seed 0] [--time-budget-ms 30]
+
+--mongo 를 주면 MongoDB 의 실제 가격 구간을, 아니면 seed 로 만든 가격 구간을 씁니다.
+"""
+
+import argparse
+import asyncio
+import math
+import random
+import statistics
+import time
+
+from data.products_data import PRODUCTS_DATA
+from services import routine_generate
+from services.routine_generate import (
+    PRIORITY_STEPS,
+    cost_optimization_step,
+    evaluate_solution,
+    exact_optimization_step,
+    generate_minimal_solution,
+    init_price_segments,
+    population_optimization_step,
+    routine_optimization_step,
+)
+
+TIME_MINUTES = [3, 5, 8, 10, 15, 20, 30]
+MONEY_WON = [5000, 20000, 50000, 100000, 200000]
+OWNED_SETS = [[], ["클렌징폼", "토너"], ["선크림", "크림", "세럼", "클렌징오일"]]
+
+
+def synthetic_price_segments(seed: int) -> dict:
+    rng = random.Random(seed)
+    segments = {}
+    for step_products in PRODUCTS_DATA.values():
+        for product_data in step_products.values():
+            low = round(rng.uniform(2000, 20000), -2)
+            mid = round(low * rng.uniform(1.3, 2.5), -2)
+            high = round(mid * rng.uniform(1.3, 2.5), -2)
+            segments[product_data["name"]] = {"low": low, "mid": mid, "high": high}
+    return segments
+
+
+def run(seed: int, time_budget_ms: float):
+    steps = PRIORITY_STEPS
+    priority_weights = {step: i + 1 for i, (step, _) in enumerate(steps)}
+
+    def anneal(*args):
+        random.seed(seed)
+        return cost_optimization_step(*args)
+
+    def population(*args):
+        return population_optimization_step(
+            *args, time_budget=time_budget_ms / 1000, seed=seed
+        )
+
+    solvers = {
+        "exact": exact_optimization_step,
+        "anneal": anneal,
+        "population": population,
+    }
+    scores = {name: [] for name in solvers}
+    elapsed = {name: [] for name in solvers}
+    for owned in OWNED_SETS:
+        for time_minutes in TIME_MINUTES:
+            for money_won in MONEY_WON:
+                minimal = generate_minimal_solution(steps, owned, time_minutes)
+                routine_solution = routine_optimization_step(
+                    minimal, steps, time_minutes, money_won
+                )
+                args = (routine_solution, steps, time_minutes, money_won)
+                for name, solver in solvers.items():
+                    started = time.perf_counter()
+                    solution = solver(*args, priority_weights)
+                    elapsed[name].append((time.perf_counter() - started) * 1000)
+                    scores[name].append(
+                        evaluate_solution(solution, *args[1:], priority_weights)
+                    )
+
+    exact = scores["exact"]
+    feasible = [i for i, score in enumerate(exact) if math.isfinite(score)]
+    print(f"시나리오 {len(exact)}개 (가능한 해 {len(feasible)}개)")
+    for name in solvers:
+        values = sorted(elapsed[name])
+        print(
+            f"{name:>10}: 평균 {statistics.mean(values):.2f} ms,"
+            f" p50 {values[len(values) // 2]:.2f} ms, 최대 {values[-1]:.2f} ms"
+        )
+        if name == "exact" or not feasible:
+            continue
+        # exact 는 1원 미만의 가격 차이를 무시하므로 그 정도 점수 차이는 같은 것으로 봄
+        gaps = [scores[name][i] - exact[i] for i in feasible]
+        print(
+            f"{'':>10}  exact 보다 나쁨 {sum(gap > 0.01 for gap in gaps)},"
+            f" 같음 {sum(abs(gap) <= 0.01 for gap in gaps)},"
+            f" 더 좋음 {sum(gap < -0.01 for gap in gaps)},"
+            f" 점수 차이 중앙값 {statistics.median(gaps):.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mongo", action="store_true", help="MongoDB 가격 구간 사용")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--time-budget-ms", type=float, default=30.0)
+    args = parser.parse_args()
+
+    if args.mongo:
+        asyncio.run(init_price_segments())
+    else:
+        routine_generate.PRICE_SEGMENTS = synthetic_price_segments(args.seed)
+    run(args.seed, args.time_budget_ms)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
 # config/settings.py
+from typing import Dict, List, Optional
+
 from pydantic_settings import BaseSettings
 
 
@@ -12,6 +14,91 @@ class Settings(BaseSettings):
     google_client_key: str
     openai_key: str
 
+    # 모델 로딩
+    model_version: str = "initialResNet"
+    model_load_workers: int = 4
+    model_lazy_load: bool = False
+    model_shm_dir: str = ""  # 예: "/dev/shm/peace-models" (워커 간 가중치 공유)
+
+    # 추론 backend ("eager" | "torchscript" | "onnx"), 양자화 ("none" | "dynamic" | "static")
+    inference_backend: str = "eager"
+    inference_quantization: str = "none"
+    # static 양자화는 inference_calibration_dir 에 이미지가 필요 (보정/정확도 비교에 나누어 사용)
+    inference_calibration_dir: str = ""
+    inference_calibration_samples: int = 16
+    inference_parity_tolerance: float = 0.02
+
+    # 결과 캐시 (0 이면 비활성화)
+    result_cache_size: int = 1024
+    acne_result_cache_size: int = 128
+    result_cache_mongo_ttl_seconds: int = 0
+
+    # 이미지 업로드 제한
+    upload_max_bytes: int = 15 * 1024 * 1024
+    upload_max_pixels: int = 40_000_000
+    upload_allowed_formats: List[str] = ["JPEG", "PNG", "WEBP"]
+    upload_limited_paths: List[str] = ["/predict", "/acne_detection"]
+    upload_jpeg_draft: bool = False  # crop 이 충분히 크면 JPEG 를 축소 디코딩
+
+    # 추론 마이크로 배칭
+    inference_batching_enabled: bool = True
+    inference_batch_window_ms: float = 5.0
+    inference_max_batch_size: int = 32
+
+    # CPU 작업용 워커 풀 ("thread" | "process")
+    worker_pool_kind: str = "thread"
+    worker_pool_size: int = 4
+    worker_pool_max_in_flight: int = 16  # 엔드포인트별 기본 동시 처리 한도
+    worker_pool_endpoint_limits: Dict[str, int] = {}
+
+    # 여드름 감지 배치 (전용 프로세스 풀, 0 이면 CPU 코어 수)
+    acne_batch_pool_size: int = 0
+    acne_batch_max_items: int = 500
+    acne_batch_max_bytes: int = 512 * 1024 * 1024  # 배치 요청 본문 전체 한도
+
+    # 에러 로그 (큐 + 리스너 스레드, 회전 파일)
+    error_log_file: str = "detailed_exceptions.log"
+    error_log_max_bytes: int = 10 * 1024 * 1024
+    error_log_backup_count: int = 5
+    error_log_body_limit: int = 2048  # 요청 본문은 이 길이까지만 기록
+    error_log_queue_size: int = 10000  # 가득 차면 새 레코드는 버림
+    error_log_sample_window_seconds: float = 60.0  # 같은 에러는 window 당 한 번만 기록
+
+    # /metrics 지연 시간 계측
+    metrics_enabled: bool = True
+
+    # 화장품 추천용 제품 카탈로그 (메모리 인덱스)
+    catalog_change_stream: bool = True  # 불가하면 주기 갱신으로 전환
+    catalog_change_debounce_seconds: float = 2.0
+    catalog_refresh_seconds: int = 600  # 0 이면 주기 갱신 안 함
+
+    # 세그먼트(화장품 종류, 피부 타입, 고민 조합)별 추천 후보 사전 계산
+    recommendation_materialize: bool = True
+    recommendation_materialize_depth: int = 20  # 이 개수까지의 top_k 를 세그먼트로 처리
+    recommendation_materialize_max_concerns: int = 2  # 이 개수 이하의 고민 조합만 계산
+
+    # 루틴 생성 비용 최적화 ("exact": 분기 한정법 | "anneal": 기존 담금질 | "population": 병렬 템퍼링)
+    routine_solver: str = "exact"
+    routine_population_size: int = 256  # 온도 단계 수로 나누어 배치
+    routine_population_temperatures: int = 16
+    routine_time_budget_ms: float = 30.0
+    routine_max_iterations: int = 0  # 0 이면 시간 예산까지만
+    # routine_seed 는 routine_max_iterations > 0 일 때만 결과가 재현됨
+    # (시간 예산으로 멈추면 반복 횟수가 실행 속도에 따라 달라짐)
+    routine_seed: Optional[int] = None
+
+    # 루틴 생성 결과 캐시 (0 이면 비활성화)
+    routine_cache_size: int = 2048
+    routine_cache_money_bucket: int = 1000  # 예산을 이 단위(원)로 내림해서 생성/캐시
+
+    # GPT 추천 이유 생성
+    openai_base_url: str = ""  # 비우면 OpenAI API, 로컬 stub 서버로 테스트할 때 지정
+    openai_model: str = "gpt-4o"
+    openai_timeout_seconds: float = 30.0
+    reason_max_concurrency: int = 8  # 동시에 보내는 OpenAI 요청 수
+    reason_cache_size: int = 4096
+    reason_cache_mongo_ttl_seconds: int = 30 * 24 * 3600
+
     class Config:
         env_file = ".env"
 
@@ -0,0 +1,164 @@
+# core/error_logging.py
+import logging
+import queue
+import time
+import traceback
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional, Tuple
+
+from core.config import settings
+
+# 로그에 남기지 않을 헤더
+REDACTED_HEADERS = {"authorization", "cookie", "set-cookie"}
+# 본문을 읽지 않고 크기만 남길 Content-Type
+BINARY_CONTENT_TYPES = ("multipart/", "image/", "application/octet-stream")
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    큐가 가득 차면 기다리지 않고 레코드를 버리는 QueueHandler.
+
+    포맷(트레이스백 문자열 생성, 소스 라인 읽기)은 리스너 스레드의 핸들러가 하도록
+    레코드를 그대로 넘겨 이벤트 루프에서는 큐에 넣는 일만 합니다.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class ErrorSampler:
+    """
+    같은 에러(예외 타입, 메시지, 발생 위치, 경로)가 반복되면 window 동안 첫 번째만 기록하고 나머지는 개수만 셉니다.
+    window 가 지난 뒤 다시 발생하면 그동안 생략된 개수와 함께 기록합니다.
+    """
+
+    def __init__(self, window_seconds: float, max_keys: int = 1024):
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        # key -> [window 시작 시각, 생략된 개수]
+        self._seen: Dict[Tuple[str, ...], list] = {}
+
+    @staticmethod
+    def key_for(exc: BaseException, path: str) -> Tuple[str, ...]:
+        frames = traceback.extract_tb(exc.__traceback__)
+        origin = f"{frames[-1].filename}:{frames[-1].lineno}" if frames else ""
+        return (type(exc).__name__, str(exc)[:200], origin, path)
+
+    def should_log(self, key: Tuple[str, ...]) -> Tuple[bool, int]:
+        """(기록 여부, 직전 window 동안 생략된 개수)"""
+        if self.window_seconds <= 0:
+            return True, 0
+        now = time.monotonic()
+        entry = self._seen.get(key)
+        if entry is not None and now - entry[0] < self.window_seconds:
+            entry[1] += 1
+            return False, 0
+
+        suppressed = entry[1] if entry is not None else 0
+        if entry is None and len(self._seen) >= self.max_keys:
+            # 오래된 key 부터 정리
+            oldest = min(self._seen, key=lambda k: self._seen[k][0])
+            del self._seen[oldest]
+        self._seen[key] = [now, 0]
+        return True, suppressed
+
+
+async def describe_request_body(request) -> str:
+    """
+    에러 로그에 남길 요청 본문 요약.
+
+    바이너리 업로드나 길이를 모르는(chunked) 본문, 큰 본문은 읽지 않고 크기만 남기며,
+    텍스트 본문도 error_log_body_limit 바이트까지만 기록합니다.
+    """
+    content_type = request.headers.get("content-type", "")
+    length = int(request.headers.get("content-length") or 0)
+    if length == 0:
+        return ""
+    if content_type.startswith(BINARY_CONTENT_TYPES):
+        return f"<{content_type} body omitted, {length} bytes>"
+    limit = settings.error_log_body_limit
+    if length > limit * 16:
+        return f"<body not read, {length} bytes>"
+    try:
+        body = await request.body()
+    except Exception as body_exc:
+        return f"<body unavailable ({body_exc}), {length} bytes>"
+    text = body[:limit].decode("utf-8", errors="replace")
+    if len(body) > limit:
+        text += f"... <truncated, {len(body)} bytes total>"
+    return text
+
+
+def redact_headers(headers) -> Dict[str, str]:
+    return {
+        name: ("<redacted>" if name.lower() in REDACTED_HEADERS else value)
+        for name, value in headers.items()
+    }
+
+
+error_queue: queue.Queue = queue.Queue(maxsize=settings.error_log_queue_size)
+queue_handler = DroppingQueueHandler(error_queue)
+error_sampler = ErrorSampler(settings.error_log_sample_window_seconds)
+_listener: Optional[QueueListener] = None
+
+
+def setup_error_logger(name: str = "detailed_exception_logger") -> logging.Logger:
+    """
+    에러 로거를 큐 기반으로 구성합니다.
+    로거는 큐에 넣기만 하고, 콘솔/회전 파일 출력은 리스너 스레드에서 처리합니다.
+    """
+    global _listener
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.ERROR)
+    logger.propagate = False
+    if queue_handler not in logger.handlers:
+        logger.addHandler(queue_handler)
+
+    if _listener is None:
+        formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+
+        # 콘솔 핸들러 설정
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(formatter)
+
+        # 회전 파일 핸들러 설정
+        file_handler = RotatingFileHandler(
+            settings.error_log_file,
+            maxBytes=settings.error_log_max_bytes,
+            backupCount=settings.error_log_backup_count,
+            encoding="utf-8",
+            delay=True,
+        )
+        file_handler.setFormatter(formatter)
+
+        _listener = QueueListener(
+            error_queue, console_handler, file_handler, respect_handler_level=True
+        )
+        _listener.start()
+    return logger
+
+
+def shutdown_error_logger():
+    """남은 레코드를 모두 기록하고 리스너 스레드를 종료합니다."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def error_logging_stats() -> dict:
+    return {
+        "queued": error_queue.qsize(),
+        "dropped": queue_handler.dropped,
+        "sampled_keys": len(error_sampler._seen),
+    }
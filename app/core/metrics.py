@@ -0,0 +1,211 @@
+# core/metrics.py
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+from core.config import settings
+
+# Prometheus 기본 지연 시간 버킷 (초)
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    """
+    라벨별 누적 히스토그램. observe 는 버킷 탐색 한 번과 짧은 lock 만 사용합니다.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str],
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # 라벨 값 튜플 -> (버킷별 개수 + [+Inf], 합계)
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = ([0] * (len(self.buckets) + 1), [0.0])
+                self._series[labelvalues] = series
+            series[0][index] += 1
+            series[1][0] += value
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            snapshot = {
+                labels: (list(counts), total[0])
+                for labels, (counts, total) in self._series.items()
+            }
+        for labelvalues, (counts, total) in sorted(snapshot.items()):
+            labels = ",".join(
+                f'{name}="{_escape(value)}"'
+                for name, value in zip(self.labelnames, labelvalues)
+            )
+            prefix = f"{labels}," if labels else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Histogram] = {}
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str],
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        if name not in self._metrics:
+            self._metrics[name] = Histogram(name, help_text, labelnames, buckets)
+        return self._metrics[name]
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ("method", "route", "status"),
+)
+stage_duration = registry.histogram(
+    "app_stage_duration_seconds",
+    "Latency of internal processing stages",
+    ("component", "stage"),
+)
+mongodb_command_duration = registry.histogram(
+    "mongodb_command_duration_seconds",
+    "MongoDB command latency",
+    ("command", "status"),
+)
+
+
+def observe_stage(component: str, stage: str, seconds: float):
+    if settings.metrics_enabled:
+        stage_duration.observe(seconds, component, stage)
+
+
+class StageTimer:
+    """
+    연속된 처리 단계의 소요 시간을 기록합니다.
+
+    timer = StageTimer("recommend_cosmetics")
+    ... ; timer.mark("load_products")
+    ... ; timer.mark("score")
+    mark 는 직전 mark(또는 생성 시점) 이후 걸린 시간을 해당 단계로 기록합니다.
+    """
+
+    def __init__(self, component: str):
+        self.component = component
+        self.started = time.perf_counter()
+
+    def mark(self, stage: str) -> float:
+        now = time.perf_counter()
+        elapsed = now - self.started
+        self.started = now
+        observe_stage(self.component, stage, elapsed)
+        return elapsed
+
+
+class MetricsMiddleware:
+    """
+    요청별 지연 시간을 라우트 템플릿(/predict/{area_name} 등) 단위로 기록하는 ASGI 미들웨어.
+    매칭되는 라우트가 없으면 실제 경로 대신 "unmatched" 로 묶어 라벨 수가 늘지 않게 합니다.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = "500"
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            http_request_duration.observe(
+                time.perf_counter() - started,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                status,
+            )
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Motor(pymongo) 명령별 소요 시간을 기록합니다. 드라이버가 측정한 duration_micros 를 사용합니다."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongodb_command_duration.observe(
+            event.duration_micros / 1e6, event.command_name, "ok"
+        )
+
+    def failed(self, event):
+        mongodb_command_duration.observe(
+            event.duration_micros / 1e6, event.command_name, "error"
+        )
+
+
+def mongo_event_listeners() -> Optional[List[monitoring.CommandListener]]:
+    return [MongoCommandListener()] if settings.metrics_enabled else None
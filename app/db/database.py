@@ -1,12 +1,13 @@
 # db/database.py
 from pymongo import ASCENDING
 from core.config import settings
+from core.metrics import mongo_event_listeners
 
 from motor.motor_asyncio import AsyncIOMotorClient
 
 MONGO_URI = settings.mongo_uri
 
-client = AsyncIOMotorClient(MONGO_URI)
+client = AsyncIOMotorClient(MONGO_URI, event_listeners=mongo_event_listeners())
 db = client["peace"]
 users_collection = db["users"]
 
@@ -1,6 +1,4 @@
 # main.py
-import logging
-import traceback
 from fastapi.responses import JSONResponse
 import uvicorn
 from fastapi import FastAPI, HTTPException, Request
@@ -12,13 +10,43 @@ from api import (
     detect_acne,
     statistics,
     notifications,
+    metrics,
 )
 
 from services.model_loader import load_models
+from services.inference_backend import apply_inference_backend
+from services.inference_scheduler import inference_scheduler
+from services.worker_pool import worker_pool
+from services.acne_batch import acne_batch_pool
+from services.result_cache import create_cache_indexes
+from services.upload import UploadLimitMiddleware
+from core.config import settings
+from core.metrics import MetricsMiddleware
+from core.error_logging import (
+    ErrorSampler,
+    describe_request_body,
+    error_sampler,
+    redact_headers,
+    setup_error_logger,
+    shutdown_error_logger,
+)
 from services.routine_generate import init_price_segments
+from services.product_catalog import catalog_refresher, init_product_catalog
+from services.recommendation_materialize import recommendation_materializer
 
 app = FastAPI()
 
+# 이미지 업로드 경로는 본문을 다 받기 전에 크기를 제한 (폼 필드 여유분 64KB)
+app.add_middleware(
+    UploadLimitMiddleware,
+    max_bytes=settings.upload_max_bytes + 64 * 1024,
+    paths=settings.upload_limited_paths,
+    path_limits={"/acne_detection/batch": settings.acne_batch_max_bytes},
+)
+# 라우트별 지연 시간 계측 (가장 바깥쪽에서 413 등 미들웨어 응답까지 포함)
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
 app.include_router(predict_resnet.router)
 app.include_router(routine.router)
 app.include_router(cosmetics.router)
@@ -26,24 +54,10 @@ app.include_router(user.router)
 app.include_router(detect_acne.router)
 app.include_router(statistics.router)
 app.include_router(notifications.router)
+app.include_router(metrics.router)
 
-# 로거 설정
-logger = logging.getLogger("detailed_exception_logger")
-logger.setLevel(logging.ERROR)
-
-# 콘솔 핸들러 설정
-console_handler = logging.StreamHandler()
-console_formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-console_handler.setFormatter(console_formatter)
-
-# 파일 핸들러 설정
-file_handler = logging.FileHandler("detailed_exceptions.log", encoding="utf-8")
-file_formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-file_handler.setFormatter(file_formatter)
-
-# 핸들러 추가
-logger.addHandler(console_handler)
-logger.addHandler(file_handler)
+# 로거 설정 (큐에 넣기만 하고 출력은 리스너 스레드에서 처리)
+logger = setup_error_logger("detailed_exception_logger")
 
 
 # 모든 예외를 핸들링하는 핸들러
@@ -52,26 +66,27 @@ async def global_exception_handler(request: Request, exc: Exception):
     if isinstance(exc, HTTPException):
         raise exc
 
-    # 요청 정보 수집
-    request_info = f"Request Method: {request.method}\n"
-    request_info += f"Request URL: {request.url}\n"
-    request_info += f"Request Headers: {dict(request.headers)}\n"
-    try:
-        body = await request.body()
-        request_info += f"Request Body: {body.decode('utf-8')}\n"
-    except Exception as body_exc:
-        request_info += f"Request Body: Could not retrieve due to {str(body_exc)}\n"
-
-    # 예외 정보 수집
-    error_message = f"Exception occurred:\n{request_info}\n"
-    error_message += f"Details: {str(exc)}\n"
-    error_message += "Traceback:\n"
-    error_message += "".join(
-        traceback.format_exception(type(exc), exc, exc.__traceback__)
-    )
-
-    # 로그를 콘솔 및 파일에 출력
-    logger.error(error_message)
+    # 같은 라우트의 같은 에러는 샘플링 (경로 파라미터가 달라도 하나로 묶음)
+    route = request.scope.get("route")
+    path = getattr(route, "path", request.url.path)
+    log, suppressed = error_sampler.should_log(ErrorSampler.key_for(exc, path))
+    if log:
+        # 요청 정보 수집 (본문은 텍스트일 때만, error_log_body_limit 까지)
+        request_info = f"Request Method: {request.method}\n"
+        request_info += f"Request URL: {request.url}\n"
+        request_info += f"Request Headers: {redact_headers(request.headers)}\n"
+        request_info += f"Request Body: {await describe_request_body(request)}\n"
+
+        # 예외 정보 수집 (트레이스백 포맷은 리스너 스레드에서 수행)
+        error_message = f"Exception occurred:\n{request_info}\n"
+        error_message += f"Details: {str(exc)}\n"
+        if suppressed:
+            error_message += (
+                f"Suppressed {suppressed} similar errors since last report\n"
+            )
+
+        # 로그를 콘솔 및 파일에 출력
+        logger.error(error_message, exc_info=(type(exc), exc, exc.__traceback__))
 
     # 클라이언트에 반환할 응답
     return JSONResponse(
@@ -84,7 +99,21 @@ async def global_exception_handler(request: Request, exc: Exception):
 async def startup_event():
     # 서버 시작 시 평균 단가 계산 함수 호출
     await init_price_segments()
+    await init_product_catalog()
+    await create_cache_indexes()
     load_models()
+    apply_inference_backend()
+    inference_scheduler.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await inference_scheduler.stop()
+    await catalog_refresher.stop()
+    await recommendation_materializer.stop()
+    worker_pool.shutdown()
+    acne_batch_pool.shutdown()
+    shutdown_error_logger()
 
 
 if __name__ == "__main__":
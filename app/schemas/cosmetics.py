@@ -1,7 +1,7 @@
 # schemas/cosmetics.py
 
 from pydantic import BaseModel, Field
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 
 class ProductBase(BaseModel):
@@ -24,6 +24,7 @@ class ReasonRequest(BaseModel):
     matching_ingredients: Dict[str, Dict[str, int]]
     user_skin_type: str
     user_concerns: List[str]
+    product_id: Optional[str] = None  # 있으면 캐시 키로 사용
 
 
 class ProductRecommendation(ProductBase):
@@ -38,6 +39,12 @@ class ProductRecommendation(ProductBase):
     reason: str = ""
 
 
+class ReasonBatchRequest(BaseModel):
+    user_skin_type: str
+    user_concerns: List[str]
+    recommendations: List[ProductRecommendation]
+
+
 class CosmeticSearchResult(ProductBase):
     price: int = Field(..., alias="selling_price")
     volume: str
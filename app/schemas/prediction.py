@@ -6,3 +6,7 @@ from typing import Dict, List, Optional
 class PredictionResponse(BaseModel):
     classification_probabilities: Optional[Dict[str, List[float]]] = None
     regression_values: Optional[Dict[str, float]] = None
+
+
+class FacePredictionResponse(BaseModel):
+    results: Dict[str, PredictionResponse]
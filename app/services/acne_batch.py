@@ -0,0 +1,184 @@
+# services/acne_batch.py
+import asyncio
+import multiprocessing
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+import cv2
+from fastapi import HTTPException, UploadFile
+
+from core.config import settings
+from services.detect_acne import AcneOutputOptions, process_acne_image, to_json_result
+from services.result_cache import acne_cache
+from services.upload import read_upload
+
+
+def _init_worker():
+    # 프로세스마다 cv2 내부 스레드를 하나로 제한해 워커 수만큼만 코어를 사용합니다.
+    cv2.setNumThreads(1)
+
+
+def _score_item(
+    index: int, contents: bytes, bbox: List[int], options: AcneOutputOptions
+) -> dict:
+    """
+    배치 항목 하나를 처리합니다. (워커 프로세스에서 실행되므로 모듈 최상위 함수여야 합니다.)
+    예외는 풀 밖으로 던지지 않고 항목별 error 로 돌려줍니다.
+    """
+    started = time.perf_counter()
+    result: dict = {"index": index}
+    timings: Dict[str, float] = {}
+    try:
+        result.update(process_acne_image(contents, bbox, options, timings))
+    except ValueError as e:
+        result["error"] = str(e)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["worker"] = os.getpid()
+    result["elapsed"] = time.perf_counter() - started
+    result["timings"] = timings
+    return result
+
+
+class AcneBatchPool:
+    """
+    대량의 (이미지, bbox) 여드름 감지를 위한 전용 프로세스 풀.
+
+    단건 엔드포인트가 쓰는 worker_pool 과 분리해서, 배치 작업이 실시간 요청의 슬롯을 차지하지 않게 합니다.
+    워커별 처리 건수와 처리 시간을 누적해 처리량을 계산합니다.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.items: Dict[int, int] = defaultdict(int)
+        self.busy_seconds: Dict[int, float] = defaultdict(float)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return self._executor
+
+    def record(self, result: dict):
+        self.items[result["worker"]] += 1
+        self.busy_seconds[result["worker"]] += result["elapsed"]
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "workers": worker_throughput(self.items, self.busy_seconds),
+        }
+
+
+def worker_throughput(
+    items: Dict[int, int], busy_seconds: Dict[int, float]
+) -> Dict[str, dict]:
+    return {
+        str(pid): {
+            "items": count,
+            "busy_seconds": round(busy_seconds[pid], 3),
+            "items_per_second": (
+                round(count / busy_seconds[pid], 2) if busy_seconds[pid] else 0.0
+            ),
+        }
+        for pid, count in items.items()
+    }
+
+
+acne_batch_pool = AcneBatchPool(settings.acne_batch_pool_size)
+
+
+async def detect_acne_batch(
+    items: Iterable[Tuple[UploadFile, List[int]]],
+    options: Optional[AcneOutputOptions] = None,
+) -> AsyncIterator[dict]:
+    """
+    여러 (업로드 파일, bbox) 쌍을 프로세스 풀에 나눠 처리하고, 끝나는 순서대로 결과를 내보냅니다.
+
+    각 결과는 {"index", "score", "processed_image" 또는 "polygons"} 또는 {"index", "error"} 이며,
+    마지막에 워커별 처리량과 단계별 누적 소요 시간(ms)을 담은 {"summary": ...} 를 내보냅니다.
+    파일은 풀에 넘기기 직전에 하나씩 읽고, 한 번에 풀에 넘기는 작업은 워커 수의 2배로 제한해
+    큰 배치도 메모리에 한꺼번에 쌓이지 않게 합니다. 한도를 넘는 파일은 그 항목만 error 로 돌려줍니다.
+    """
+    options = options or AcneOutputOptions()
+    loop = asyncio.get_running_loop()
+    window = acne_batch_pool.max_workers * 2
+    started = time.perf_counter()
+    items_by_worker: Dict[int, int] = defaultdict(int)
+    busy_by_worker: Dict[int, float] = defaultdict(float)
+    stage_totals: Dict[str, float] = defaultdict(float)
+    counts = {"total": 0, "cached": 0, "failed": 0}
+    pending: Dict[asyncio.Future, str] = {}
+
+    async def drain(return_when) -> AsyncIterator[dict]:
+        done, _ = await asyncio.wait(pending, return_when=return_when)
+        for future in done:
+            cache_key = pending.pop(future)
+            result = future.result()
+            acne_batch_pool.record(result)
+            items_by_worker[result["worker"]] += 1
+            busy_by_worker[result["worker"]] += result.pop("elapsed")
+            del result["worker"]
+            for stage, elapsed in result.pop("timings").items():
+                stage_totals[stage] += elapsed
+            if "error" in result:
+                counts["failed"] += 1
+            else:
+                await acne_cache.set(
+                    cache_key,
+                    {key: value for key, value in result.items() if key != "index"},
+                )
+            yield to_json_result(result)
+
+    for index, (file, bbox) in enumerate(items):
+        counts["total"] += 1
+        try:
+            contents = await read_upload(file)
+        except HTTPException as e:
+            counts["failed"] += 1
+            yield {"index": index, "error": e.detail}
+            continue
+        cache_key = await acne_cache.make_key(contents, bbox, options.model_dump())
+        cached = await acne_cache.get(cache_key)
+        if cached is not None:
+            counts["cached"] += 1
+            yield to_json_result({"index": index, **cached})
+            continue
+
+        future = loop.run_in_executor(
+            acne_batch_pool.executor, _score_item, index, contents, bbox, options
+        )
+        pending[future] = cache_key
+        if len(pending) >= window:
+            async for result in drain(asyncio.FIRST_COMPLETED):
+                yield result
+
+    while pending:
+        async for result in drain(asyncio.FIRST_COMPLETED):
+            yield result
+
+    elapsed = time.perf_counter() - started
+    yield {
+        "summary": {
+            **counts,
+            "elapsed_seconds": round(elapsed, 3),
+            "items_per_second": round(counts["total"] / elapsed, 2) if elapsed else 0.0,
+            "workers": worker_throughput(items_by_worker, busy_by_worker),
+            "stages_ms_total": {
+                stage: round(total, 3) for stage, total in stage_totals.items()
+            },
+        }
+    }
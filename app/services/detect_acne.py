@@ -1,67 +1,396 @@
+import base64
+import io
+import threading
+import time
 import cv2
 import numpy as np
 from PIL import Image
-from typing import List, Tuple
+from pydantic import BaseModel, Field
+from typing import Dict, List, Literal, NamedTuple, Optional, Tuple
 
+from core.metrics import observe_stage
+from services.result_cache import acne_cache
+from services.upload import open_image
+from services.worker_pool import worker_pool
 
-def find_red_hue_ranges(hue_channel: np.ndarray) -> Tuple[int, int, int, int]:
+
+def border_red_means(
+    r_channel: np.ndarray,
+    contours: list,
+    shape: Tuple[int, int],
+    kernel: np.ndarray,
+) -> np.ndarray:
     """
-    Find red hue ranges based on histogram peaks.
+    Compute the mean red value on the border of every contour in a single pass.
+
+    Each contour is filled into one label image (label = index + 1). A pixel is on
+    the border of its contour when any pixel under the erosion kernel has a different
+    label, which matches ``mask - erode(mask, kernel)`` of the per-contour mask.
 
     Args:
-        hue_channel (np.ndarray): Hue channel of the HSV image.
+        r_channel (np.ndarray): Red channel of the image.
+        contours (list): External contours (filled regions do not overlap).
+        shape (Tuple[int, int]): Shape of the mask the contours were found in.
+        kernel (np.ndarray): Structuring element used for the border erosion.
 
     Returns:
-        Tuple[int, int, int, int]: (lower_red_hue1, upper_red_hue1, lower_red_hue2, upper_red_hue2)
+        np.ndarray: Border mean red value per contour (0 for empty borders).
+    """
+    if not contours:
+        return np.zeros(0, dtype=np.float64)
+
+    # erode/dilate support uint16 and float32 labels only
+    dtype = np.uint16 if len(contours) < np.iinfo(np.uint16).max else np.float32
+    labels: np.ndarray = np.zeros(shape, dtype=dtype)
+    for idx, cnt in enumerate(contours):
+        cv2.drawContours(labels, [cnt], -1, idx + 1, -1)  # type: ignore
+
+    # Neighborhood min/max differ from the pixel label exactly on region borders.
+    # (image edges are padded with neutral values, as in cv2.erode)
+    border: np.ndarray = (labels > 0) & (
+        (cv2.erode(labels, kernel) != labels) | (cv2.dilate(labels, kernel) != labels)
+    )
+    border_labels: np.ndarray = labels[border].astype(np.intp)
+    sums: np.ndarray = np.bincount(
+        border_labels,
+        weights=r_channel[border].astype(np.float64),
+        minlength=len(contours) + 1,
+    )
+    counts: np.ndarray = np.bincount(border_labels, minlength=len(contours) + 1)
+    return np.divide(
+        sums[1:], counts[1:], out=np.zeros(len(contours)), where=counts[1:] > 0
+    )
+
+
+class AcneDetection(NamedTuple):
+    image: Optional[np.ndarray]  # RGB crop of the bbox (None when no skin is detected)
+    contours: list  # acne contours in crop coordinates
+    score: int
+    timings: Dict[str, float]  # milliseconds per stage
+
+
+class AcneDetector:
     """
-    # Compute histogram for hue channel
-    hist = cv2.calcHist([hue_channel], [0], None, [180], [0, 180]).flatten()
+    Red-color based acne detector.
+
+    Structuring elements and threshold arrays are built once and reused for every
+    image, and the colour planes are converted straight from the RGB crop. Each call
+    reports how long every stage took, and the totals are accumulated for stats().
+    """
+
+    STAGES = (
+        "color_convert",
+        "skin_mask",
+        "red_threshold",
+        "hue_ranges",
+        "red_mask",
+        "contours",
+        "filter",
+    )
+
+    def __init__(
+        self,
+        min_area: int = 30,
+        max_area: int = 7000,
+        circularity_thresh: float = 0.1,
+        border_red_diff_thresh: int = 0,
+        average_red_threshold_offset: int = 0,
+    ):
+        self.min_area = min_area
+        self.max_area = max_area
+        self.circularity_thresh = circularity_thresh
+        self.border_red_diff_thresh = border_red_diff_thresh
+        self.average_red_threshold_offset = average_red_threshold_offset
+
+        # Skin color range in YCrCb
+        self.skin_lower = np.array([0, 133, 77], dtype=np.uint8)
+        self.skin_upper = np.array([255, 173, 127], dtype=np.uint8)
+        self.skin_kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+        # Saturation / value range shared by both red hue ranges
+        self.red_sv_lower = np.array([0, 70, 50], dtype=np.uint8)
+        self.red_sv_upper = np.array([255, 255, 255], dtype=np.uint8)
+        self.acne_kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.stage_totals: Dict[str, float] = dict.fromkeys(self.STAGES, 0.0)
+
+    def find_red_hue_ranges(self, hue_channel: np.ndarray) -> Tuple[int, int, int, int]:
+        """
+        Find red hue ranges based on histogram peaks.
+
+        Args:
+            hue_channel (np.ndarray): Hue channel of the HSV image.
+
+        Returns:
+            Tuple[int, int, int, int]: (lower_red_hue1, upper_red_hue1, lower_red_hue2, upper_red_hue2)
+        """
+        # Compute histogram for hue channel
+        hist = cv2.calcHist([hue_channel], [0], None, [180], [0, 180]).flatten()
+
+        # Smooth the histogram to reduce noise
+        hist_smooth = cv2.GaussianBlur(hist, (9, 9), 0)
+
+        # Find peaks in the histogram (local maxima above 10% of max value).
+        # NOTE: GaussianBlur returns the 180 bins as a single (1, 180) row and the
+        # peak search runs along the first axis, exactly like the original
+        # per-index loop, so no peaks are found and the fallback ranges below
+        # (0-10, 170-180) are what detection is tuned on. Flattening the row
+        # here would change detection results.
+        threshold = np.max(hist_smooth) * 0.1
+        inner = hist_smooth[1:-1]
+        peaks = (
+            np.flatnonzero(
+                (inner > hist_smooth[:-2])
+                & (inner > hist_smooth[2:])
+                & (inner > threshold)
+            )
+            + 1
+        )
+
+        # Assuming red has two peaks near 0 and 180
+        lower_red_hue1 = max(int(peaks[0]) - 10, 0) if len(peaks) > 0 else 0
+        upper_red_hue1 = min(int(peaks[0]) * 2 // 3, 180) if len(peaks) > 0 else 10
+
+        lower_red_hue2 = max(int(peaks[1]) - 10, 170) if len(peaks) > 1 else 170
+        upper_red_hue2 = 180
+
+        return lower_red_hue1, upper_red_hue1, lower_red_hue2, upper_red_hue2
+
+    def get_skin_mask(self, ycrcb_image: np.ndarray) -> np.ndarray:
+        """
+        Extract skin mask using YCrCb color space.
+
+        Args:
+            ycrcb_image (np.ndarray): Image in YCrCb color space.
+
+        Returns:
+            np.ndarray: Binary skin mask.
+        """
+        skin_mask = cv2.inRange(ycrcb_image, self.skin_lower, self.skin_upper)
+
+        # Apply morphological operations to remove noise
+        skin_mask = cv2.morphologyEx(
+            skin_mask, cv2.MORPH_OPEN, self.skin_kernel, iterations=2
+        )
+        skin_mask = cv2.morphologyEx(
+            skin_mask, cv2.MORPH_DILATE, self.skin_kernel, iterations=1
+        )
+        return skin_mask
+
+    def red_mask(
+        self, hsv_image: np.ndarray, hue_ranges: Tuple[int, int, int, int]
+    ) -> np.ndarray:
+        """
+        Binary mask of pixels inside either red hue range with enough saturation/value.
+
+        Equivalent to OR-ing two cv2.inRange masks, but the hue test is a single
+        256-entry lookup table so the saturation/value test runs only once.
+        """
+        lower_hue1, upper_hue1, lower_hue2, upper_hue2 = hue_ranges
+        hue_lut = np.zeros(256, dtype=np.uint8)
+        hue_lut[lower_hue1 : upper_hue1 + 1] = 255
+        hue_lut[lower_hue2 : upper_hue2 + 1] = 255
+        hue_mask = cv2.LUT(hsv_image[:, :, 0], hue_lut)
+        sv_mask = cv2.inRange(hsv_image, self.red_sv_lower, self.red_sv_upper)
+        return cv2.bitwise_and(hue_mask, sv_mask)
+
+    def detect(self, image: np.ndarray, bbox: List[int]) -> AcneDetection:
+        """
+        Detect acne regions in an image based on red color detection.
+
+        Args:
+            image (np.ndarray): RGB image (H, W, 3) uint8.
+            bbox (List[int]): Face area to inspect (x1, y1, x2, y2).
+
+        Returns:
+            AcneDetection: RGB crop, acne contours, score and per-stage timings.
+        """
+        timings: Dict[str, float] = {}
+        started = time.perf_counter()
+
+        def mark(stage: str):
+            nonlocal started
+            now = time.perf_counter()
+            timings[stage] = (now - started) * 1000
+            started = now
+
+        x1, y1, x2, y2 = bbox
+        image_rgb: np.ndarray = image[y1:y2, x1:x2]
+
+        # Convert to YCrCb and extract skin mask
+        ycrcb_image: np.ndarray = cv2.cvtColor(image_rgb, cv2.COLOR_RGB2YCrCb)
+        mark("color_convert")
+        skin_mask: np.ndarray = self.get_skin_mask(ycrcb_image)
+        mark("skin_mask")
+
+        # Red channel histogram over the skin area (no copy of the skin pixels)
+        r_channel: np.ndarray = image_rgb[:, :, 0]
+        skin_r_hist: np.ndarray = (
+            cv2.calcHist([image_rgb], [0], skin_mask, [256], [0, 256])
+            .ravel()
+            .astype(np.int64)
+        )
+
+        # If no skin regions detected, there is nothing to mark
+        if skin_r_hist.sum() == 0:
+            mark("red_threshold")
+            self._record(timings)
+            return AcneDetection(None, [], 100, timings)
+
+        # Average red threshold from the 5 smallest and 5 largest skin red values
+        num_values: int = int(min(5, skin_r_hist.sum()))
+        present: np.ndarray = np.flatnonzero(skin_r_hist)
+        min_red_values: np.ndarray = np.repeat(
+            present[:num_values], skin_r_hist[present[:num_values]]
+        )[:num_values]
+        max_red_values: np.ndarray = np.repeat(
+            present[-num_values:], skin_r_hist[present[-num_values:]]
+        )[-num_values:]
+        avg_min_red: float = float(np.mean(min_red_values))
+        avg_max_red: float = float(np.mean(max_red_values))
+        average_red_threshold: float = (
+            avg_min_red + avg_max_red
+        ) / 2.0 + self.average_red_threshold_offset
+        mark("red_threshold")
+
+        # Convert to HSV and automatically find red hue ranges
+        blurred_initial: np.ndarray = cv2.GaussianBlur(image_rgb, (5, 5), 0)
+        hsv_initial: np.ndarray = cv2.cvtColor(blurred_initial, cv2.COLOR_RGB2HSV)
+        hue_ranges = self.find_red_hue_ranges(hsv_initial[:, :, 0])
+        mark("hue_ranges")
+
+        # Red mask, noise removal and smoothing
+        red_mask: np.ndarray = self.red_mask(hsv_initial, hue_ranges)
+        acne_mask: np.ndarray = cv2.morphologyEx(
+            red_mask, cv2.MORPH_OPEN, self.acne_kernel
+        )
+        acne_mask = cv2.morphologyEx(acne_mask, cv2.MORPH_CLOSE, self.acne_kernel)
+        acne_mask = cv2.GaussianBlur(acne_mask, (5, 5), 0)
+        mark("red_mask")
+
+        # Find contours
+        contours, _ = cv2.findContours(
+            acne_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
+        )
+        mark("contours")
+
+        # Filter contours based on shape parameters
+        candidates: list = []
+        candidate_areas: List[float] = []
+        for cnt in contours:
+            area: float = cv2.contourArea(cnt)
+            if not (self.min_area < area < self.max_area):
+                continue
+
+            perimeter: float = cv2.arcLength(cnt, True)
+            if perimeter == 0:
+                continue
+
+            circularity: float = 4 * np.pi * (area / (perimeter * perimeter))
+            if circularity < self.circularity_thresh:
+                continue
+
+            candidates.append(cnt)
+            candidate_areas.append(area)
+
+        # Compare average red value on each contour border with the threshold
+        border_means: np.ndarray = border_red_means(
+            r_channel, candidates, acne_mask.shape, self.acne_kernel
+        )
+        accepted = border_means > average_red_threshold + self.border_red_diff_thresh
+        filtered_contours: list = [
+            cnt for cnt, keep in zip(candidates, accepted) if keep
+        ]
+
+        total_area: float = image_rgb.shape[0] * image_rgb.shape[1]
+        ance_percentage: float = (
+            sum([area for area, keep in zip(candidate_areas, accepted) if keep])
+            / total_area
+            * 100
+        )
+        score: int = 100 - min(50, int(ance_percentage * 20))
+        mark("filter")
+
+        self._record(timings)
+        return AcneDetection(image_rgb, filtered_contours, score, timings)
+
+    def _record(self, timings: Dict[str, float]):
+        with self._lock:
+            self.calls += 1
+            for stage, elapsed in timings.items():
+                self.stage_totals[stage] += elapsed
+        for stage, elapsed in timings.items():
+            observe_stage("acne_detection", stage, elapsed / 1000)
 
-    # Smooth the histogram to reduce noise
-    hist_smooth = cv2.GaussianBlur(hist, (9, 9), 0)
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "stages_ms_total": {
+                    stage: round(total, 3) for stage, total in self.stage_totals.items()
+                },
+                "stages_ms_avg": {
+                    stage: round(total / self.calls, 3) if self.calls else 0.0
+                    for stage, total in self.stage_totals.items()
+                },
+            }
 
-    # Find peaks in the histogram
-    peaks = []
-    threshold = np.max(hist_smooth) * 0.1  # 10% of max value as threshold
-    for i in range(1, len(hist_smooth) - 1):
-        if (
-            hist_smooth[i] > hist_smooth[i - 1]
-            and hist_smooth[i] > hist_smooth[i + 1]
-            and hist_smooth[i] > threshold
-        ):
-            peaks.append(i)
 
-    # Assuming red has two peaks near 0 and 180
-    lower_red_hue1 = max(peaks[0] - 10, 0) if len(peaks) > 0 else 0
-    upper_red_hue1 = min(peaks[0] * 2 // 3, 180) if len(peaks) > 0 else 10
+acne_detector = AcneDetector()
 
-    lower_red_hue2 = max(peaks[1] - 10, 170) if len(peaks) > 1 else 170
-    upper_red_hue2 = 180
 
-    return lower_red_hue1, upper_red_hue1, lower_red_hue2, upper_red_hue2
+def find_red_hue_ranges(hue_channel: np.ndarray) -> Tuple[int, int, int, int]:
+    """Find red hue ranges based on histogram peaks. (see AcneDetector.find_red_hue_ranges)"""
+    return acne_detector.find_red_hue_ranges(hue_channel)
 
 
 def get_skin_mask(ycrcb_image: np.ndarray) -> np.ndarray:
+    """Extract skin mask using YCrCb color space. (see AcneDetector.get_skin_mask)"""
+    return acne_detector.get_skin_mask(ycrcb_image)
+
+
+def detect_acne_regions(
+    image: Image.Image, bbox: List[int]
+) -> Tuple[Optional[np.ndarray], list, int]:
     """
-    Extract skin mask using YCrCb color space.
+    Detect acne regions in an image based on red color detection.
 
     Args:
-        ycrcb_image (np.ndarray): Image in YCrCb color space.
+        image (Image.Image): Input image.
+        bbox (List[int]): Face area to inspect (x1, y1, x2, y2).
 
     Returns:
-        np.ndarray: Binary skin mask.
+        Tuple[Optional[np.ndarray], list, int]: (RGB crop of the bbox or None when no
+        skin is detected, acne contours in crop coordinates, score)
+    """
+    detection = acne_detector.detect(np.asarray(image.convert("RGB")), bbox)
+    return detection.image, detection.contours, detection.score
+
+
+def render_acne_overlay(
+    image_rgb: np.ndarray, contours: list, max_side: int = 0
+) -> np.ndarray:
     """
-    # Define skin color range in YCrCb
-    lower = np.array([0, 133, 77], dtype=np.uint8)
-    upper = np.array([255, 173, 127], dtype=np.uint8)
-    skin_mask = cv2.inRange(ycrcb_image, lower, upper)
+    Draw acne contours on a copy of an RGB image.
 
-    # Apply morphological operations to remove noise
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
-    skin_mask = cv2.morphologyEx(skin_mask, cv2.MORPH_OPEN, kernel, iterations=2)
-    skin_mask = cv2.morphologyEx(skin_mask, cv2.MORPH_DILATE, kernel, iterations=1)
+    When max_side is set, the image is downscaled first and the contours are scaled
+    with it, so the outline keeps its thickness in the preview.
+    """
+    height, width = image_rgb.shape[:2]
+    if max_side and max(height, width) > max_side:
+        scale: float = max_side / max(height, width)
+        image_rgb = cv2.resize(
+            image_rgb,
+            (max(1, round(width * scale)), max(1, round(height * scale))),
+            interpolation=cv2.INTER_AREA,
+        )
+        contours = [np.round(cnt * scale).astype(np.int32) for cnt in contours]
+    else:
+        image_rgb = image_rgb.copy()
 
-    return skin_mask
+    cv2.drawContours(image_rgb, contours, -1, (0, 255, 0), 2)
+    return image_rgb
 
 
 def detect_acne(image: Image.Image, bbox: List[int]) -> Tuple[Image.Image, int]:
@@ -74,120 +403,107 @@ def detect_acne(image: Image.Image, bbox: List[int]) -> Tuple[Image.Image, int]:
     Returns:
         Image.Image: Image with detected acne regions highlighted.
     """
-    # Internal Detection Parameters
-    MIN_AREA: int = 30
-    MAX_AREA: int = 7000
-    CIRCULARITY_THRESH: float = 0.1
-    BORDER_RED_DIFF_THRESH: int = 0  # Adjust as needed
-    AVERAGE_RED_THRESHOLD_OFFSET: int = 0  # Adjust as needed
-
-    # Convert PIL Image to OpenCV BGR format
-    raw_image_cv: np.ndarray = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-    x1, y1, x2, y2 = bbox
-    image_cv = raw_image_cv[y1:y2, x1:x2]
-
-    # Convert to YCrCb and extract skin mask
-    ycrcb_image: np.ndarray = cv2.cvtColor(image_cv, cv2.COLOR_BGR2YCrCb)
-    skin_mask: np.ndarray = get_skin_mask(ycrcb_image)
-
-    # Extract red channel
-    r_channel: np.ndarray = image_cv[:, :, 2]
-    skin_r_values: np.ndarray = r_channel[skin_mask > 0]
-
+    image_rgb, contours, score = detect_acne_regions(image, bbox)
     # If no skin regions detected, return original image
-    if len(skin_r_values) == 0:
-        return image, 100
-
-    # Find average red threshold
-    num_values: int = 5
-    if len(skin_r_values) < num_values:
-        num_values = len(skin_r_values)
-
-    sorted_r: np.ndarray = np.sort(skin_r_values)
-    min_red_values: np.ndarray = sorted_r[:num_values]
-    max_red_values: np.ndarray = sorted_r[-num_values:]
-
-    avg_min_red: float = float(np.mean(min_red_values)) if num_values > 0 else 0.0
-    avg_max_red: float = float(np.mean(max_red_values)) if num_values > 0 else 0.0
-    average_red_threshold: float = (
-        avg_min_red + avg_max_red
-    ) / 2.0 + AVERAGE_RED_THRESHOLD_OFFSET
-
-    # Convert to HSV and extract hue channel
-    blurred_initial: np.ndarray = cv2.GaussianBlur(image_cv, (5, 5), 0)
-    hsv_initial: np.ndarray = cv2.cvtColor(blurred_initial, cv2.COLOR_BGR2HSV)
-    hue_channel: np.ndarray = hsv_initial[:, :, 0]
-
-    # Automatically find red hue ranges
-    lower_red_hue1, upper_red_hue1, lower_red_hue2, upper_red_hue2 = (
-        find_red_hue_ranges(hue_channel)
-    )
+    if image_rgb is None:
+        return image, score
+    return Image.fromarray(render_acne_overlay(image_rgb, contours)), score
 
-    # Define red ranges in HSV
-    lower_red1: np.ndarray = np.array([lower_red_hue1, 70, 50])
-    upper_red1: np.ndarray = np.array([upper_red_hue1, 255, 255])
-    lower_red2: np.ndarray = np.array([lower_red_hue2, 70, 50])
-    upper_red2: np.ndarray = np.array([upper_red_hue2, 255, 255])
-
-    # Create red masks
-    red_mask1: np.ndarray = cv2.inRange(hsv_initial, lower_red1, upper_red1)
-    red_mask2: np.ndarray = cv2.inRange(hsv_initial, lower_red2, upper_red2)
-    red_mask: np.ndarray = cv2.bitwise_or(red_mask1, red_mask2)
-
-    # Noise removal and smoothing
-    kernel: np.ndarray = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
-    acne_mask: np.ndarray = cv2.morphologyEx(red_mask, cv2.MORPH_OPEN, kernel)
-    acne_mask = cv2.morphologyEx(acne_mask, cv2.MORPH_CLOSE, kernel)
-    acne_mask = cv2.GaussianBlur(acne_mask, (5, 5), 0)
-
-    # Find contours
-    contours, _ = cv2.findContours(
-        acne_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
-    )
 
-    # Filter contours based on parameters
-    filtered_contours: list = []
-    for cnt in contours:
-        area: float = cv2.contourArea(cnt)
-        if not (MIN_AREA < area < MAX_AREA):
-            continue
+class AcneOutputOptions(BaseModel):
+    """
+    여드름 감지 결과 인코딩 옵션.
+
+    - format: jpeg / webp / png 이미지, 또는 polygons (이미지 없이 윤곽선 좌표만)
+    - quality: jpeg, webp 품질 (1~100, 기본값 75 는 기존 JPEG 응답과 같습니다)
+    - max_side: 0 보다 크면 긴 변이 이 길이가 되도록 줄인 미리보기 이미지를 만듭니다.
+    """
 
-        perimeter: float = cv2.arcLength(cnt, True)
-        if perimeter == 0:
-            continue
+    format: Literal["jpeg", "webp", "png", "polygons"] = "jpeg"
+    quality: int = Field(75, ge=1, le=100)
+    max_side: int = Field(0, ge=0)
 
-        circularity: float = 4 * np.pi * (area / (perimeter * perimeter))
-        if circularity < CIRCULARITY_THRESH:
-            continue
 
-        # Create mask for contour
-        contour_mask: np.ndarray = np.zeros(acne_mask.shape, dtype=np.uint8)
-        cv2.drawContours(contour_mask, [cnt], -1, 255, -1)  # type: ignore
+IMAGE_MEDIA_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp", "png": "image/png"}
 
-        # Extract border mask
-        border_mask: np.ndarray = cv2.subtract(
-            contour_mask, cv2.erode(contour_mask, kernel, iterations=1)
-        )
 
-        # Calculate average red value on border
-        border_mean_red: float = float(cv2.mean(r_channel, mask=border_mask)[0])
+def contour_polygons(contours: list, bbox: List[int]) -> List[List[List[int]]]:
+    """윤곽선을 원본 이미지 좌표의 [[x, y], ...] 목록으로 변환합니다."""
+    offset = np.array(bbox[:2], dtype=np.int32)
+    return [(cnt.reshape(-1, 2) + offset).tolist() for cnt in contours]
 
-        # Compare with average red threshold
-        if border_mean_red > average_red_threshold + BORDER_RED_DIFF_THRESH:
-            filtered_contours.append(cnt)
 
-    # Draw filtered contours on the result image
-    result_image: np.ndarray = image_cv.copy()
-    cv2.drawContours(result_image, filtered_contours, -1, (0, 255, 0), 2)
+def encode_image(image_rgb: np.ndarray, options: AcneOutputOptions) -> bytes:
+    buffered = io.BytesIO()
+    if options.format == "png":
+        Image.fromarray(image_rgb).save(buffered, format="PNG")
+    else:
+        Image.fromarray(image_rgb).save(
+            buffered, format=options.format.upper(), quality=options.quality
+        )
+    return buffered.getvalue()
 
-    # Convert OpenCV image back to PIL Image
-    result_image_rgb: np.ndarray = cv2.cvtColor(result_image, cv2.COLOR_BGR2RGB)
-    result_pil: Image.Image = Image.fromarray(result_image_rgb)
 
-    total_area: float = image_cv.shape[0] * image_cv.shape[1]
-    ance_percentage: float = (
-        sum([cv2.contourArea(cnt) for cnt in filtered_contours]) / total_area * 100
-    )
-    score: int = 100 - min(50, int(ance_percentage * 20))
+def process_acne_image(
+    contents: bytes,
+    bbox: List[int],
+    options: Optional[AcneOutputOptions] = None,
+    timings: Optional[Dict[str, float]] = None,
+) -> dict:
+    """
+    업로드된 이미지 바이트로 여드름을 감지하고 옵션에 맞게 결과를 인코딩합니다.
+    디코딩/감지/인코딩 모두 CPU 작업이므로 워커 풀에서 실행됩니다.
 
-    return result_pil, score
+    반환값: {"score", "image": 인코딩된 이미지 바이트} 또는 {"score", "polygons"}
+    timings 를 넘기면 디코딩, 감지 단계별, 인코딩 소요 시간(ms)을 채워줍니다.
+    """
+    options = options or AcneOutputOptions()
+    started = time.perf_counter()
+    image = np.asarray(open_image(contents).convert("RGB"))
+    decoded = time.perf_counter()
+    detection = acne_detector.detect(image, bbox)
+
+    if options.format == "polygons":
+        result = {
+            "score": detection.score,
+            "polygons": contour_polygons(detection.contours, bbox),
+        }
+    else:
+        # 피부가 감지되지 않으면 원본 이미지를 그대로 돌려줍니다.
+        image_rgb = image if detection.image is None else detection.image
+        overlay = render_acne_overlay(image_rgb, detection.contours, options.max_side)
+        result = {"score": detection.score, "image": encode_image(overlay, options)}
+
+    detected = decoded + sum(detection.timings.values()) / 1000
+    finished = time.perf_counter()
+    observe_stage("acne_detection", "decode", decoded - started)
+    observe_stage("acne_detection", "encode", finished - detected)
+    if timings is not None:
+        timings["decode"] = (decoded - started) * 1000
+        timings.update(detection.timings)
+        timings["encode"] = (finished - detected) * 1000
+    return result
+
+
+def to_json_result(result: dict) -> dict:
+    """process_acne_image 결과의 이미지 바이트를 JSON 응답용 Base64 문자열(processed_image)로 바꿉니다."""
+    result = dict(result)
+    image = result.pop("image", None)
+    if image is not None:
+        result["processed_image"] = base64.b64encode(image).decode("utf-8")
+    return result
+
+
+async def detect_acne_upload(
+    contents: bytes, bbox: List[int], options: Optional[AcneOutputOptions] = None
+) -> dict:
+    options = options or AcneOutputOptions()
+    cache_key = await acne_cache.make_key(contents, bbox, options.model_dump())
+    cached = await acne_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    async with worker_pool.admit("acne_detection"):
+        result = await worker_pool.run(process_acne_image, contents, bbox, options)
+    await acne_cache.set(cache_key, result)
+    return result
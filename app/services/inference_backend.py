@@ -0,0 +1,295 @@
+# services/inference_backend.py
+import copy
+import glob
+import inspect
+import io
+import os
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+from PIL import Image
+
+from core.config import settings
+from services.model_loader import inference_engine, trunk_areas
+from services.predict_resnet import build_prediction, preprocess_image
+
+BACKENDS = ("eager", "torchscript", "onnx")
+QUANTIZATIONS = ("none", "dynamic", "static")
+
+# trunk 인덱스 -> 적용된 backend 이름
+compiled_trunks: Dict[int, str] = {}
+# head 별 FP32 대비 최대 오차
+parity_report: Dict[str, float] = {}
+
+
+class OnnxRuntimeTrunk:
+    """ONNX Runtime 세션을 trunk 처럼 호출할 수 있게 감쌉니다."""
+
+    def __init__(self, model_bytes: bytes):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise RuntimeError(
+                "inference_backend=onnx requires the onnxruntime package"
+            )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            model_bytes, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, batch: torch.Tensor) -> torch.Tensor:
+        features = self.session.run(
+            None, {self.input_name: batch.detach().cpu().numpy()}
+        )[0]
+        return torch.from_numpy(features)
+
+
+def calibration_inputs(count: int) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    정적 양자화 보정에 쓸 입력 배치와, 그와 겹치지 않는 정확도 비교용 입력 배치를 만듭니다. (보정, 비교)
+
+    inference_calibration_dir 의 이미지(이미지 전체를 bbox 로 하여 실제 전처리를 거친 crop)를
+    정렬 순서대로 번갈아 보정/비교에 나누어 각각 최대 count 장씩 사용합니다.
+    정적 양자화는 보정 입력의 분포로 activation 범위를 정하므로 이미지가 2장 미만이면 거절하고,
+    그 외 모드(보정 입력은 trace 예시로만 쓰임)는 이미지가 없으면 서로 다른 고정 시드의 정규분포 입력을 사용합니다.
+    """
+    paths: List[str] = []
+    if settings.inference_calibration_dir:
+        for pattern in ("*.jpg", "*.jpeg", "*.png"):
+            paths += glob.glob(
+                os.path.join(settings.inference_calibration_dir, pattern)
+            )
+    tensors = []
+    for path in sorted(paths)[: count * 2]:
+        img = Image.open(path).convert("RGB")
+        tensors.append(preprocess_image(img, "", [0, 0, img.width, img.height]))
+
+    if settings.inference_quantization == "static" and len(tensors) < 2:
+        raise ValueError(
+            "inference_quantization=static requires at least 2 images "
+            "in inference_calibration_dir"
+        )
+    if len(tensors) >= 2:
+        return torch.cat(tensors[0::2], dim=0), torch.cat(tensors[1::2], dim=0)
+    if tensors:
+        return tensors[0], tensors[0]
+
+    print("No calibration images found, using random inputs")
+    calibration = torch.randn(
+        count, 3, 128, 128, generator=torch.Generator().manual_seed(0)
+    )
+    holdout = torch.randn(
+        count, 3, 128, 128, generator=torch.Generator().manual_seed(1)
+    )
+    return calibration, holdout
+
+
+def _quantize_static_fx(trunk: nn.Module, calibration: torch.Tensor) -> nn.Module:
+    """FX graph mode 정적 INT8 양자화 (x86 qconfig)"""
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    prepared = prepare_fx(
+        copy.deepcopy(trunk),
+        get_default_qconfig_mapping("x86"),
+        example_inputs=(calibration[:1],),
+    )
+    with torch.no_grad():
+        for chunk in calibration.split(8):
+            prepared(chunk)
+    return convert_fx(prepared)
+
+
+def _compile_torchscript(
+    trunk: nn.Module, calibration: torch.Tensor, quantization: str
+) -> nn.Module:
+    if quantization == "dynamic":
+        # torch 의 동적 양자화는 Linear/RNN 만 지원하고 trunk 에는 Conv 만 있습니다.
+        raise ValueError(
+            "Dynamic quantization is only supported with inference_backend=onnx"
+        )
+    if quantization == "static":
+        trunk = _quantize_static_fx(trunk, calibration)
+    with torch.no_grad():
+        traced = torch.jit.trace(trunk, calibration[:1])
+    return torch.jit.optimize_for_inference(torch.jit.freeze(traced.eval()))
+
+
+def _export_onnx(trunk: nn.Module, example: torch.Tensor) -> bytes:
+    buffer = io.BytesIO()
+    export_kwargs = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        # 최신 torch 의 dynamo exporter 대신 TorchScript 기반 exporter 를 사용합니다.
+        export_kwargs["dynamo"] = False
+    with torch.no_grad():
+        torch.onnx.export(
+            trunk,
+            (example,),
+            buffer,
+            input_names=["input"],
+            output_names=["features"],
+            dynamic_axes={"input": {0: "batch"}, "features": {0: "batch"}},
+            opset_version=17,
+            **export_kwargs,
+        )
+    return buffer.getvalue()
+
+
+def _quantize_onnx(
+    model_bytes: bytes, calibration: torch.Tensor, quantization: str
+) -> bytes:
+    from onnxruntime.quantization import (
+        CalibrationDataReader,
+        QuantFormat,
+        QuantType,
+        quantize_dynamic,
+        quantize_static,
+    )
+
+    class _Reader(CalibrationDataReader):
+        def __init__(self):
+            self.batches = iter(
+                [{"input": chunk.numpy()} for chunk in calibration.split(1)]
+            )
+
+        def get_next(self):
+            return next(self.batches, None)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        source = os.path.join(tmp_dir, "fp32.onnx")
+        target = os.path.join(tmp_dir, "int8.onnx")
+        with open(source, "wb") as f:
+            f.write(model_bytes)
+        if quantization == "dynamic":
+            quantize_dynamic(source, target, weight_type=QuantType.QInt8)
+        else:
+            quantize_static(
+                source,
+                target,
+                _Reader(),
+                quant_format=QuantFormat.QDQ,
+                activation_type=QuantType.QUInt8,
+                weight_type=QuantType.QInt8,
+            )
+        with open(target, "rb") as f:
+            return f.read()
+
+
+def _compile_onnx(trunk: nn.Module, calibration: torch.Tensor, quantization: str):
+    model_bytes = _export_onnx(trunk, calibration[:1])
+    if quantization != "none":
+        model_bytes = _quantize_onnx(model_bytes, calibration, quantization)
+    return OnnxRuntimeTrunk(model_bytes)
+
+
+def compile_trunk(trunk: nn.Module, calibration: torch.Tensor):
+    backend = settings.inference_backend
+    quantization = settings.inference_quantization
+    if backend == "torchscript":
+        return _compile_torchscript(trunk, calibration, quantization)
+    if backend == "onnx":
+        return _compile_onnx(trunk, calibration, quantization)
+    if quantization == "static":
+        return _quantize_static_fx(trunk, calibration)
+    if quantization == "dynamic":
+        raise ValueError(
+            "Dynamic quantization is only supported with inference_backend=onnx"
+        )
+    return trunk
+
+
+def check_parity(
+    inputs: torch.Tensor, trunk_indices: Optional[List[int]] = None
+) -> Dict[str, float]:
+    """
+    컴파일된 backend 와 FP32 eager 모델의 predict 응답 값을 비교합니다.
+
+    predict_image 와 같은 build_prediction 후처리(스케일링, softmax)를 거친 값을 비교하며,
+    head 별로 회귀값은 상대 오차, 분류는 확률의 최대 절대 오차를 반환합니다.
+    """
+    if trunk_indices is None:
+        trunk_indices = list(range(len(inference_engine.trunks)))
+
+    areas = dict.fromkeys(area for idx in trunk_indices for area in trunk_areas(idx))
+    diffs: Dict[str, float] = {}
+    for area_name in areas:
+        area_names = [area_name] * inputs.size(0)
+        expected = inference_engine.run_batch(area_names, inputs, eager=True)
+        actual = inference_engine.run_batch(area_names, inputs)
+        for expected_row, actual_row in zip(expected, actual):
+            fp32 = build_prediction(area_name, expected_row)
+            compiled = build_prediction(area_name, actual_row)
+            for label, value in (fp32.regression_values or {}).items():
+                diff = abs(value - compiled.regression_values[label]) / max(  # type: ignore
+                    1.0, abs(value)
+                )
+                key = f"regression/{label}"
+                diffs[key] = max(diffs.get(key, 0.0), diff)
+            for label, probs in (fp32.classification_probabilities or {}).items():
+                compiled_probs = compiled.classification_probabilities[label]  # type: ignore
+                diff = float(np.max(np.abs(np.array(probs) - np.array(compiled_probs))))
+                key = f"classification/{label}"
+                diffs[key] = max(diffs.get(key, 0.0), diff)
+    return diffs
+
+
+def apply_inference_backend():
+    """
+    설정된 backend 로 아직 컴파일되지 않은 trunk 들을 컴파일하고 FP32 대비 정확도를 확인합니다.
+
+    허용 오차(inference_parity_tolerance)를 넘는 head 가 있으면 해당 trunk 는 eager FP32 로 되돌립니다.
+    """
+    backend = settings.inference_backend
+    quantization = settings.inference_quantization
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend}")
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization mode: {quantization}")
+    if backend == "eager" and quantization == "none":
+        return
+
+    pending = [
+        idx for idx in range(len(inference_engine.trunks)) if idx not in compiled_trunks
+    ]
+    if not pending:
+        return
+
+    calibration, holdout = calibration_inputs(settings.inference_calibration_samples)
+    for idx in pending:
+        inference_engine.runners[idx] = compile_trunk(
+            inference_engine.trunks[idx], calibration
+        )
+        compiled_trunks[idx] = f"{backend}/{quantization}"
+
+    # 보정에 쓰지 않은 입력으로 비교해야 보정 분포에 과적합된 양자화를 걸러낼 수 있음
+    diffs = check_parity(holdout, pending)
+    parity_report.update(diffs)
+    for key, diff in diffs.items():
+        if diff <= settings.inference_parity_tolerance:
+            continue
+        kind, label = key.split("/", 1)
+        idx = inference_engine.heads[(kind, label)][0]
+        if compiled_trunks.get(idx) != "eager":
+            print(
+                f"Parity check failed for {key} (diff {diff:.4f}), "
+                f"falling back to eager FP32 for backbone {idx}"
+            )
+            inference_engine.runners[idx] = inference_engine.trunks[idx]
+            compiled_trunks[idx] = "eager"
+
+    print(f"Inference backend {backend}/{quantization}: {compiled_trunks}")
+
+
+def backend_stats() -> dict:
+    return {
+        "backend": settings.inference_backend,
+        "quantization": settings.inference_quantization,
+        "trunks": {str(idx): name for idx, name in compiled_trunks.items()},
+        "parity": parity_report,
+    }
@@ -0,0 +1,178 @@
+# services/inference_scheduler.py
+import asyncio
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import torch
+
+from core.config import settings
+from services import model_loader
+
+# 배치 크기 / 대기 시간 히스토그램 구간
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128]
+WAIT_MS_BUCKETS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000]
+
+
+@dataclass
+class _Job:
+    area_names: List[str]
+    batch: torch.Tensor
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+def _bucket(value: float, buckets: List[int]) -> str:
+    for upper in buckets:
+        if value <= upper:
+            return str(upper)
+    return "+Inf"
+
+
+class InferenceScheduler:
+    """
+    여러 요청의 crop을 짧은 시간 창(window) 동안 모아 한 번의 배치 forward로 처리합니다.
+
+    요청마다 batch size 1로 모델을 호출하는 대신, 먼저 들어온 요청부터 최대
+    max_wait_ms 동안 또는 max_batch_size 개의 crop이 모일 때까지 기다린 뒤
+    model_loader.run_batch 를 한 번 호출하고 결과를 요청별로 나눠 돌려줍니다.
+    엔진이 행(row)을 백본별로 나눠 실행하므로 서로 다른 부위/모델의 crop도 같이 묶입니다.
+    forward 는 이벤트 루프가 아닌 전용 스레드 하나에서 순서대로 실행됩니다.
+    (torch 가 연산 내부에서 여러 코어를 사용하므로 forward 를 동시에 여러 개 돌리지 않습니다.)
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[str], torch.Tensor], List[Dict]],
+        max_batch_size: int,
+        max_wait_ms: float,
+        enabled: bool = True,
+    ):
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.enabled = enabled
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="inference"
+        )
+
+        # 지표
+        self.queued_rows = 0
+        self.batches = 0
+        self.rows = 0
+        self.batch_size_histogram: Counter = Counter()
+        self.wait_ms_histogram: Counter = Counter()
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+
+    def start(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def submit(
+        self, area_names: List[str], batch: torch.Tensor
+    ) -> List[Dict[str, Dict[str, torch.Tensor]]]:
+        """crop 배치를 큐에 넣고, 묶음 forward가 끝나면 이 요청의 행들에 대한 출력을 반환합니다."""
+        loop = asyncio.get_running_loop()
+        if not self.enabled:
+            return await loop.run_in_executor(
+                self._executor, self.run_batch, area_names, batch
+            )
+
+        self.start()
+        job = _Job(area_names=area_names, batch=batch, future=loop.create_future())
+        self.queued_rows += len(area_names)
+        self._queue.put_nowait(job)  # type: ignore
+        return await job.future
+
+    async def _collect(self) -> List[_Job]:
+        """첫 요청이 들어온 시점부터 시간 창이 끝나거나 배치가 가득 찰 때까지 요청을 모읍니다."""
+        queue = self._queue
+        jobs = [await queue.get()]  # type: ignore
+        rows = len(jobs[0].area_names)
+        deadline = time.perf_counter() + self.max_wait_ms / 1000
+        while rows < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                job = await asyncio.wait_for(queue.get(), timeout)  # type: ignore
+            except asyncio.TimeoutError:
+                break
+            jobs.append(job)
+            rows += len(job.area_names)
+        return jobs
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            jobs = await self._collect()
+            started = time.perf_counter()
+
+            area_names: List[str] = []
+            for job in jobs:
+                area_names.extend(job.area_names)
+                wait_ms = (started - job.enqueued_at) * 1000
+                self.wait_ms_total += wait_ms
+                self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+                self.wait_ms_histogram[_bucket(wait_ms, WAIT_MS_BUCKETS)] += 1
+            self.queued_rows -= len(area_names)
+            self.batches += 1
+            self.rows += len(area_names)
+            self.batch_size_histogram[_bucket(len(area_names), BATCH_SIZE_BUCKETS)] += 1
+
+            try:
+                batch = torch.cat([job.batch for job in jobs], dim=0)
+                outputs = await loop.run_in_executor(
+                    self._executor, self.run_batch, area_names, batch
+                )
+            except Exception as e:
+                for job in jobs:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+                continue
+
+            offset = 0
+            for job in jobs:
+                count = len(job.area_names)
+                if not job.future.done():
+                    job.future.set_result(outputs[offset : offset + count])
+                offset += count
+
+    def stats(self) -> dict:
+        waits = sum(self.wait_ms_histogram.values())
+        return {
+            "enabled": self.enabled,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "queue_depth": self.queued_rows,
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_size": self.rows / self.batches if self.batches else 0.0,
+            "batch_size_histogram": dict(self.batch_size_histogram),
+            "wait_ms_mean": self.wait_ms_total / waits if waits else 0.0,
+            "wait_ms_max": self.wait_ms_max,
+            "wait_ms_histogram": dict(self.wait_ms_histogram),
+        }
+
+
+inference_scheduler = InferenceScheduler(
+    model_loader.run_batch,
+    max_batch_size=settings.inference_max_batch_size,
+    max_wait_ms=settings.inference_batch_window_ms,
+    enabled=settings.inference_batching_enabled,
+)
@@ -1,69 +1,403 @@
 # services/model_loader.py
 
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pprint import pprint
-from typing import Dict
+from typing import Callable, Dict, List, Optional, Tuple
+import psutil
 import torch
 import torch.nn as nn
 from torchvision import models
 from core.config import settings
+from core.metrics import StageTimer
 import numpy as np
 from data.class_labels import regression_labels, class_labels
 
-
 classification_models = {}
 regression_models = {}
 
+HeadKey = Tuple[str, str]  # ("regression" | "classification", label)
 
-def load_models():
-    global classification_models, regression_models
+
+class SharedBackboneEngine:
+    """
+    부위(area)별 모든 헤드를 백본(trunk) 단위로 묶어서 추론합니다.
+
+    각 ResNet50에서 fc를 제외한 부분을 trunk로, fc를 head로 분리합니다.
+    가중치가 동일한 trunk는 하나로 합치고, 같은 trunk를 쓰는 head들의 fc 가중치를
+    하나의 행렬로 쌓아서 crop 당 trunk forward 한 번 + 행렬곱 한 번으로 모든 헤드를 계산합니다.
+    trunk가 서로 다른 체크포인트는 각자 한 번씩 forward 됩니다.
+
+    runners[i] 는 trunks[i] 를 실제로 실행하는 callable 입니다. 기본값은 eager 모듈 자체이며,
+    services/inference_backend 가 TorchScript/ONNX Runtime 으로 컴파일한 것으로 교체합니다.
+    """
+
+    def __init__(self):
+        self.trunks: List[nn.Module] = []
+        self.runners: List[Callable[[torch.Tensor], torch.Tensor]] = []
+        self.heads: Dict[HeadKey, Tuple[int, nn.Linear]] = {}
+        self._stacked_heads: Dict[Tuple[HeadKey, ...], Tuple] = {}
+
+    def add_model(self, kind: str, label: str, model: nn.Module):
+        """체크포인트를 로드한 ResNet50을 trunk와 head로 나누어 등록합니다."""
+        # ResNet.forward 와 동일한 순서: conv1 ... avgpool -> flatten -> fc
+        trunk = nn.Sequential(*list(model.children())[:-1], nn.Flatten(1))
+        trunk.eval()
+        trunk_idx = self._find_trunk(trunk)
+        if trunk_idx is None:
+            self.trunks.append(trunk)
+            self.runners.append(trunk)
+            trunk_idx = len(self.trunks) - 1
+        self.heads[(kind, label)] = (trunk_idx, model.fc)
+        self._stacked_heads.clear()
+
+    def _find_trunk(self, trunk: nn.Module) -> Optional[int]:
+        """이미 등록된 trunk 중 가중치가 완전히 같은 것이 있으면 그 인덱스를 반환합니다."""
+        new_state = trunk.state_dict()
+        for idx, existing in enumerate(self.trunks):
+            existing_state = existing.state_dict()
+            if existing_state.keys() != new_state.keys():
+                continue
+            if all(
+                torch.equal(existing_state[name], new_state[name]) for name in new_state
+            ):
+                return idx
+        return None
+
+    def area_heads(self, area_name: str) -> List[HeadKey]:
+        keys = [("regression", label) for label in regression_labels.get(area_name, [])]
+        keys += [("classification", label) for label in class_labels.get(area_name, [])]
+        return [key for key in keys if key in self.heads]
+
+    def _stacked_head(
+        self, keys: Tuple[HeadKey, ...]
+    ) -> Tuple[torch.Tensor, torch.Tensor, Dict[HeadKey, slice]]:
+        """여러 head의 fc 가중치를 하나로 쌓고, head별 출력 구간을 함께 반환합니다."""
+        cached = self._stacked_heads.get(keys)
+        if cached is not None:
+            return cached
+
+        linears = [self.heads[key][1] for key in keys]
+        weight = torch.cat([linear.weight.detach() for linear in linears], dim=0)
+        bias = torch.cat([linear.bias.detach() for linear in linears], dim=0)
+
+        slices = {}
+        start = 0
+        for key, linear in zip(keys, linears):
+            slices[key] = slice(start, start + linear.out_features)
+            start += linear.out_features
+
+        self._stacked_heads[keys] = (weight, bias, slices)
+        return weight, bias, slices
+
+    @torch.no_grad()
+    def run_batch(
+        self, area_names: List[str], batch: torch.Tensor, eager: bool = False
+    ) -> List[Dict[str, Dict[str, torch.Tensor]]]:
+        """
+        batch[i] 에 대해 area_names[i] 부위의 모든 head 출력을 계산합니다.
+        eager=True 이면 컴파일된 runner 대신 원본 FP32 trunk 를 사용합니다.
+
+        Returns:
+            행(row)마다 {"regression": {label: logits}, "classification": {label: logits}}
+        """
+        outputs: List[Dict[str, Dict[str, torch.Tensor]]] = [
+            {"regression": {}, "classification": {}} for _ in area_names
+        ]
+
+        # trunk 별로 필요한 행과 head 목록을 모읍니다.
+        row_heads = [
+            [(key, self.heads[key][0]) for key in self.area_heads(area_name)]
+            for area_name in area_names
+        ]
+        plans: Dict[int, Tuple[List[int], List[HeadKey]]] = {}
+        for row, heads in enumerate(row_heads):
+            for key, trunk_idx in heads:
+                rows, keys = plans.setdefault(trunk_idx, ([], []))
+                if not rows or rows[-1] != row:
+                    rows.append(row)
+                if key not in keys:
+                    keys.append(key)
+
+        # 백본별 forward 와 head 행렬곱 시간을 /metrics 에 기록합니다.
+        timer = StageTimer("inference")
+        for trunk_idx, (rows, keys) in plans.items():
+            inputs = batch if len(rows) == batch.size(0) else batch[rows]
+            runner = self.trunks[trunk_idx] if eager else self.runners[trunk_idx]
+            features = runner(inputs)
+            timer.mark(f"backbone_{trunk_idx}")
+            weight, bias, slices = self._stacked_head(tuple(keys))
+            logits = nn.functional.linear(features, weight, bias)
+            timer.mark("heads")
+            for i, row in enumerate(rows):
+                for key, head_trunk_idx in row_heads[row]:
+                    if head_trunk_idx != trunk_idx:
+                        continue
+                    kind, label = key
+                    outputs[row][kind][label] = logits[i, slices[key]]
+
+        return outputs
+
+
+inference_engine = SharedBackboneEngine()
+
+
+# 체크포인트별 로드 시간/크기 기록
+load_report: Dict[str, dict] = {}
+_attempted: set = set()
+_load_lock = threading.Lock()
+
+CHECKPOINT_DIRS = {"regression": "regression", "classification": "class"}
+
+
+def _rss_mb() -> float:
+    return psutil.Process().memory_info().rss / 1024 / 1024
+
+
+def _read_checkpoint(path: str, device: torch.device) -> dict:
+    """mmap 으로 체크포인트를 읽어 파일 전체를 메모리에 올리지 않습니다. (구 포맷은 일반 로드)"""
+    try:
+        return torch.load(path, map_location=device, weights_only=True, mmap=True)
+    except RuntimeError:
+        return torch.load(path, map_location=device, weights_only=True)
+
+
+def _shared_store_path(kind: str, label: str, checkpoint_path: str) -> str:
+    # 원본 체크포인트가 바뀌면 다른 파일을 쓰도록 mtime/크기를 파일명에 포함합니다.
+    stat = os.stat(checkpoint_path)
+    return os.path.join(
+        settings.model_shm_dir,
+        CHECKPOINT_DIRS[kind],
+        f"{label}-{stat.st_mtime_ns}-{stat.st_size}.pt",
+    )
+
+
+def _read_shared_checkpoint(kind: str, label: str, checkpoint_path: str) -> dict:
+    """
+    공유 메모리(/dev/shm 등 tmpfs) 가중치 저장소에서 체크포인트를 읽습니다.
+
+    저장소에 파일이 없으면 원본에서 model_state 만 뽑아 저장한 뒤, 저장소 파일을 mmap 으로 로드합니다.
+    모든 워커 프로세스가 같은 tmpfs 파일을 읽기 전용으로 매핑하므로 가중치 메모리는 워커 수와 무관하게 한 벌만 사용됩니다.
+    """
+    store_path = _shared_store_path(kind, label, checkpoint_path)
+    if not os.path.exists(store_path):
+        checkpoint = _read_checkpoint(checkpoint_path, torch.device("cpu"))
+        if "model_state" not in checkpoint:
+            raise ValueError("Invalid checkpoint file")
+        os.makedirs(os.path.dirname(store_path), exist_ok=True)
+        # 여러 워커가 동시에 시작해도 완성된 파일만 보이도록 임시 파일에 쓰고 rename 합니다.
+        tmp_path = f"{store_path}.{os.getpid()}.tmp"
+        torch.save({"model_state": checkpoint["model_state"]}, tmp_path)
+        os.replace(tmp_path, store_path)
+    return torch.load(store_path, map_location="cpu", weights_only=True, mmap=True)
+
+
+def _load_checkpoint_model(
+    kind: str, label: str, device: torch.device
+) -> Optional[nn.Module]:
+    """
+    체크포인트 하나를 ResNet50 으로 로드합니다.
+
+    모듈은 meta device 에서 생성하여 랜덤 초기화 가중치를 만들지 않고,
+    load_state_dict(assign=True) 로 체크포인트 텐서를 그대로 파라미터로 사용합니다.
+    """
+    checkpoint_path = f"{settings.checkpoint_dir}/{CHECKPOINT_DIRS[kind]}/{settings.model_version}/save_model/{label}/state_dict.bin"
+    started = time.perf_counter()
+    try:
+        if settings.model_shm_dir and device.type == "cpu":
+            checkpoint = _read_shared_checkpoint(kind, label, checkpoint_path)
+        else:
+            checkpoint = _read_checkpoint(checkpoint_path, device)
+    except FileNotFoundError:
+        print(f"No {kind} model found: {label}")
+        return None
+    if "model_state" not in checkpoint:
+        raise ValueError("Invalid checkpoint file")
+    state = checkpoint["model_state"]
+    output_size = state["fc.weight"].size(0) if kind == "classification" else 1
+
+    with torch.device("meta"):
+        model = models.resnet50()
+        model.fc = nn.Linear(model.fc.in_features, output_size)
+    model.load_state_dict(state, assign=True)
+    model.eval()
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    param_mb = sum(
+        t.numel() * t.element_size()
+        for t in list(model.parameters()) + list(model.buffers())
+    )
+    load_report[f"{kind}/{label}"] = {
+        "load_ms": round(elapsed_ms, 1),
+        "size_mb": round(param_mb / 1024 / 1024, 1),
+    }
+    print(f"Loaded {kind} model: {label} ({elapsed_ms:.0f} ms)")
+    return model
+
+
+def _register_model(kind: str, label: str, model: nn.Module):
+    if kind == "regression":
+        regression_models[label] = model
+    else:
+        classification_models[label] = model
+    inference_engine.add_model(kind, label, model)
+
+
+def _load_many(pairs: List[HeadKey]):
+    """
+    (kind, label) 목록을 병렬로 로드하고, 로드된 순서와 무관하게 같은 순서로 엔진에 등록합니다.
+
+    로드가 끝난 것(체크포인트가 없어 None 인 경우 포함)만 _attempted 에 기록합니다.
+    예외가 난 것은 기록하지 않아 다음 요청에서 다시 시도하며, 나머지를 등록한 뒤 첫 예외를 다시 던집니다.
+    """
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    pairs = [pair for pair in pairs if pair not in _attempted]
+    if not pairs:
+        return
+
+    def load(pair: HeadKey) -> Tuple[Optional[nn.Module], Optional[Exception]]:
+        try:
+            return _load_checkpoint_model(*pair, device), None
+        except Exception as e:
+            return None, e
 
-    # Load regression models
-    regression_values = list(
+    with ThreadPoolExecutor(max_workers=settings.model_load_workers) as executor:
+        loaded = list(executor.map(load, pairs))
+    errors = []
+    for (kind, label), (model, error) in zip(pairs, loaded):
+        if error is not None:
+            print(f"Failed to load {kind} model: {label} ({error})")
+            errors.append(error)
+            continue
+        _attempted.add((kind, label))
+        if model is not None:
+            _register_model(kind, label, model)
+    if errors:
+        raise errors[0]
+
+
+def _all_heads() -> List[HeadKey]:
+    regression_values = sorted(
         set(value for values in regression_labels.values() for value in values)
     )
-    for regression_value in regression_values:
-        regression_checkpoint_path = f"{settings.checkpoint_dir}/regression/initialResNet/save_model/{regression_value}/state_dict.bin"
-        try:
-            regression_model = models.resnet50()
-            num_ftrs = regression_model.fc.in_features
-            regression_model.fc = nn.Linear(num_ftrs, 1)
-            checkpoint = torch.load(
-                regression_checkpoint_path, map_location=device, weights_only=True
-            )
-            regression_model.load_state_dict(checkpoint["model_state"])
-            regression_model.to(device)
-            regression_model.eval()
-            regression_models[regression_value] = regression_model
-            print(f"Loaded regression model: {regression_value}")
-        except FileNotFoundError:
-            print(f"No regression model found: {regression_value}")
-
-    # Load classification models
-    class_values = list(
+    class_values = sorted(
         set(value for values in class_labels.values() for value in values)
     )
-    for class_value in class_values:
-        classification_checkpoint_path = f"{settings.checkpoint_dir}/class/initialResNet/save_model/{class_value}/state_dict.bin"
-        try:
-            classification_model = models.resnet50()
-            num_ftrs = classification_model.fc.in_features
-            checkpoint = torch.load(
-                classification_checkpoint_path, map_location=device, weights_only=True
-            )
-            if "model_state" in checkpoint:
-                output_size = checkpoint["model_state"]["fc.weight"].size(0)
-            else:
-                raise ValueError("Invalid checkpoint file")
-
-            classification_model.fc = nn.Linear(num_ftrs, output_size)
-            classification_model.load_state_dict(checkpoint["model_state"])
-            classification_model.to(device)
-            classification_model.eval()
-            classification_models[class_value] = classification_model
-            print(f"Loaded classification model: {class_value}")
-        except FileNotFoundError:
-            print(f"No classification model found: {class_value}")
+    return [("regression", value) for value in regression_values] + [
+        ("classification", value) for value in class_values
+    ]
+
+
+def load_models():
+    """
+    서버 시작 시 호출됩니다.
+
+    model_lazy_load 가 켜져 있으면 아무 모델도 읽지 않고, 각 부위가 처음 요청될 때
+    해당 부위의 모델만 로드합니다. (ensure_models_for_areas)
+    """
+    if settings.model_lazy_load:
+        print("Lazy model loading enabled: models load on first use of each area")
+        return
+
+    rss_before = _rss_mb()
+    started = time.perf_counter()
+    _load_many(_all_heads())
+    print(
+        f"Loaded {len(load_report)} models in {time.perf_counter() - started:.1f}s, "
+        f"RSS {rss_before:.0f}MB -> {_rss_mb():.0f}MB"
+    )
+    print(
+        f"Inference engine: {len(inference_engine.heads)} heads on "
+        f"{len(inference_engine.trunks)} distinct backbones"
+    )
+
+
+def share_model_memory():
+    """
+    로드된 모든 가중치를 공유 메모리로 옮깁니다.
+
+    gunicorn 의 preload_app 처럼 워커를 fork 하기 전에 마스터 프로세스에서 모델을 로드하는 경우에 사용합니다.
+    공유 메모리로 옮긴 텐서는 fork 이후에도 복사되지 않고 모든 워커가 같은 페이지를 사용합니다.
+    워커의 startup_event 에서 다시 load_models() 를 호출해도 이미 로드된 모델은 건너뜁니다.
+
+    gunicorn.conf.py 예시:
+        preload_app = True
+
+        def on_starting(server):
+            from services.model_loader import preload_models
+            preload_models()
+    """
+    for trunk in inference_engine.trunks:
+        trunk.share_memory()
+    for _, head in inference_engine.heads.values():
+        head.share_memory()
+
+
+def preload_models():
+    load_models()
+    if not settings.model_shm_dir:
+        # 공유 메모리 저장소를 쓰는 경우 이미 tmpfs 파일에 매핑되어 있으므로 옮기지 않습니다.
+        share_model_memory()
+
+
+def ensure_models_for_areas(area_names: List[str]):
+    """지연 로딩 모드에서 주어진 부위들의 모델이 아직 없으면 로드합니다."""
+    pairs = []
+    for area_name in dict.fromkeys(area_names):
+        pairs += [
+            ("regression", label) for label in regression_labels.get(area_name, [])
+        ]
+        pairs += [
+            ("classification", label) for label in class_labels.get(area_name, [])
+        ]
+    if all(pair in _attempted for pair in pairs):
+        return
+    with _load_lock:
+        _load_many(pairs)
+        if (
+            settings.inference_backend != "eager"
+            or settings.inference_quantization != "none"
+        ):
+            # 새로 로드된 trunk 만 컴파일합니다. (순환 import 방지를 위해 지연 import)
+            from services.inference_backend import apply_inference_backend
+
+            apply_inference_backend()
+
+
+def run_batch(
+    area_names: List[str], batch: torch.Tensor
+) -> List[Dict[str, Dict[str, torch.Tensor]]]:
+    """추론 스케줄러가 호출하는 진입점. 지연 로딩 모드면 필요한 모델을 먼저 로드합니다."""
+    if settings.model_lazy_load:
+        ensure_models_for_areas(area_names)
+    return inference_engine.run_batch(area_names, batch)
+
+
+def trunk_areas(trunk_idx: int) -> List[str]:
+    """해당 trunk 를 사용하는 head 가 있는 부위 목록"""
+    areas = dict.fromkeys(list(regression_labels) + list(class_labels))
+    return [
+        area_name
+        for area_name in areas
+        if any(
+            inference_engine.heads[key][0] == trunk_idx
+            for key in inference_engine.area_heads(area_name)
+        )
+    ]
+
+
+def load_stats() -> dict:
+    memory = psutil.Process().memory_info()
+    return {
+        "lazy": settings.model_lazy_load,
+        "shared_store": settings.model_shm_dir or None,
+        "rss_mb": round(memory.rss / 1024 / 1024, 1),
+        "shared_mb": round(getattr(memory, "shared", 0) / 1024 / 1024, 1),
+        "models": load_report,
+        "backbones": len(inference_engine.trunks),
+    }
 
 
 def get_classification_model(area_name: str):
@@ -1,16 +1,23 @@
 # services/predict_resnet.py
 from pprint import pprint
-from typing import Dict
-from torchvision import transforms
+from typing import Dict, List
 from PIL import Image
 
 from fastapi import UploadFile
-from services.model_loader import get_classification_model, get_regression_models
-from schemas.prediction import PredictionResponse
+from core.metrics import StageTimer
+from services.inference_scheduler import inference_scheduler
+from services.preprocessing import (
+    TARGET_SIZE,
+    crop_view,
+    preprocess_crops,
+    resize_crop,
+)
+from services.upload import decode_for_crops, read_upload
+from services.result_cache import prediction_cache
+from services.worker_pool import worker_pool
+from schemas.prediction import FacePredictionResponse, PredictionResponse
 from data.class_labels import class_labels, regression_labels
 import torch
-from PIL import Image
-import io
 import numpy as np
 
 
@@ -20,113 +27,146 @@ def crop_and_resize(
     """
     이미지의 바운딩 박스(bbox)를 기준으로 중앙을 정렬하여 정사각형으로 크롭하고 리사이즈합니다.
     """
-    img_cv = np.array(img)  # PIL 이미지를 OpenCV 형식으로 변환
-    center_bbox = [(bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2]
-    center_bbox = list(map(int, center_bbox))
-
-    # 바운딩 박스에서 가장 긴 변을 기준으로 정사각형 영역을 구합니다.
-    width = bbox[2] - bbox[0]
-    height = bbox[3] - bbox[1]
-    crop_length = int(max(width, height) / 2)
-
-    # 이미지 크롭 (중앙을 기준으로 크롭)
-    cropped_img = img_cv[
-        max(center_bbox[1] - crop_length, 0) : min(
-            center_bbox[1] + crop_length, img_cv.shape[0]
-        ),
-        max(center_bbox[0] - crop_length, 0) : min(
-            center_bbox[0] + crop_length, img_cv.shape[1]
-        ),
-    ]
-
-    # 크롭된 이미지를 다시 PIL 이미지로 변환하고, 정사각형으로 리사이즈합니다.
-    cropped_img_pil = Image.fromarray(cropped_img)
-
-    resized_img = cropped_img_pil.resize((target_size, target_size))
-
-    return resized_img
+    crop = crop_view(np.asarray(img), bbox)
+    return Image.fromarray(resize_crop(crop, target_size))
 
 
 def preprocess_image(img: Image.Image, area_name: str, bbox: list):
-    cropped_img = crop_and_resize(img, bbox)
-    if area_name == "r_cheek" or area_name == "r_perocular":
-        cropped_img = cropped_img.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
-    # 정규화 추가
-    preprocess = transforms.Compose(
-        [
-            transforms.ToTensor(),
-            transforms.Normalize(
-                mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]  # ImageNet 평균
-            ),  # ImageNet 표준편차
-        ]
-    )
+    return preprocess_crops(np.asarray(img), [(area_name, bbox)])
 
-    input_tensor = preprocess(cropped_img)
-    input_tensor = input_tensor.unsqueeze(0)  # type: ignore
-    return input_tensor
 
+def preprocess_face(img: np.ndarray, bboxes: Dict[str, list]) -> torch.Tensor:
+    """
+    디코딩된 얼굴 이미지 한 장에서 여러 부위를 크롭하여 (부위 수, 3, 128, 128) 배치 텐서로 만듭니다.
+    """
+    return preprocess_crops(img, list(bboxes.items()))
 
-async def predict_image(
-    area_name: str, file: UploadFile, bbox: list
-) -> PredictionResponse:
-    classification_model = get_classification_model(area_name)
-    regression_models = get_regression_models(area_name)
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
-    contents = await file.read()
-    try:
-        img = Image.open(io.BytesIO(contents)).convert("RGB")
-    except Exception:
-        raise ValueError("Invalid image format")
+SCALING_FACTORS = {
+    "elasticity": 1,
+    "moisture": 100,
+    "wrinkle": 50,
+    "pigmentation": 350,
+    "pore": 2600,
+}
 
-    try:
-        input_tensor = preprocess_image(img, area_name, bbox)
-        input_tensor = input_tensor.to(device)
-    except ValueError as e:
-        raise ValueError(str(e))
-    scaling_factors = {
-        "elasticity": 1,
-        "moisture": 100,
-        "wrinkle": 50,
-        "pigmentation": 350,
-        "pore": 2600,
-    }
 
+def build_prediction(
+    area_name: str, outputs: Dict[str, Dict[str, torch.Tensor]]
+) -> PredictionResponse:
+    """엔진이 계산한 head별 출력을 스케일링/softmax 하여 응답 형태로 변환합니다."""
     response = {}
     regression_values_for_area = regression_labels.get(area_name, [])
     if regression_values_for_area:
         regression_values: Dict[str, float] = {}
         for regression_value in regression_values_for_area:
-            regression_model = regression_models.get(regression_value)
-            if regression_model is None:
+            reg_output = outputs["regression"].get(regression_value)
+            if reg_output is None:
                 print(f"No regression model loaded for {regression_value}")
                 continue
-            with torch.no_grad():
-                reg_output = regression_model(input_tensor)
-                # 스케일링 팩터 적용
-                scaled_output = reg_output.cpu().item() * scaling_factors.get(
-                    regression_value, 1
-                )
+            # 스케일링 팩터 적용
+            scaled_output = reg_output.cpu().item() * SCALING_FACTORS.get(
+                regression_value, 1
+            )
             regression_values[regression_value] = float(scaled_output)
         response["regression_values"] = regression_values
     class_values_for_area = class_labels.get(area_name, [])
     if class_values_for_area:
         class_values: Dict[str, str] = {}
         for class_value in class_values_for_area:
-            class_model = classification_model.get(class_value)
-            if class_model is None:
+            class_output = outputs["classification"].get(class_value)
+            if class_output is None:
                 print(f"No classification model loaded for {class_value}")
                 continue
-            with torch.no_grad():
-                class_output = class_model(input_tensor)
-                class_output = torch.nn.functional.softmax(class_output, dim=1)
-                class_output = class_output.cpu().numpy()
-                class_output = class_output[0]
-                class_output = class_output.tolist()
-                class_values[class_value] = class_output
+            class_output = torch.nn.functional.softmax(class_output, dim=0)
+            class_values[class_value] = class_output.cpu().numpy().tolist()
         response["classification_probabilities"] = class_values
 
     if not response:
         raise ValueError("No available models for the given area")
 
     return PredictionResponse(**response)
+
+
+def prepare_area_input(contents: bytes, area_name: str, bbox: list) -> torch.Tensor:
+    """이미지 디코딩과 전처리. 워커 풀에서 실행됩니다."""
+    timer = StageTimer("predict")
+    image, (bbox,) = decode_for_crops(contents, [bbox], TARGET_SIZE)
+    timer.mark("decode")
+    batch = preprocess_crops(image, [(area_name, bbox)])
+    timer.mark("preprocess")
+    return batch
+
+
+def prepare_face_input(contents: bytes, bboxes: Dict[str, list]) -> torch.Tensor:
+    """이미지 디코딩과 부위별 전처리. 워커 풀에서 실행됩니다."""
+    timer = StageTimer("predict_face")
+    area_names = list(bboxes.keys())
+    image, scaled_bboxes = decode_for_crops(
+        contents, list(bboxes.values()), TARGET_SIZE
+    )
+    timer.mark("decode")
+    batch = preprocess_face(image, dict(zip(area_names, scaled_bboxes)))
+    timer.mark("preprocess")
+    return batch
+
+
+async def predict_image(
+    area_name: str, file: UploadFile, bbox: list
+) -> PredictionResponse:
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+    contents = await read_upload(file)
+    cache_key = await prediction_cache.make_key(contents, area_name, bbox)
+    cached = await prediction_cache.get(cache_key)
+    if cached is not None:
+        return PredictionResponse(**cached)
+
+    async with worker_pool.admit("predict"):
+        input_tensor = await worker_pool.run(
+            prepare_area_input, contents, area_name, bbox
+        )
+        input_tensor = input_tensor.to(device)
+
+        # 부위의 모든 head를 공유 백본으로 한 번에 계산 (다른 요청과 함께 배치 처리)
+        outputs = (await inference_scheduler.submit([area_name], input_tensor))[0]
+    result = build_prediction(area_name, outputs)
+    await prediction_cache.set(cache_key, result.model_dump())
+    return result
+
+
+async def predict_face(
+    file: UploadFile, bboxes: Dict[str, list]
+) -> FacePredictionResponse:
+    """
+    한 장의 얼굴 이미지로 모든 부위를 한 번에 예측합니다.
+
+    부위별 crop을 하나의 배치로 쌓아 각 백본을 배치 단위로 한 번만 실행합니다.
+    """
+    if not bboxes:
+        raise ValueError("No areas given")
+    for area_name in bboxes:
+        if area_name not in class_labels and area_name not in regression_labels:
+            raise ValueError(f"Unknown area: {area_name}")
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    area_names: List[str] = list(bboxes.keys())
+
+    contents = await read_upload(file)
+    cache_key = await prediction_cache.make_key(contents, "face", bboxes)
+    cached = await prediction_cache.get(cache_key)
+    if cached is not None:
+        return FacePredictionResponse(**cached)
+
+    async with worker_pool.admit("predict_face"):
+        batch = await worker_pool.run(prepare_face_input, contents, bboxes)
+        batch = batch.to(device)
+
+        outputs = await inference_scheduler.submit(area_names, batch)
+    results = {
+        area_name: build_prediction(area_name, area_outputs)
+        for area_name, area_outputs in zip(area_names, outputs)
+    }
+    response = FacePredictionResponse(results=results)
+    await prediction_cache.set(cache_key, response.model_dump())
+    return response
@@ -0,0 +1,66 @@
+# services/preprocessing.py
+from typing import List, Tuple
+
+import numpy as np
+import torch
+from PIL import Image
+
+TARGET_SIZE = 128
+
+# ImageNet 평균 / 표준편차 (한 번만 만들어 재사용)
+IMAGENET_MEAN = torch.tensor([0.485, 0.456, 0.406], dtype=torch.float32).view(
+    1, 3, 1, 1
+)
+IMAGENET_STD = torch.tensor([0.229, 0.224, 0.225], dtype=torch.float32).view(1, 3, 1, 1)
+
+# 좌우 반전해서 모델에 넣는 부위
+FLIPPED_AREAS = {"r_cheek", "r_perocular"}
+
+
+def crop_bounds(shape: Tuple[int, ...], bbox: list) -> Tuple[int, int, int, int]:
+    """
+    bbox 중심을 기준으로 가장 긴 변 길이의 정사각형 영역을 이미지 범위 안으로 잘라 (top, bottom, left, right)로 반환합니다.
+    """
+    center_x = int((bbox[0] + bbox[2]) / 2)
+    center_y = int((bbox[1] + bbox[3]) / 2)
+    crop_length = int(max(bbox[2] - bbox[0], bbox[3] - bbox[1]) / 2)
+    top = max(center_y - crop_length, 0)
+    bottom = min(center_y + crop_length, shape[0])
+    left = max(center_x - crop_length, 0)
+    right = min(center_x + crop_length, shape[1])
+    return top, bottom, left, right
+
+
+def crop_view(image: np.ndarray, bbox: list) -> np.ndarray:
+    """복사 없이 슬라이싱으로 crop 영역의 view 를 반환합니다."""
+    top, bottom, left, right = crop_bounds(image.shape, bbox)
+    return image[top:bottom, left:right]
+
+
+def resize_crop(crop: np.ndarray, target_size: int = TARGET_SIZE) -> np.ndarray:
+    # 기존 파이프라인과 같은 값을 내기 위해 리사이즈는 PIL(bicubic)을 그대로 사용합니다.
+    resized = Image.fromarray(crop).resize((target_size, target_size))
+    return np.asarray(resized)
+
+
+def normalize_batch(crops: np.ndarray) -> torch.Tensor:
+    """(N, H, W, 3) uint8 crop 배치를 (N, 3, H, W) 정규화 텐서로 변환합니다. (ToTensor + Normalize 와 동일)"""
+    batch = torch.from_numpy(crops).permute(0, 3, 1, 2).to(torch.float32).div_(255)
+    return batch.sub_(IMAGENET_MEAN).div_(IMAGENET_STD)
+
+
+def preprocess_crops(
+    image: np.ndarray, areas: List[Tuple[str, list]], target_size: int = TARGET_SIZE
+) -> torch.Tensor:
+    """
+    디코딩된 이미지 하나에서 여러 (부위, bbox) 를 crop/리사이즈/정규화하여 하나의 배치 텐서로 만듭니다.
+    r_cheek, r_perocular 는 텐서 상에서 좌우 반전합니다.
+    """
+    crops = np.stack(
+        [resize_crop(crop_view(image, bbox), target_size) for _, bbox in areas]
+    )
+    batch = normalize_batch(crops)
+    flip_rows = [row for row, (area, _) in enumerate(areas) if area in FLIPPED_AREAS]
+    if flip_rows:
+        batch[flip_rows] = batch[flip_rows].flip(-1)
+    return batch
@@ -0,0 +1,500 @@
+# services/product_catalog.py
+import asyncio
+import hashlib
+import numbers
+import time
+from collections import Counter, defaultdict
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from bson import json_util
+from pymongo.errors import PyMongoError
+from scipy import sparse
+
+from core.config import settings
+from db.database import get_db
+
+db = get_db()
+
+PRODUCTS_COLLECTION = "oliveyoung_products_integrated"
+CONCERN_COLLECTION = "ing_concern_score"
+
+
+class Candidates(NamedTuple):
+    """
+    필터링을 통과한 추천 후보와 점수 계산에 필요한 값.
+    positions 는 카탈로그 순서(오름차순)이며, *_range 는 정규화에 쓰는 (최소, 최대) 입니다.
+    """
+
+    positions: np.ndarray
+    skin_type_score: np.ndarray
+    concern_totals: np.ndarray
+    rank: np.ndarray
+    price: np.ndarray
+    concern_range: Optional[Tuple] = None
+    rank_range: Optional[Tuple] = None
+    price_range: Optional[Tuple] = None
+
+
+class IngredientIndex:
+    """
+    성분 역색인: 성분 토큰 -> 그 성분을 가진 제품 bitset(bool 배열).
+
+    알레르기/비선호 성분은 "검색어가 성분명의 부분 문자열이면 제외" 하는 규칙이라,
+    성분 어휘에 대한 bigram 색인으로 후보 토큰을 좁힌 뒤 실제 부분 문자열 여부를 확인합니다.
+    검색어별 제외 bitset 은 카탈로그가 교체될 때까지 캐시합니다.
+    """
+
+    def __init__(
+        self,
+        vocabulary: List[str],
+        ingredient_matrix: sparse.csr_matrix,
+        cache_size: int = 1024,
+    ):
+        self.vocabulary = vocabulary
+        self.product_count = ingredient_matrix.shape[0]
+        # 성분(열) 기준으로 제품 위치를 바로 꺼낼 수 있도록 CSC 로 보관
+        postings = ingredient_matrix.tocsc()
+        self._indptr = postings.indptr
+        self._indices = postings.indices
+
+        grams: Dict[str, List[int]] = defaultdict(list)
+        for token_id, token in enumerate(vocabulary):
+            for gram in {token[i : i + 2] for i in range(len(token) - 1)}:
+                grams[gram].append(token_id)
+        self._grams = {
+            gram: np.asarray(token_ids, dtype=np.int64)
+            for gram, token_ids in grams.items()
+        }
+        self._cache: Dict[str, np.ndarray] = {}
+        self.cache_size = cache_size
+
+    def tokens_containing(self, term: str) -> List[int]:
+        """term 을 부분 문자열로 포함하는 성분 토큰 ID"""
+        if len(term) < 2:
+            return [i for i, token in enumerate(self.vocabulary) if term in token]
+        postings = []
+        for i in range(len(term) - 1):
+            token_ids = self._grams.get(term[i : i + 2])
+            if token_ids is None:
+                return []
+            postings.append(token_ids)
+        postings.sort(key=len)
+        candidates = postings[0]
+        for token_ids in postings[1:]:
+            candidates = np.intersect1d(candidates, token_ids, assume_unique=True)
+        return [int(i) for i in candidates if term in self.vocabulary[i]]
+
+    def products_containing(self, term: str) -> np.ndarray:
+        """term 을 부분 문자열로 포함하는 성분이 하나라도 있는 제품 bitset"""
+        mask = self._cache.get(term)
+        if mask is None:
+            mask = np.zeros(self.product_count, dtype=bool)
+            for token_id in self.tokens_containing(term):
+                mask[
+                    self._indices[self._indptr[token_id] : self._indptr[token_id + 1]]
+                ] = True
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[term] = mask
+        return mask
+
+    def excluded(self, terms: List[str]) -> np.ndarray:
+        """검색어(대소문자 무시) 중 하나라도 성분에 포함된 제품 bitset"""
+        mask = np.zeros(self.product_count, dtype=bool)
+        for term in terms:
+            mask |= self.products_containing(term.lower())
+        return mask
+
+
+class ProductCatalog:
+    """
+    화장품 추천에 쓰는 제품/성분 데이터의 메모리 인덱스.
+
+    요청마다 하던 전처리(결측 제거, 타입 변환, 피부 타입/화장품 종류 표준화, 성분 분리)를
+    빌드할 때 한 번만 수행합니다. 빌드 후에는 수정하지 않고, 갱신 시 새 인스턴스로 통째로 교체합니다.
+    """
+
+    def __init__(
+        self,
+        products: List[dict],
+        concern_ingredients: List[dict],
+        content_hash: str = "",
+    ):
+        self.built_at = time.time()
+        # 원본 문서의 해시. 같으면 카탈로그 내용도 같습니다. (content_hash() 참고)
+        self.content_hash = content_hash
+        self.frame = self._build_frame(products)
+        self.ingredient_effectiveness = self._build_effectiveness(concern_ingredients)
+
+        # 정수 코드화한 필드
+        skin_type_codes, skin_types = pd.factorize(self.frame["skin_type"])
+        self.skin_types: List[str] = list(skin_types)
+        self.skin_type_codes = skin_type_codes.astype(np.int32)
+        self.skin_type_ids = {name: i for i, name in enumerate(self.skin_types)}
+        self.selling_price = self.frame["selling_price"].to_numpy(np.int64)
+        self.rank = self.frame["rank"].to_numpy(np.int64)
+
+        # 화장품 종류 -> 제품 위치 (카탈로그 순서 유지)
+        buckets: Dict[str, List[int]] = {}
+        for position, cosmetic_type in enumerate(self.frame["cosmetic_type"]):
+            for ct in dict.fromkeys(cosmetic_type):
+                buckets.setdefault(ct, []).append(position)
+        self.type_buckets: Dict[str, np.ndarray] = {
+            ct: np.asarray(positions, dtype=np.int64)
+            for ct, positions in buckets.items()
+        }
+        # 화장품 종류별 (순위 최소, 순위 최대, 가격 최소, 가격 최대)
+        self.type_ranges: Dict[str, tuple] = {
+            ct: (
+                self.rank[positions].min(),
+                self.rank[positions].max(),
+                self.selling_price[positions].min(),
+                self.selling_price[positions].max(),
+            )
+            for ct, positions in self.type_buckets.items()
+        }
+
+        self._build_concern_matrices()
+        self.ingredient_index = IngredientIndex(
+            list(self.ingredient_ids), self.ingredient_matrix
+        )
+
+    @staticmethod
+    def _build_frame(products: List[dict]) -> pd.DataFrame:
+        df = pd.DataFrame(products)
+        if df.empty:
+            return pd.DataFrame(
+                {
+                    column: pd.Series(dtype=dtype)
+                    for column, dtype in [
+                        ("_id", object),
+                        ("skin_type", object),
+                        ("cosmetic_type", object),
+                        ("ingredients_list", object),
+                        ("selling_price", np.int64),
+                        ("rank", np.int64),
+                    ]
+                }
+            )
+
+        # 결측치 처리 (필드가 하나라도 빠진 제품은 제외)
+        df.dropna(inplace=True)
+        df.reset_index(drop=True, inplace=True)
+
+        # 데이터 타입 변환
+        df["original_price"] = df["original_price"].astype(int)
+        df["selling_price"] = df["selling_price"].astype(int)
+        df["review_count"] = df["review_count"].astype(int)
+        df["rank"] = df["rank"].astype(int)
+
+        # 피부 타입 및 화장품 종류 표준화
+        df["skin_type"] = df["skin_type"].str.strip().str.lower()
+        df["cosmetic_type"] = df["cosmetic_type"].apply(
+            lambda ct_list: [ct.strip().lower() for ct in ct_list]
+        )
+
+        # 성분 데이터 전처리
+        df["ingredients_list"] = (
+            df["ingredients"].str.replace(r"[^\w\s|]", "", regex=True).str.split(r"\|")
+        )
+        df["ingredients_list"] = df["ingredients_list"].apply(
+            lambda x: [ingredient.strip().lower() for ingredient in x]
+        )
+        return df
+
+    @staticmethod
+    def _build_effectiveness(concern_ingredients: List[dict]) -> Dict[str, dict]:
+        """성분명 -> {고민: 효능 점수}. 같은 성분이 여러 번 나오면 뒤의 값이 남습니다."""
+        concern_ingredient_df = pd.DataFrame(concern_ingredients)
+        if concern_ingredient_df.empty:
+            return {}
+        concern_ingredient_df.fillna("", inplace=True)
+        # 첫 번째 열(_id)을 제외한 나머지 열: 고민에 대한 효능 점수
+        concerns = list(concern_ingredient_df.columns[1:])
+        ingredient_effectiveness = {}
+        for row in concern_ingredient_df.itertuples(index=False):
+            values = dict(zip(concern_ingredient_df.columns, row))
+            ingredient = values["Korean Name"].strip().lower()
+            ingredient_effectiveness[ingredient] = {
+                concern: values[concern] for concern in concerns
+            }
+        return ingredient_effectiveness
+
+    def _build_concern_matrices(self):
+        """
+        성분을 정수 ID 로 바꿔 제품 x 성분 CSR 행렬(값은 성분 등장 횟수)과
+        성분 x 고민 효능 행렬을 만듭니다. 제품 성분 중 효능 데이터가 없는 성분의 행은 0 입니다.
+        """
+        self.ingredient_ids: Dict[str, int] = {}
+        indptr = [0]
+        indices: List[int] = []
+        for ingredients in self.frame["ingredients_list"]:
+            for ingredient in ingredients:
+                indices.append(
+                    self.ingredient_ids.setdefault(ingredient, len(self.ingredient_ids))
+                )
+            indptr.append(len(indices))
+        # 중복 성분은 (행, 열) 값이 합쳐져 등장 횟수가 됩니다.
+        self.ingredient_matrix = sparse.csr_matrix(
+            (np.ones(len(indices)), np.asarray(indices), np.asarray(indptr)),
+            shape=(len(self.frame), len(self.ingredient_ids)),
+        )
+        self.ingredient_matrix.sum_duplicates()
+
+        first = next(iter(self.ingredient_effectiveness.values()), {})
+        self.concerns: List[str] = [c for c in first if c != "Korean Name"]
+        self.concern_ids = {concern: i for i, concern in enumerate(self.concerns)}
+        self.concern_matrix = np.zeros((len(self.ingredient_ids), len(self.concerns)))
+        for ingredient, ingredient_id in self.ingredient_ids.items():
+            effectiveness = self.ingredient_effectiveness.get(ingredient)
+            if effectiveness is None:
+                continue
+            for concern_id, concern in enumerate(self.concerns):
+                value = effectiveness.get(concern, 0)
+                # 빈 칸("")은 0 으로 취급
+                if isinstance(value, numbers.Number):
+                    self.concern_matrix[ingredient_id, concern_id] = value
+
+    def concern_totals(self, user_concerns: List[str]) -> np.ndarray:
+        """
+        전체 제품의 고민 효능 합계. 제품의 각 성분(중복 포함) x 사용자 고민(중복 포함)마다
+        효능 점수를 더한 값으로, 희소 행렬-벡터 곱 한 번으로 계산합니다.
+        """
+        weights = np.zeros(len(self.concerns))
+        for concern, count in Counter(user_concerns).items():
+            concern_id = self.concern_ids.get(concern)
+            if concern_id is not None:
+                weights[concern_id] = count
+        return self.ingredient_matrix @ (self.concern_matrix @ weights)
+
+    def matching_ingredients(
+        self, position: int, user_concerns: List[str]
+    ) -> Dict[str, Dict[str, int]]:
+        """추천 이유용: 고민별로 효능 점수가 0 보다 큰 제품 성분"""
+        matching: Dict[str, Dict[str, int]] = defaultdict(dict)
+        for ingredient in self.frame["ingredients_list"].iat[position]:
+            effectiveness = self.ingredient_effectiveness.get(ingredient, {})
+            for concern in user_concerns:
+                value = effectiveness.get(concern, 0)
+                if isinstance(value, numbers.Number) and value > 0:
+                    matching[concern][ingredient] = value
+        return matching
+
+    def candidates(
+        self, cosmetic_type: str, avoid_ingredients: List[str]
+    ) -> np.ndarray:
+        """해당 화장품 종류 제품 중 피해야 할 성분이 없는 제품 위치 (차집합)"""
+        positions = self.type_bucket(cosmetic_type)
+        if not avoid_ingredients:
+            return positions
+        return positions[~self.ingredient_index.excluded(avoid_ingredients)[positions]]
+
+    def select(
+        self,
+        cosmetic_type: str,
+        skin_type: str,
+        user_concerns: List[str],
+        avoid_ingredients: List[str],
+        budget: int,
+    ) -> Candidates:
+        """화장품 종류, 비선호 성분, 예산으로 후보를 거르고 점수 계산용 값을 모읍니다."""
+        positions = self.candidates(cosmetic_type, avoid_ingredients)
+        bucket_size = len(self.type_bucket(cosmetic_type))
+        positions = positions[self.selling_price[positions] <= budget]
+
+        rank = self.rank[positions]
+        price = self.selling_price[positions]
+        concern_totals = self.concern_totals(user_concerns)[positions]
+        candidates = Candidates(
+            positions,
+            self.skin_type_matches(positions, skin_type),
+            concern_totals,
+            rank,
+            price,
+        )
+        if len(positions) == 0:
+            return candidates
+
+        # 정규화 범위는 필터링된 제품 기준. 걸러진 제품이 없으면 미리 계산한 종류별 범위를 사용
+        if len(positions) == bucket_size:
+            rank_min, rank_max, price_min, price_max = self.type_ranges[
+                cosmetic_type.strip().lower()
+            ]
+        else:
+            rank_min, rank_max = rank.min(), rank.max()
+            price_min, price_max = price.min(), price.max()
+        return candidates._replace(
+            concern_range=(concern_totals.min(), concern_totals.max()),
+            rank_range=(rank_min, rank_max),
+            price_range=(price_min, price_max),
+        )
+
+    def skin_type_matches(self, positions: np.ndarray, skin_type: str) -> np.ndarray:
+        """제품 피부 타입이 사용자 피부 타입 또는 "전체" 이면 1, 아니면 0"""
+        codes = [
+            self.skin_type_ids[name]
+            for name in (skin_type.lower(), "전체")
+            if name in self.skin_type_ids
+        ]
+        return np.isin(self.skin_type_codes[positions], codes).astype(np.int64)
+
+    def type_bucket(self, cosmetic_type: str) -> np.ndarray:
+        """해당 화장품 종류를 포함하는 제품 위치 배열"""
+        return self.type_buckets.get(
+            cosmetic_type.strip().lower(), np.empty(0, dtype=np.int64)
+        )
+
+    def stats(self) -> dict:
+        return {
+            "products": len(self.frame),
+            "ingredients": len(self.ingredient_ids),
+            "scored_ingredients": len(self.ingredient_effectiveness),
+            "concerns": len(self.concerns),
+            "skin_types": len(self.skin_types),
+            "cosmetic_types": len(self.type_buckets),
+            "built_at": self.built_at,
+        }
+
+
+_catalog: Optional[ProductCatalog] = None
+_catalog_lock = asyncio.Lock()
+catalog_version = 0
+# 문서가 바뀌지 않아 교체를 건너뛴 갱신 횟수
+unchanged_refreshes = 0
+# 카탈로그가 교체될 때 새 카탈로그로 호출됩니다. (파생 데이터 무효화/재계산용)
+refresh_listeners: List[Callable[[ProductCatalog], None]] = []
+
+
+def content_hash(products: List[dict], concern_ingredients: List[dict]) -> str:
+    """두 컬렉션 문서의 SHA-256. 갱신 시 내용이 그대로인지 판단하는 데 씁니다."""
+    payload = json_util.dumps([products, concern_ingredients], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+async def refresh_product_catalog(only_if_missing: bool = False) -> ProductCatalog:
+    """
+    두 컬렉션을 다시 읽어 카탈로그를 새로 만들고 교체합니다. (해시/전처리는 스레드에서 수행)
+    문서가 이전과 같으면 교체하지 않고, refresh_listeners 도 호출하지 않습니다.
+    """
+    global _catalog, catalog_version, unchanged_refreshes
+    async with _catalog_lock:
+        if only_if_missing and _catalog is not None:
+            return _catalog
+        products = await db[PRODUCTS_COLLECTION].find().to_list(length=None)
+        concern_ingredients = await db[CONCERN_COLLECTION].find().to_list(length=None)
+        digest = await asyncio.to_thread(content_hash, products, concern_ingredients)
+        if _catalog is not None and _catalog.content_hash == digest:
+            unchanged_refreshes += 1
+            return _catalog
+        catalog = await asyncio.to_thread(
+            ProductCatalog, products, concern_ingredients, digest
+        )
+        _catalog = catalog
+        catalog_version += 1
+    for listener in refresh_listeners:
+        listener(catalog)
+    return catalog
+
+
+def current_catalog() -> Optional[ProductCatalog]:
+    return _catalog
+
+
+async def get_product_catalog() -> ProductCatalog:
+    """현재 카탈로그. 아직 빌드되지 않았으면 이 자리에서 빌드합니다."""
+    if _catalog is None:
+        return await refresh_product_catalog(only_if_missing=True)
+    return _catalog
+
+
+class CatalogRefresher:
+    """
+    카탈로그를 최신으로 유지하는 백그라운드 작업.
+
+    catalog_change_stream 이 켜져 있으면 두 컬렉션의 change stream 을 구독해 변경이 생길 때 다시 빌드하고
+    (연속된 변경은 catalog_change_debounce_seconds 동안 모아서 한 번만),
+    change stream 을 쓸 수 없는 환경(standalone MongoDB 등)이면 catalog_refresh_seconds 주기로 다시 빌드합니다.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self.mode = "stopped"
+        self.refreshes = 0
+        self.last_error = ""
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.mode = "stopped"
+
+    async def _refresh(self):
+        try:
+            await refresh_product_catalog()
+            self.refreshes += 1
+        except Exception as e:
+            # 갱신에 실패하면 기존 카탈로그를 계속 사용
+            self.last_error = f"{type(e).__name__}: {e}"
+            print(f"제품 카탈로그 갱신 실패: {self.last_error}")
+
+    async def _watch(self):
+        pipeline = [
+            {"$match": {"ns.coll": {"$in": [PRODUCTS_COLLECTION, CONCERN_COLLECTION]}}}
+        ]
+        async with db.watch(pipeline) as stream:
+            self.mode = "change_stream"
+            async for _ in stream:
+                await asyncio.sleep(settings.catalog_change_debounce_seconds)
+                while await stream.try_next() is not None:
+                    pass
+                await self._refresh()
+
+    async def _poll(self):
+        self.mode = "timer"
+        while True:
+            await asyncio.sleep(settings.catalog_refresh_seconds)
+            await self._refresh()
+
+    async def _run(self):
+        if settings.catalog_change_stream:
+            try:
+                await self._watch()
+            except PyMongoError as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"change stream 을 사용할 수 없어 주기 갱신으로 전환합니다: {e}")
+        if settings.catalog_refresh_seconds > 0:
+            await self._poll()
+        self.mode = "stopped"
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "version": catalog_version,
+            "refreshes": self.refreshes,
+            "unchanged_refreshes": unchanged_refreshes,
+            "last_error": self.last_error,
+            **(_catalog.stats() if _catalog is not None else {}),
+        }
+
+
+catalog_refresher = CatalogRefresher()
+
+
+async def init_product_catalog():
+    """서버 시작 시 카탈로그를 빌드하고 갱신 작업을 시작합니다."""
+    try:
+        await refresh_product_catalog()
+    except PyMongoError as e:
+        # 첫 추천 요청에서 다시 시도
+        print(f"제품 카탈로그 빌드 실패: {e}")
+    catalog_refresher.start()
@@ -0,0 +1,294 @@
+# services/recommendation_materialize.py
+import asyncio
+import itertools
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from core.config import settings
+from services.product_catalog import (
+    Candidates,
+    ProductCatalog,
+    current_catalog,
+    refresh_listeners,
+)
+
+SegmentKey = Tuple[str, str, Tuple[str, ...]]
+
+
+class PriceOrder(NamedTuple):
+    """화장품 종류별 가격 오름차순 누적 최소/최대 (예산 이하 제품의 정규화 범위를 O(log n) 으로 조회)"""
+
+    prices: np.ndarray
+    rank_min: np.ndarray
+    rank_max: np.ndarray
+
+
+class ConcernOrder(NamedTuple):
+    """(화장품 종류, 고민 조합) 별 가격 오름차순 누적 고민 효능 최소/최대"""
+
+    concern_min: np.ndarray
+    concern_max: np.ndarray
+
+
+class Segment(NamedTuple):
+    """(화장품 종류, 피부 타입, 고민 조합) 의 후보 목록. 배열은 카탈로그 순서입니다."""
+
+    positions: np.ndarray
+    skin_type_score: np.ndarray
+    concern_totals: np.ndarray
+    rank: np.ndarray
+    price: np.ndarray
+
+
+def dominated_counts(
+    skin: np.ndarray,
+    concern: np.ndarray,
+    rank: np.ndarray,
+    price: np.ndarray,
+    chunk: int = 512,
+) -> np.ndarray:
+    """
+    제품마다 자신을 지배하는 제품 수를 셉니다.
+
+    A 가 B 를 지배 = 피부 타입/고민 점수는 같거나 높고 순위/가격은 같거나 낮으며,
+    하나라도 더 좋거나(모두 같으면) 카탈로그에서 앞선 경우.
+    정규화는 양의 스케일 1차 변환이라 A 의 총점은 항상 B 이상이고, A 가 B 보다 싸므로
+    B 가 예산 필터를 통과하면 A 도 통과합니다. 지배하는 제품이 k 개 이상이면 B 는 상위 k 에 들 수 없습니다.
+    """
+    n = len(rank)
+    order = np.arange(n)
+    counts = np.empty(n, dtype=np.int64)
+    for start in range(0, n, chunk):
+        rows = slice(start, start + chunk)
+        better_or_equal = (
+            (skin[None, :] >= skin[rows, None])
+            & (concern[None, :] >= concern[rows, None])
+            & (rank[None, :] <= rank[rows, None])
+            & (price[None, :] <= price[rows, None])
+        )
+        strictly_better = (
+            (skin[None, :] > skin[rows, None])
+            | (concern[None, :] > concern[rows, None])
+            | (rank[None, :] < rank[rows, None])
+            | (price[None, :] < price[rows, None])
+            | (order[None, :] < order[rows, None])
+        )
+        counts[rows] = (better_or_equal & strictly_better).sum(axis=1)
+    return counts
+
+
+class Materialized(NamedTuple):
+    """한 카탈로그에 대해 계산한 결과. 통째로 교체해 요청이 서로 다른 카탈로그의 값을 섞어 쓰지 않게 합니다."""
+
+    catalog: ProductCatalog
+    price_orders: Dict[str, PriceOrder]
+    concern_orders: Dict[Tuple[str, Tuple[str, ...]], ConcernOrder]
+    segments: Dict[SegmentKey, Segment]
+
+
+class RecommendationMaterializer:
+    """
+    (화장품 종류, 피부 타입, 고민 조합) 세그먼트별 추천 후보를 미리 계산해 두는 백그라운드 작업.
+
+    세그먼트마다 상위 depth 개에 들 수 있는 제품(지배하는 제품이 depth 개 미만인 제품)만 남겨서,
+    요청 시에는 이 짧은 목록에 예산 필터와 점수 계산만 하면 됩니다.
+    정규화 범위(필터링된 제품 기준 최소/최대)는 가격 오름차순 누적 최소/최대로 조회하므로 결과는 전체 계산과 같습니다.
+    카탈로그가 교체되면 이전 세그먼트는 즉시 쓰이지 않고, 새 카탈로그로 다시 계산합니다.
+    비선호 성분이 있는 요청, 중복 고민이 있는 요청, top_k 가 depth 보다 큰 요청은 전체 계산으로 처리합니다.
+    """
+
+    def __init__(self, enabled: bool, depth: int, max_concerns: int):
+        self.enabled = enabled
+        self.depth = depth
+        self.max_concerns = max_concerns
+        self._materialized: Optional[Materialized] = None
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.build_seconds = 0.0
+        self.skipped_builds = 0
+
+    @staticmethod
+    def segment_key(
+        catalog: ProductCatalog,
+        cosmetic_type: str,
+        skin_type: str,
+        user_concerns: List[str],
+    ) -> Optional[SegmentKey]:
+        # 효능 데이터에 없는 고민은 점수에 영향이 없으므로 키에서 제외
+        concerns = [c for c in user_concerns if c in catalog.concern_ids]
+        if len(set(concerns)) != len(concerns):
+            return None
+        return (
+            cosmetic_type.strip().lower(),
+            skin_type.lower(),
+            tuple(sorted(concerns)),
+        )
+
+    def candidates(
+        self,
+        catalog: ProductCatalog,
+        cosmetic_type: str,
+        skin_type: str,
+        user_concerns: List[str],
+        budget: int,
+        top_k: int,
+    ) -> Optional[Candidates]:
+        """미리 계산한 세그먼트가 있으면 예산 이하 후보를, 없으면 None 을 반환합니다."""
+        if not self.enabled:
+            return None
+        materialized = self._materialized
+        if (
+            materialized is None
+            or materialized.catalog is not catalog
+            or top_k > self.depth
+        ):
+            self.misses += 1
+            return None
+        key = self.segment_key(catalog, cosmetic_type, skin_type, user_concerns)
+        segment = materialized.segments.get(key) if key is not None else None
+        if segment is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+
+        price_order = materialized.price_orders[key[0]]
+        concern_order = materialized.concern_orders[(key[0], key[2])]
+        count = int(np.searchsorted(price_order.prices, budget, side="right"))
+        within = segment.price <= budget
+        candidates = Candidates(
+            segment.positions[within],
+            segment.skin_type_score[within],
+            segment.concern_totals[within],
+            segment.rank[within],
+            segment.price[within],
+        )
+        if count == 0:
+            return candidates
+        last = count - 1
+        return candidates._replace(
+            concern_range=(
+                concern_order.concern_min[last],
+                concern_order.concern_max[last],
+            ),
+            rank_range=(price_order.rank_min[last], price_order.rank_max[last]),
+            price_range=(price_order.prices[0], price_order.prices[last]),
+        )
+
+    def build(self, catalog: ProductCatalog):
+        """모든 세그먼트를 계산해 한 번에 교체합니다. (스레드에서 실행)"""
+        started = time.perf_counter()
+        skin_types = [name for name in catalog.skin_types if name != "전체"]
+        concern_sets = [
+            combination
+            for size in range(self.max_concerns + 1)
+            for combination in itertools.combinations(sorted(catalog.concerns), size)
+        ]
+        concern_totals = {
+            concerns: catalog.concern_totals(list(concerns))
+            for concerns in concern_sets
+        }
+
+        price_orders: Dict[str, PriceOrder] = {}
+        concern_orders: Dict[Tuple[str, Tuple[str, ...]], ConcernOrder] = {}
+        segments: Dict[SegmentKey, Segment] = {}
+        for cosmetic_type, positions in catalog.type_buckets.items():
+            rank = catalog.rank[positions]
+            price = catalog.selling_price[positions]
+            by_price = np.argsort(price, kind="stable")
+            price_orders[cosmetic_type] = PriceOrder(
+                price[by_price],
+                np.minimum.accumulate(rank[by_price]),
+                np.maximum.accumulate(rank[by_price]),
+            )
+            skin_scores = {
+                skin_type: catalog.skin_type_matches(positions, skin_type)
+                for skin_type in skin_types
+            }
+            for concerns in concern_sets:
+                concern = concern_totals[concerns][positions]
+                concern_orders[(cosmetic_type, concerns)] = ConcernOrder(
+                    np.minimum.accumulate(concern[by_price]),
+                    np.maximum.accumulate(concern[by_price]),
+                )
+                for skin_type, skin in skin_scores.items():
+                    keep = dominated_counts(skin, concern, rank, price) < self.depth
+                    segments[(cosmetic_type, skin_type, concerns)] = Segment(
+                        positions[keep],
+                        skin[keep],
+                        concern[keep],
+                        rank[keep],
+                        price[keep],
+                    )
+
+        self._materialized = Materialized(
+            catalog, price_orders, concern_orders, segments
+        )
+        self.build_seconds = time.perf_counter() - started
+        print(
+            f"추천 후보 사전 계산 완료: 세그먼트 {len(segments)}개, "
+            f"{self.build_seconds:.2f}s"
+        )
+
+    async def _build_latest(self, catalog: ProductCatalog):
+        await asyncio.to_thread(self.build, catalog)
+        # 계산하는 동안 카탈로그가 다시 바뀌었으면 최신 카탈로그로 한 번 더
+        latest = current_catalog()
+        if latest is not None and latest is not catalog:
+            await self._build_latest(latest)
+
+    def schedule(self, catalog: ProductCatalog):
+        """
+        카탈로그 교체 시 호출. 이전 세그먼트는 카탈로그가 달라 바로 무효가 됩니다.
+        내용(content_hash)이 같은 카탈로그면 다시 계산하지 않고 기존 결과를 새 카탈로그에 연결합니다.
+        """
+        if not self.enabled:
+            return
+        materialized = self._materialized
+        if (
+            materialized is not None
+            and catalog.content_hash
+            and materialized.catalog.content_hash == catalog.content_hash
+        ):
+            self._materialized = materialized._replace(catalog=catalog)
+            self.skipped_builds += 1
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._build_latest(catalog))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        materialized = self._materialized
+        segments = materialized.segments if materialized is not None else {}
+        return {
+            "enabled": self.enabled,
+            "depth": self.depth,
+            "segments": len(segments),
+            "candidates": sum(len(s.positions) for s in segments.values()),
+            "current": materialized is not None
+            and materialized.catalog is current_catalog(),
+            "build_seconds": round(self.build_seconds, 3),
+            "skipped_builds": self.skipped_builds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+recommendation_materializer = RecommendationMaterializer(
+    settings.recommendation_materialize,
+    settings.recommendation_materialize_depth,
+    settings.recommendation_materialize_max_concerns,
+)
+refresh_listeners.append(recommendation_materializer.schedule)
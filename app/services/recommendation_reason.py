@@ -0,0 +1,228 @@
+# services/recommendation_reason.py
+import asyncio
+import hashlib
+import json
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+from openai import AsyncOpenAI
+
+from core.config import settings
+from core.metrics import observe_stage
+from schemas.cosmetics import ProductRecommendation
+from services.result_cache import reason_cache
+
+# 프롬프트나 함수 스키마를 바꾸면 올려서 이전 캐시를 쓰지 않게 합니다.
+PROMPT_VERSION = 1
+
+function_schema = {
+    "name": "generate_recommendation_reason",
+    "description": "사용자의 피부 타입과 고민, 제품 정보를 기반으로 추천 이유를 생성합니다.",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "reason": {
+                "type": "string",
+                "description": "제품을 추천하는 이유",
+            },
+        },
+        "required": ["reason"],
+    },
+}
+
+SYSTEM_PROMPT = "당신은 전문적인 스킨케어 컨설턴트이며, 비둘기 캐릭터입니다. 아래의 정보를 바탕으로 사용자가 이해하기 쉽도록 제품을 추천하는 이유를 간결하게 작성해 주세요:"
+
+
+def build_prompt(
+    name,
+    brand,
+    skin_type_score,
+    concern_score,
+    rank_score,
+    price_score,
+    matching_ingredients,
+    user_skin_type,
+    user_concerns,
+) -> str:
+    return f"""
+    당신은 전문적인 스킨케어 컨설턴트이며, 비둘기 캐릭터입니다. 아래의 정보를 바탕으로 사용자가 이해하기 쉽도록 제품을 추천하는 이유를 간결하게 작성해 주세요:
+
+    사용자 피부 타입: {user_skin_type}
+    사용자 피부 고민: {', '.join(user_concerns)}
+    제품명: {name}
+    브랜드: {brand}
+    피부 타입 점수: {skin_type_score}
+    피부 고민 점수: {concern_score}
+    순위 점수: {rank_score}
+    가격 점수: {price_score}
+    매칭된 성분: {matching_ingredients}
+
+    추천 이유는 제품이 사용자의 피부 타입과 고민에 어떻게 부합하는지, 매칭된 성분과 전반적인 이점을 강조하여 작성해 주세요.
+    모든 점수는 0부터 1까지 이루어진다.
+
+    응답은 한국어로 한다. 최소 1줄 최대 2줄로 작성한다. 문장은 '-요'체로 작성한다.
+    제품명을 이유에 언급하지 않는다. 성분을 근거로 한 설명만을 작성한다. 구체적인 점수는 언급하지 않는다.
+    ex) '건성 피부에 적합한 히알루론산이 함유되어 있고, 여드름 고민 해결에 도움이되는 샐리실릭산이 함유되어 있어요.'
+    """
+
+
+class ReasonGenerator:
+    """
+    GPT 추천 이유 생성기.
+
+    비동기 OpenAI 클라이언트를 써서 이벤트 루프를 막지 않고, 동시에 보내는 요청 수는 semaphore 로 제한합니다.
+    같은 (제품, 피부 타입, 정렬한 고민 목록, 매칭 성분) 조합은 reason_cache 에서 바로 돌려줍니다.
+    openai_base_url 을 지정하면 호환 API(로컬 stub 서버 등)로 요청을 보냅니다.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client: Optional[AsyncOpenAI] = None
+        self.requests = 0
+        self.failures = 0
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        if self._client is None:
+            self._client = AsyncOpenAI(
+                api_key=settings.openai_key,
+                base_url=settings.openai_base_url or None,
+                timeout=settings.openai_timeout_seconds,
+            )
+        return self._client
+
+    @staticmethod
+    def cache_key(
+        product_id: str,
+        user_skin_type: str,
+        user_concerns: List[str],
+        matching_ingredients: Dict[str, Dict[str, int]],
+    ) -> str:
+        """
+        추천 이유 캐시 키. 이유에 영향을 주는 값(제품, 피부 타입, 고민, 매칭 성분, 모델, 프롬프트 버전)만 씁니다.
+        이미지 결과 캐시의 make_key 는 추론 backend 등을 섞으므로 쓰지 않습니다.
+        """
+        payload = json.dumps(
+            [
+                product_id,
+                user_skin_type,
+                sorted(user_concerns),
+                {
+                    concern: {name: int(value) for name, value in ingredients.items()}
+                    for concern, ingredients in matching_ingredients.items()
+                },
+                settings.openai_model,
+                PROMPT_VERSION,
+            ],
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def generate(
+        self,
+        name,
+        brand,
+        skin_type_score,
+        concern_score,
+        rank_score,
+        price_score,
+        matching_ingredients,
+        user_skin_type,
+        user_concerns,
+        product_id: Optional[str] = None,
+    ) -> str:
+        # 제품 ID 가 없으면 브랜드/제품명으로 구분
+        key = self.cache_key(
+            product_id or f"{brand}/{name}",
+            user_skin_type,
+            user_concerns,
+            matching_ingredients,
+        )
+        cached = await reason_cache.get(key)
+        if cached is not None:
+            return cached["reason"]
+
+        prompt = build_prompt(
+            name,
+            brand,
+            skin_type_score,
+            concern_score,
+            rank_score,
+            price_score,
+            matching_ingredients,
+            user_skin_type,
+            user_concerns,
+        )
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            started = loop.time()
+            self.requests += 1
+            response = await self.client.chat.completions.create(
+                model=settings.openai_model,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt},
+                ],
+                functions=[function_schema],  # type: ignore
+                function_call={"name": "generate_recommendation_reason"},
+            )
+            observe_stage("recommendation_reason", "openai", loop.time() - started)
+
+        function_call = response.choices[0].message.function_call
+        if not function_call:
+            raise HTTPException(
+                status_code=500, detail="Failed to generate recommendation reason"
+            )
+        reason = json.loads(function_call.arguments)["reason"]
+        await reason_cache.set(key, {"reason": reason})
+        return reason
+
+    async def fill_reasons(
+        self,
+        recommendations: List[ProductRecommendation],
+        user_skin_type: str,
+        user_concerns: List[str],
+    ) -> List[ProductRecommendation]:
+        """
+        추천 목록 전체의 reason 을 동시에 채웁니다. (동시 요청 수는 semaphore 한도까지)
+        생성에 실패한 제품은 reason 을 비워 두고 나머지는 그대로 반환합니다.
+        """
+        results = await asyncio.gather(
+            *(
+                self.generate(
+                    recommendation.name,
+                    recommendation.brand,
+                    recommendation.skin_type_score,
+                    recommendation.concern_score,
+                    recommendation.rank_score,
+                    recommendation.price_score,
+                    recommendation.matching_ingredients,
+                    user_skin_type,
+                    user_concerns,
+                    product_id=recommendation.id,
+                )
+                for recommendation in recommendations
+            ),
+            return_exceptions=True,
+        )
+        filled = []
+        for recommendation, result in zip(recommendations, results):
+            if isinstance(result, BaseException):
+                self.failures += 1
+                print(f"추천 이유 생성 실패 ({recommendation.id}): {result}")
+                result = ""
+            filled.append(recommendation.model_copy(update={"reason": result}))
+        return filled
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "requests": self.requests,
+            "failures": self.failures,
+            "cache": reason_cache.stats(),
+        }
+
+
+reason_generator = ReasonGenerator(settings.reason_max_concurrency)
@@ -0,0 +1,168 @@
+# services/result_cache.py
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Optional
+
+from pymongo.errors import PyMongoError
+
+from core.config import settings
+from db.database import get_db
+
+db = get_db()
+cache_collection = db["inference_cache"]
+reason_cache_collection = db["recommendation_reason_cache"]
+
+
+class ResultCache:
+    """
+    이미지 바이트 해시 기반 결과 캐시.
+
+    같은 사진을 다시 올리는 경우(재시도, 뒤로가기 후 재요청) 디코딩과 추론을 모두 건너뜁니다.
+    키는 이미지 바이트의 SHA-256, 요청 파라미터(부위, bbox 등), 모델 버전으로 만듭니다.
+    - 1단계: 프로세스 내 LRU (max_entries 개)
+    - 2단계: (선택) MongoDB TTL 컬렉션. 여러 워커/재시작 간에 결과를 공유합니다.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        max_entries: int,
+        mongo_ttl_seconds: int = 0,
+        collection=cache_collection,
+    ):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.mongo_ttl_seconds = mongo_ttl_seconds
+        self.collection = collection
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self.hits = 0
+        self.mongo_hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or self.mongo_ttl_seconds > 0
+
+    async def make_key(self, contents: bytes, *params) -> str:
+        """업로드는 최대 upload_max_bytes(15MB)라 해시는 스레드에서 계산합니다. (hashlib 은 계산 중 GIL 을 놓음)"""
+        return await asyncio.to_thread(self._digest, contents, params)
+
+    def _digest(self, contents: bytes, params: tuple) -> str:
+        digest = hashlib.sha256(contents)
+        digest.update(
+            json.dumps(
+                [
+                    self.namespace,
+                    settings.model_version,
+                    settings.inference_backend,
+                    settings.inference_quantization,
+                    settings.upload_jpeg_draft,
+                    params,
+                ],
+                sort_keys=True,
+            ).encode("utf-8")
+        )
+        return digest.hexdigest()
+
+    async def get(self, key: str) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+        if self.mongo_ttl_seconds > 0:
+            try:
+                document = await self.collection.find_one(
+                    {"_id": f"{self.namespace}:{key}"}
+                )
+            except PyMongoError:
+                document = None
+            if document is not None:
+                self.mongo_hits += 1
+                self._remember(key, document["value"])
+                return document["value"]
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: dict):
+        if not self.enabled:
+            return
+        self._remember(key, value)
+        if self.mongo_ttl_seconds > 0:
+            try:
+                await self.collection.replace_one(
+                    {"_id": f"{self.namespace}:{key}"},
+                    {"value": value, "created_at": datetime.now(timezone.utc)},
+                    upsert=True,
+                )
+            except PyMongoError as e:
+                print(f"Result cache write failed: {e}")
+
+    def _remember(self, key: str, value: dict):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.mongo_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "mongo_hits": self.mongo_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.mongo_hits) / lookups if lookups else 0.0,
+        }
+
+
+async def create_cache_indexes():
+    """MongoDB 캐시 계층을 쓰는 경우 TTL 인덱스를 만듭니다."""
+    if settings.result_cache_mongo_ttl_seconds > 0:
+        await cache_collection.create_index(
+            "created_at", expireAfterSeconds=settings.result_cache_mongo_ttl_seconds
+        )
+    if settings.reason_cache_mongo_ttl_seconds > 0:
+        await reason_cache_collection.create_index(
+            "created_at", expireAfterSeconds=settings.reason_cache_mongo_ttl_seconds
+        )
+
+
+prediction_cache = ResultCache(
+    "predict",
+    max_entries=settings.result_cache_size,
+    mongo_ttl_seconds=settings.result_cache_mongo_ttl_seconds,
+)
+acne_cache = ResultCache(
+    "acne_detection",
+    max_entries=settings.acne_result_cache_size,
+    mongo_ttl_seconds=settings.result_cache_mongo_ttl_seconds,
+)
+
+# GPT 추천 이유 (재시작 후에도 재사용하도록 MongoDB 계층을 기본으로 사용)
+reason_cache = ResultCache(
+    "recommendation_reason",
+    max_entries=settings.reason_cache_size,
+    mongo_ttl_seconds=settings.reason_cache_mongo_ttl_seconds,
+    collection=reason_cache_collection,
+)
+
+
+def cache_stats() -> dict:
+    return {
+        "predict": prediction_cache.stats(),
+        "acne_detection": acne_cache.stats(),
+        "recommendation_reason": reason_cache.stats(),
+    }
@@ -0,0 +1,94 @@
+# services/routine_cache.py
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from core.config import settings
+from data.products_data import PRODUCTS_DATA
+from schemas.routine import RoutineCreate
+
+RoutineKey = Tuple[int, int, Tuple[str, ...]]
+
+# 루틴 생성에 영향을 주는 보유 화장품 이름 (그 외 이름은 결과에 영향이 없음)
+PRODUCT_NAMES = {
+    product_data["name"]
+    for step_products in PRODUCTS_DATA.values()
+    for product_data in step_products.values()
+}
+
+
+class RoutineCache:
+    """
+    생성한 루틴의 프로세스 내 LRU 캐시.
+
+    get_routine 의 결과는 (시간, 예산, 보유 화장품)과 PRODUCTS_DATA, PRICE_SEGMENTS 로만 정해지므로,
+    슬라이더를 조금씩 움직이며 다시 요청하는 경우 최적화를 건너뜁니다.
+    - 예산은 money_bucket 원 단위로 내림하고 그 금액으로 루틴을 만듭니다. (결과는 실제 예산을 넘지 않음)
+    - 보유 화장품은 제품 이름에 있는 것만 중복 없이 정렬해 키로 씁니다. (순서/중복/모르는 이름 무시)
+    - 가격 구간이 다시 계산되면(init_price_segments) 전체를 비웁니다.
+    """
+
+    def __init__(self, max_entries: int, money_bucket: int):
+        self.max_entries = max_entries
+        self.money_bucket = max(1, money_bucket)
+        self._entries: "OrderedDict[RoutineKey, RoutineCreate]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def bucket(self, money_won: int) -> int:
+        """캐시를 쓰면 예산을 버킷 단위로 내림합니다."""
+        if not self.enabled:
+            return money_won
+        return money_won // self.money_bucket * self.money_bucket
+
+    @staticmethod
+    def make_key(
+        time_minutes: int, money_won: int, owned_cosmetics: List[str]
+    ) -> RoutineKey:
+        owned = tuple(sorted(set(owned_cosmetics) & PRODUCT_NAMES))
+        return (time_minutes, money_won, owned)
+
+    def get(self, key: RoutineKey) -> Optional[RoutineCreate]:
+        if not self.enabled:
+            return None
+        routine = self._entries.get(key)
+        if routine is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        # 호출한 쪽에서 수정해도 캐시된 값은 그대로 두도록 복사본을 반환
+        return routine.model_copy(deep=True)
+
+    def set(self, key: RoutineKey, routine: RoutineCreate):
+        if not self.enabled:
+            return
+        self._entries[key] = routine.model_copy(deep=True)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "money_bucket": self.money_bucket,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+routine_cache = RoutineCache(
+    settings.routine_cache_size, settings.routine_cache_money_bucket
+)
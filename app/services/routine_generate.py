@@ -1,12 +1,18 @@
+import asyncio
 import math
 import random
 from typing import Dict, List
 
+import numpy as np
 from fastapi import HTTPException
 
+from core.config import settings
+from core.metrics import StageTimer
 from data.products_data import PRODUCTS_DATA
 from db.database import get_db
 from schemas.routine import RoutineCreate, Step, SubProductType
+from services.routine_cache import routine_cache
+from services.routine_population import RoutineEncoding, parallel_tempering
 from pymongo.errors import PyMongoError
 
 db = get_db()
@@ -65,6 +71,8 @@ async def init_price_segments():
         raise HTTPException(status_code=500, detail="Database error")
     global PRICE_SEGMENTS
     PRICE_SEGMENTS = result_dict
+    # 가격 구간이 바뀌었으므로 이전 루틴은 쓰지 않음
+    routine_cache.clear()
 
 
 # 우선순위 정의
@@ -322,6 +330,421 @@ def cost_optimization_step(
     return best_solution
 
 
+def _solution_options(solution, steps):
+    """
+    단계별로 고를 수 있는 선택지. cost_optimization_step 의 이웃 규칙과 같습니다.
+    - 소유 제품(가격 -100)은 그대로 고정
+    - 클렌징/선케어에 이미 제품이 있으면 제품은 고정하고 가격만 조정
+    - 나머지는 제외(None) 또는 단계의 제품 중 하나 (7단계 클렌징은 클렌징 폼 제외)
+    선택지는 (제품 키, 고정 가격 또는 None) 이며 고정 가격이 None 이면 가격 구간에서 정합니다.
+    """
+    options = []
+    for (step, forced_key), (ck, chosen_price) in zip(steps, solution):
+        step_products = PRODUCTS_DATA.get(step, {})
+        if chosen_price == -100.0 or (ck is None and not step_products):
+            options.append([(ck, chosen_price)])
+        elif step in {Step.CLEANSING, Step.SUN_CARE} and ck is not None:
+            options.append([(ck, None)])
+        else:
+            keys = [
+                key
+                for key in step_products
+                if not (
+                    step == Step.CLEANSING
+                    and forced_key is None
+                    and key == "cleansing_foam"
+                )
+            ]
+            # 시간이 긴 제품부터 탐색해 좋은 해를 빨리 찾고, 제외는 마지막에
+            keys.sort(key=lambda key: -step_products[key]["time"])
+            options.append([(key, None) for key in keys] + [(None, 0.0)])
+    return options
+
+
+def _price_bounds(name):
+    segment = PRICE_SEGMENTS.get(name, {"low": 5000, "high": 15000})
+    return segment["low"], segment["high"]
+
+
+def _option_details(steps, options):
+    """선택지별 (시간, 하한, 상한, 중간 가격). 가격이 고정이면 하한/상한은 0, 가격 구간이 없으면 중간 가격은 None"""
+    details = []
+    for (step, _), step_options in zip(steps, options):
+        step_details = []
+        for ck, fixed_price in step_options:
+            if ck is None:
+                step_details.append((0, 0.0, 0.0, None))
+                continue
+            product_data = PRODUCTS_DATA[step][ck]
+            mid = PRICE_SEGMENTS.get(product_data["name"], {}).get("mid")
+            if fixed_price is not None:
+                step_details.append((product_data["time"], 0.0, 0.0, mid))
+            else:
+                low, high = _price_bounds(product_data["name"])
+                step_details.append((product_data["time"], low, high, mid))
+        details.append(step_details)
+    return details
+
+
+def _deviation_range(low, high, mid):
+    """가격이 [low, high] 일 때 |가격 편차| 의 (최솟값, 최댓값)"""
+    far = max(abs(low - mid), abs(high - mid)) / mid
+    near = 0.0 if low <= mid <= high else min(abs(low - mid), abs(high - mid)) / mid
+    return near, far
+
+
+def _best_prices(priced, fixed_deviations, money_won):
+    """
+    제품 선택이 정해졌을 때의 가격 결정. priced 는 (하한, 상한, 중간 가격 또는 None) 목록입니다.
+
+    점수에서 남은 금액의 제곱이 지배적이므로 예산을 모두 쓰고(상한 합이 예산 이하면 모두 상한, 1원 미만 차이는 무시),
+    그 조건에서 불균형(|가격 편차| 의 표준 편차)을 최대로 합니다. |편차| 는 중간 가격을 경계로 1차식이라
+    구간마다 표준 편차가 볼록 함수이므로, 최댓값은 한 제품을 빼고 모두 하한/중간/상한인 점 중에 있습니다.
+    모든 점의 가격 합, |편차| 합, 제곱 합을 외적 합으로 만들어 두고, 남은 예산을 받는 제품마다 한 번에 계산합니다.
+    """
+    low = [item[0] for item in priced]
+    high = [item[1] for item in priced]
+    if sum(low) > money_won:
+        return None
+    if sum(high) <= money_won:
+        return high
+
+    def deviation(prices, mid):
+        return np.abs(prices - mid) / mid if mid is not None else np.zeros_like(prices)
+
+    points = [
+        np.array(
+            sorted({lo, hi} | ({md} if md is not None and lo < md < hi else set()))
+        )
+        for lo, hi, md in priced
+    ]
+    deviations = [deviation(pts, item[2]) for pts, item in zip(points, priced)]
+    price_sums = np.zeros(())
+    deviation_sums = np.zeros(())
+    square_sums = np.zeros(())
+    for pts, devs in zip(points, deviations):
+        price_sums = np.add.outer(price_sums, pts)
+        deviation_sums = np.add.outer(deviation_sums, devs)
+        square_sums = np.add.outer(square_sums, devs**2)
+
+    fixed = np.array(fixed_deviations, dtype=float)
+    count = sum(item[2] is not None for item in priced) + len(fixed)
+    best = None  # (불균형, 남은 예산을 받는 제품, 나머지 점 인덱스, 가격)
+    for j, (lo, hi, md) in enumerate(priced):
+        # j 를 뺀 나머지의 합 (j 축의 첫 점을 빼서 구함)
+        rest = price_sums.take(0, axis=j) - points[j][0]
+        # 부동소수점 합이 예산을 넘지 않도록 아주 조금 남김
+        value = money_won - rest - 1e-6
+        valid = (value >= lo - 1e-6) & (value <= hi)
+        if not valid.any():
+            continue
+        value = np.maximum(value, lo)
+        if count:
+            free = deviation(value, md)
+            total = deviation_sums.take(0, axis=j) - deviations[j][0] + free
+            squares = square_sums.take(0, axis=j) - deviations[j][0] ** 2 + free**2
+            total = total + fixed.sum()
+            squares = squares + (fixed**2).sum()
+            imbalance = np.where(valid, squares / count - (total / count) ** 2, -np.inf)
+        else:
+            imbalance = np.where(valid, 0.0, -np.inf)
+        index = int(np.argmax(imbalance))
+        if best is None or imbalance.flat[index] > best[0]:
+            best = (imbalance.flat[index], j, index, value.flat[index])
+
+    _, j, index, value = best
+    rest_shape = [len(pts) for k, pts in enumerate(points) if k != j]
+    rest_index = iter(np.unravel_index(index, rest_shape))
+    return [
+        value if k == j else points[k][next(rest_index)] for k in range(len(priced))
+    ]
+
+
+def _max_imbalance(deviation_ranges):
+    """
+    |가격 편차| 가 각각 [하한, 상한] 구간에 있을 때 표준 편차의 최댓값 (예산 조건 없이).
+    표준 편차는 볼록 함수라 최댓값은 구간 양 끝 조합 중에 있습니다. 한정값 계산용.
+    """
+    if not deviation_ranges:
+        return 0.0
+    lows = np.array([r[0] for r in deviation_ranges])
+    highs = np.array([r[1] for r in deviation_ranges])
+    n = len(deviation_ranges)
+    masks = ((np.arange(2**n)[:, None] >> np.arange(n)) & 1).astype(bool)
+    return float(np.where(masks, highs, lows).std(axis=1).max())
+
+
+def exact_optimization_step(
+    solution, steps, time_minutes, money_won, priority_weights, penalty_weight=500
+):
+    """
+    비용 최적화 단계 (결정적): 단계별 제품 선택을 분기 한정법으로 탐색하고, 선택마다 가격은 _best_prices 로 정합니다.
+    한정값은 남은 단계로 채울 수 있는 최대 시간/금액과 불균형으로 얻을 수 있는 최대 이득으로 계산하며,
+    한정값을 통과한 선택은 한정값이 낮은 것부터 가격을 계산합니다.
+    평가는 evaluate_solution 을 그대로 쓰며, 입력 솔루션보다 좋은 해가 없으면 입력을 반환합니다.
+    cost_optimization_step(담금질)은 settings.routine_solver = "anneal" 로 계속 쓸 수 있습니다.
+    """
+    options = _solution_options(solution, steps)
+    n = len(steps)
+    mask_relief = (
+        priority_weights[Step.MASK_PACK] * penalty_weight
+        if Step.MASK_PACK in [s[0] for s in steps] and time_minutes >= 15
+        else 0
+    )
+
+    details = _option_details(steps, options)
+
+    # 남은 단계에서 더할 수 있는 최대 시간/금액
+    max_time_after = [0] * (n + 1)
+    max_high_after = [0.0] * (n + 1)
+    for i in range(n - 1, -1, -1):
+        max_time_after[i] = max_time_after[i + 1] + max(d[0] for d in details[i])
+        max_high_after[i] = max_high_after[i + 1] + max(d[2] for d in details[i])
+
+    # 불균형(|가격 편차| 의 표준 편차) 상한: 전체 |편차| 범위의 절반
+    deviation_bounds = []
+    for step_options, step_details in zip(options, details):
+        for (ck, fixed_price), (_, low, high, mid) in zip(step_options, step_details):
+            if ck is None or mid is None:
+                continue
+            if fixed_price is not None:
+                low = high = fixed_price
+            deviation_bounds += _deviation_range(low, high, mid)
+    gain_bound = (
+        (max(deviation_bounds) - min(deviation_bounds)) / 2 * penalty_weight
+        if deviation_bounds
+        else 0.0
+    )
+
+    best_score = evaluate_solution(
+        solution, steps, time_minutes, money_won, priority_weights
+    )
+    best_solution = solution
+    chosen = [0] * n
+    # 한정값을 통과한 제품 선택: (한정값, 선택, 가격 계산 키)
+    leaves = []
+    # 같은 가격 구간 조합(카테고리 이름이 같은 제품 등)은 계산을 재사용
+    price_memo = {}
+    imbalance_memo = {}
+
+    def solve(selection, memo_key):
+        nonlocal best_score, best_solution
+        if memo_key not in price_memo:
+            price_memo[memo_key] = _best_prices(*memo_key, money_won)
+        prices = price_memo[memo_key]
+        if prices is None:
+            return
+        prices = iter(prices)
+        candidate = []
+        for i, option_index in enumerate(selection):
+            ck, fixed_price = options[i][option_index]
+            if ck is not None and fixed_price is None:
+                candidate.append((ck, float(next(prices))))
+            else:
+                candidate.append((ck, fixed_price))
+        score = evaluate_solution(
+            candidate, steps, time_minutes, money_won, priority_weights
+        )
+        if score < best_score:
+            best_score = score
+            best_solution = candidate
+
+    def leaf(used_time, sum_high, penalty):
+        base = (
+            (time_minutes - used_time) ** 2
+            + max(0.0, money_won - sum_high) ** 2
+            + max(penalty - mask_relief, 0)
+        )
+        if base - gain_bound >= best_score:
+            return
+        priced = []
+        fixed_deviations = []
+        deviation_ranges = []
+        for i, option_index in enumerate(chosen):
+            ck, fixed_price = options[i][option_index]
+            _, low, high, mid = details[i][option_index]
+            if ck is None:
+                continue
+            if fixed_price is None:
+                priced.append((low, high, mid))
+                if mid is not None:
+                    deviation_ranges.append(_deviation_range(low, high, mid))
+            elif mid is not None:
+                fixed_deviations.append(abs((fixed_price - mid) / mid))
+                deviation_ranges.append((fixed_deviations[-1],) * 2)
+
+        # 선택된 제품만으로 다시 한정 (시간/패널티는 정확, 불균형은 예산 조건 없는 최댓값)
+        memo_key = (tuple(priced), tuple(fixed_deviations))
+        if memo_key not in imbalance_memo:
+            imbalance_memo[memo_key] = _max_imbalance(deviation_ranges)
+        bound = base - imbalance_memo[memo_key] * penalty_weight
+        if bound >= best_score:
+            return
+        if not leaves:
+            # 처음 만난 선택(시간이 긴 제품 우선)은 바로 풀어서 이후 한정에 씀
+            solve(chosen, memo_key)
+        leaves.append((bound, tuple(chosen), memo_key))
+
+    def search(i, used_time, sum_low, sum_high, penalty):
+        time_left = max(0, time_minutes - used_time - max_time_after[i])
+        money_left = max(0.0, money_won - sum_high - max_high_after[i])
+        bound = (
+            time_left**2 + money_left**2 + max(penalty - mask_relief, 0) - gain_bound
+        )
+        if bound >= best_score:
+            return
+        if i == n:
+            leaf(used_time, sum_high, penalty)
+            return
+        step, _ = steps[i]
+        for option_index, (ck, _) in enumerate(options[i]):
+            option_time, low, high, _ = details[i][option_index]
+            chosen[i] = option_index
+            if ck is None:
+                search(
+                    i + 1,
+                    used_time,
+                    sum_low,
+                    sum_high,
+                    penalty + priority_weights[step] * penalty_weight,
+                )
+            elif used_time + option_time <= time_minutes and sum_low + low <= money_won:
+                search(
+                    i + 1,
+                    used_time + option_time,
+                    sum_low + low,
+                    sum_high + high,
+                    penalty,
+                )
+
+    search(0, 0, 0.0, 0.0, 0)
+    # 한정값이 낮은 선택부터 가격을 계산하고, 한정값이 현재 최선 이상이면 종료
+    leaves.sort(key=lambda leaf_entry: leaf_entry[0])
+    for bound, selection, memo_key in leaves:
+        if bound >= best_score:
+            break
+        solve(selection, memo_key)
+    return best_solution
+
+
+def _solution_encoding(solution, steps, priority_weights, penalty_weight=500):
+    """솔루션을 population 최적화용 배열로 바꿉니다. 반환: (인코딩, 단계별 선택지, 선택지 배열, 가격 배열)"""
+    options = _solution_options(solution, steps)
+    details = _option_details(steps, options)
+    n = len(steps)
+    width = max(len(step_options) for step_options in options)
+
+    time_table = np.zeros((n, width))
+    low = np.zeros((n, width))
+    high = np.zeros((n, width))
+    mid = np.full((n, width), np.nan)
+    fixed_price = np.full((n, width), np.nan)
+    is_none = np.ones((n, width), dtype=bool)
+    product_count = np.zeros(n, dtype=np.int64)
+    none_option = np.full(n, -1, dtype=np.int64)
+    choice = np.zeros(n, dtype=np.int64)
+    price = np.zeros(n)
+    for i, (step_options, step_details) in enumerate(zip(options, details)):
+        for j, ((ck, fixed), (option_time, lo, hi, md)) in enumerate(
+            zip(step_options, step_details)
+        ):
+            if ck is None:
+                if len(step_options) > 1:
+                    none_option[i] = j
+                continue
+            is_none[i, j] = False
+            product_count[i] += 1
+            time_table[i, j] = option_time
+            low[i, j], high[i, j] = lo, hi
+            if md is not None:
+                mid[i, j] = md
+            if fixed is not None:
+                fixed_price[i, j] = fixed
+        # 입력 솔루션의 선택
+        ck, chosen_price = solution[i]
+        choice[i] = next(j for j, (key, _) in enumerate(step_options) if key == ck)
+        price[i] = 0.0 if ck is None else chosen_price
+
+    weights = np.array([1 / (priority_weights[step] + 1) for step, _ in steps])
+    encoding = RoutineEncoding(
+        product_count=product_count,
+        none_option=none_option,
+        time=time_table,
+        low=low,
+        high=high,
+        mid=mid,
+        fixed_price=fixed_price,
+        is_none=is_none,
+        penalty=np.array(
+            [priority_weights[step] * penalty_weight for step, _ in steps], dtype=float
+        ),
+        step_weights=weights / weights.sum(),
+    )
+    return encoding, options, choice, price
+
+
+def population_optimization_step(
+    solution,
+    steps,
+    time_minutes,
+    money_won,
+    priority_weights,
+    time_budget=None,
+    max_iterations=None,
+    seed=None,
+    penalty_weight=500,
+):
+    """
+    비용 최적화 단계 (병렬 템퍼링): 솔루션을 정수/가격 배열로 바꿔 여러 체인을 numpy 로 한꺼번에 담금질합니다.
+    시간 예산, 반복 한도, seed 는 지정하지 않으면 설정값을 씁니다.
+    결과는 evaluate_solution 으로 다시 확인하며, 입력 솔루션보다 나쁘면 입력을 반환합니다.
+    """
+    encoding, options, choice, price = _solution_encoding(
+        solution, steps, priority_weights, penalty_weight
+    )
+    mask_relief = (
+        priority_weights[Step.MASK_PACK] * penalty_weight
+        if Step.MASK_PACK in [s[0] for s in steps] and time_minutes >= 15
+        else 0
+    )
+    best_choice, best_price, _ = parallel_tempering(
+        encoding,
+        choice,
+        price,
+        time_minutes,
+        money_won,
+        mask_relief,
+        population_size=settings.routine_population_size,
+        temperatures=settings.routine_population_temperatures,
+        time_budget=(
+            settings.routine_time_budget_ms / 1000
+            if time_budget is None
+            else time_budget
+        ),
+        max_iterations=(
+            settings.routine_max_iterations
+            if max_iterations is None
+            else max_iterations
+        ),
+        seed=settings.routine_seed if seed is None else seed,
+    )
+
+    candidate = []
+    for step_options, option_index, chosen_price in zip(
+        options, best_choice, best_price
+    ):
+        ck, fixed_price = step_options[option_index]
+        if ck is None or fixed_price is not None:
+            candidate.append((ck, fixed_price))
+        else:
+            candidate.append((ck, float(chosen_price)))
+    if evaluate_solution(
+        candidate, steps, time_minutes, money_won, priority_weights
+    ) < evaluate_solution(solution, steps, time_minutes, money_won, priority_weights):
+        return candidate
+    return solution
+
+
 def neighbor_solution_with_addition(solution, steps, owned_cosmetics, priority_weights):
     """이웃 생성: 기존 솔루션에서 제품 추가 또는 변경"""
     new_sol = solution[:]
@@ -370,24 +793,55 @@ def neighbor_solution_with_addition(solution, steps, owned_cosmetics, priority_w
     return new_sol
 
 
+def run_cost_optimization(solution, steps, time_minutes, money_won, priority_weights):
+    """settings.routine_solver 에 따라 비용 최적화를 실행합니다. 반환: (솔루션, 단계 이름)"""
+    if settings.routine_solver == "anneal":
+        stage, optimize = "cost_annealing", cost_optimization_step
+    elif settings.routine_solver == "population":
+        stage, optimize = "cost_population", population_optimization_step
+    else:
+        stage, optimize = "cost_exact", exact_optimization_step
+    return (
+        optimize(solution, steps, time_minutes, money_won, priority_weights),
+        stage,
+    )
+
+
 async def get_routine(
     time_minutes: int, money_won: int, owned_cosmetics: List[str]
 ) -> RoutineCreate:
     steps = PRIORITY_STEPS
+    timer = StageTimer("get_routine")
+
+    # 0. 캐시 조회 (예산은 버킷 단위로 내림)
+    money_won = routine_cache.bucket(money_won)
+    cache_key = routine_cache.make_key(time_minutes, money_won, owned_cosmetics)
+    cached = routine_cache.get(cache_key)
+    if cached is not None:
+        timer.mark("cache_hit")
+        return cached
 
     # 1. 최소 솔루션 생성
     minimal_solution = generate_minimal_solution(steps, owned_cosmetics, time_minutes)
+    timer.mark("minimal_solution")
 
     # 2. 루틴 최적화 단계
     routine_solution = routine_optimization_step(
         minimal_solution, steps, time_minutes, money_won
     )
+    timer.mark("routine_optimization")
 
-    # 3. 비용 최적화 단계
+    # 3. 비용 최적화 단계 (수~수십 ms 의 CPU 작업이라 이벤트 루프 밖에서 실행)
     priority_weights = {step: i + 1 for i, (step, _) in enumerate(steps)}
-    final_solution = cost_optimization_step(
-        routine_solution, steps, time_minutes, money_won, priority_weights
+    final_solution, stage = await asyncio.to_thread(
+        run_cost_optimization,
+        routine_solution,
+        steps,
+        time_minutes,
+        money_won,
+        priority_weights,
     )
+    timer.mark(stage)
 
     # 최종 루틴 구성
     selected_products = []
@@ -407,7 +861,10 @@ async def get_routine(
         )
         selected_products.append(sub_product)
 
-    return split_routine_by_time(selected_products)
+    routine = split_routine_by_time(selected_products)
+    routine_cache.set(cache_key, routine)
+    timer.mark("build")
+    return routine
 
 
 def split_routine_by_time(products: List[SubProductType]) -> RoutineCreate:
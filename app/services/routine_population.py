@@ -0,0 +1,282 @@
+# services/routine_population.py
+import time
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+
+
+class RoutineEncoding(NamedTuple):
+    """
+    루틴 솔루션의 배열 표현.
+
+    솔루션은 (단계별 선택지 인덱스, 단계별 가격) 두 배열이고, 선택지 정보는 (단계, 선택지) 배열에 둡니다.
+    선택지 순서는 제품들, 그 다음 제외(있을 때)이며 선택지가 적은 단계는 빈 칸을 제외 선택지처럼 채웁니다.
+    """
+
+    product_count: np.ndarray  # (단계,) 제품 선택지 수
+    none_option: np.ndarray  # (단계,) 제외 선택지 인덱스, 없으면 -1
+    time: np.ndarray  # (단계, 선택지)
+    low: np.ndarray
+    high: np.ndarray
+    mid: np.ndarray  # 가격 구간이 없으면 nan
+    fixed_price: np.ndarray  # 가격이 고정된 선택지(소유 제품 등)만 값, 나머지는 nan
+    is_none: np.ndarray  # 제외 선택지 여부
+    penalty: np.ndarray  # (단계,) 제외했을 때의 우선순위 패널티
+    step_weights: np.ndarray  # (단계,) 이웃 생성 시 단계 선택 확률
+
+
+def evaluate_population(
+    encoding: RoutineEncoding,
+    choice: np.ndarray,
+    price: np.ndarray,
+    time_minutes: int,
+    money_won: int,
+    mask_relief: float,
+    penalty_weight: float = 500,
+) -> np.ndarray:
+    """evaluate_solution 을 (후보, 단계) 배열에 대해 한 번에 계산합니다. 불가능한 해는 inf."""
+    steps = np.arange(choice.shape[1])
+    none = encoding.is_none[steps, choice]
+    used_time = encoding.time[steps, choice].sum(axis=1)
+    used_money = np.where(none, 0.0, np.maximum(price, 0.0)).sum(axis=1)
+    priority_penalty = np.maximum(
+        np.where(none, encoding.penalty, 0.0).sum(axis=1) - mask_relief, 0.0
+    )
+
+    mid = encoding.mid[steps, choice]
+    has_deviation = ~none & ~np.isnan(mid)
+    mid = np.where(has_deviation, mid, 1.0)
+    deviation = np.where(has_deviation, np.abs((price - mid) / mid), 0.0)
+    count = np.maximum(has_deviation.sum(axis=1), 1)
+    mean = deviation.sum(axis=1) / count
+    imbalance = np.sqrt(
+        np.where(has_deviation, (deviation - mean[:, None]) ** 2, 0.0).sum(axis=1)
+        / count
+    )
+
+    score = (
+        (time_minutes - used_time) ** 2
+        + (money_won - used_money) ** 2
+        - imbalance * penalty_weight
+        + priority_penalty
+    )
+    feasible = (used_time <= time_minutes) & (used_money <= money_won)
+    return np.where(feasible, score, np.inf)
+
+
+def propose(
+    encoding: RoutineEncoding,
+    choice: np.ndarray,
+    price: np.ndarray,
+    money_won: int,
+    rng: np.random.Generator,
+    tweak_scale: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    후보마다 한 단계를 골라 이웃을 만듭니다. (cost_optimization_step 과 같은 규칙에 가격 조정 추가)
+    - 제품을 고를 수 있는 단계: 1/3 제외, 1/3 가격만 조정, 나머지는 제품과 가격을 새로 선택
+    - 가격만 바꿀 수 있는 단계(클렌징/선케어): 1/2 가격만 조정, 1/2 새로 선택
+    - 소유 제품 등 고정 단계: 그대로
+    새 가격은 절반은 무작위(새로 선택은 구간에서 균등, 조정은 가격 구간의 5% 와 tweak_scale 중 작은 값을 표준 편차로),
+    절반은 남은 예산을 모두 쓰는 가격(구간 안으로 자름)입니다. 제품을 바꾸면 남은 예산이 크게 달라져
+    무작위 가격만으로는 좋은 조합 사이를 건너기 어렵기 때문입니다. 같은 이유로 절반은 다른 한 단계의 가격도 함께 맞춥니다.
+    """
+    count = len(choice)
+    rows = np.arange(count)
+    steps = np.arange(choice.shape[1])
+    step = rng.choice(len(encoding.step_weights), size=count, p=encoding.step_weights)
+    option = choice[rows, step]
+    selectable = encoding.none_option[step] >= 0
+    current_none = encoding.is_none[step, option]
+    price_varies = ~current_none & np.isnan(encoding.fixed_price[step, option])
+    u = rng.random(count)
+
+    remove = selectable & (u < 1 / 3)
+    tweak = price_varies & ~remove & (u < np.where(selectable, 2 / 3, 1 / 2))
+    resample = ~remove & ~tweak & (selectable | price_varies)
+
+    new_option = np.where(
+        remove,
+        encoding.none_option[step],
+        np.where(
+            resample & selectable,
+            (rng.random(count) * encoding.product_count[step]).astype(np.int64),
+            option,
+        ),
+    )
+    low = encoding.low[step, new_option]
+    high = encoding.high[step, new_option]
+    current = price[rows, step]
+
+    # 이 단계의 현재 가격까지 포함해 남은 예산을 모두 쓰는 가격
+    used_money = np.where(
+        encoding.is_none[steps, choice], 0.0, np.maximum(price, 0.0)
+    ).sum(axis=1)
+    # (부동소수점 합이 예산을 넘지 않도록 아주 조금 남김)
+    fill = np.clip(
+        money_won
+        - used_money
+        + np.where(current_none, 0.0, np.maximum(current, 0.0))
+        - 1e-6,
+        low,
+        high,
+    )
+    use_fill = rng.random(count) < 0.5
+    random_price = np.where(
+        resample,
+        low + (high - low) * rng.random(count),
+        np.clip(
+            current
+            + rng.normal(0.0, 1.0, count)
+            * np.minimum(0.05 * (high - low), tweak_scale),
+            low,
+            high,
+        ),
+    )
+    new_price = np.where(
+        remove,
+        0.0,
+        np.where(
+            resample | tweak,
+            np.where(use_fill, fill, random_price),
+            current,
+        ),
+    )
+
+    new_choice = choice.copy()
+    new_price_array = price.copy()
+    new_choice[rows, step] = new_option
+    new_price_array[rows, step] = new_price
+
+    # 절반은 다른 한 단계의 가격으로 바뀐 남은 예산을 흡수 (제품을 빼거나 바꿀 때 예산이 크게 남지 않도록)
+    other = rng.integers(0, choice.shape[1], size=count)
+    other_option = new_choice[rows, other]
+    repair = (
+        (other != step)
+        & (rng.random(count) < 0.5)
+        & ~encoding.is_none[other, other_option]
+        & np.isnan(encoding.fixed_price[other, other_option])
+    )
+    slack = money_won - np.where(
+        encoding.is_none[steps, new_choice],
+        0.0,
+        np.maximum(new_price_array, 0.0),
+    ).sum(axis=1)
+    new_price_array[rows, other] = np.where(
+        repair,
+        np.clip(
+            new_price_array[rows, other] + slack - 1e-6,
+            encoding.low[other, other_option],
+            encoding.high[other, other_option],
+        ),
+        new_price_array[rows, other],
+    )
+    return new_choice, new_price_array
+
+
+def parallel_tempering(
+    encoding: RoutineEncoding,
+    initial_choice: np.ndarray,
+    initial_price: np.ndarray,
+    time_minutes: int,
+    money_won: int,
+    mask_relief: float,
+    population_size: int = 256,
+    temperatures: int = 16,
+    min_temperature: float = 1.0,
+    max_temperature: float = 1e7,
+    swap_interval: int = 10,
+    time_budget: float = 0.03,
+    max_iterations: int = 0,
+    seed: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray, float]:
+    """
+    병렬 템퍼링. population_size 개 체인을 temperatures 개 온도(등비)에 고르게 나누어 한꺼번에 이웃을 만들고 평가하며,
+    swap_interval 번마다 이웃한 온도의 체인끼리 상태 교환을 시도합니다.
+
+    time_budget(초) 또는 max_iterations(0 이면 무제한) 중 먼저 닿는 곳에서 멈춥니다.
+    seed 를 주면 같은 반복 횟수에서 같은 결과가 나오므로, 재현이 필요하면 max_iterations 로 멈추게 합니다.
+    반환: (가장 좋은 선택지 배열, 가격 배열, 점수)
+    """
+    if time_budget <= 0 and max_iterations <= 0:
+        raise ValueError("time_budget 또는 max_iterations 중 하나는 지정해야 합니다")
+    rng = np.random.default_rng(seed)
+    per_temperature = max(1, population_size // temperatures)
+    ladder = np.geomspace(min_temperature, max_temperature, temperatures)
+    chain_temperature = np.repeat(ladder, per_temperature)
+    chains = len(chain_temperature)
+    # 점수가 남은 시간/금액의 제곱이라 온도 T 에서 의미 있는 가격 변화는 대략 sqrt(T) 원
+    tweak_scale = np.sqrt(chain_temperature)
+
+    choice = np.tile(initial_choice, (chains, 1))
+    price = np.tile(initial_price.astype(float), (chains, 1))
+    score = evaluate_population(
+        encoding, choice, price, time_minutes, money_won, mask_relief
+    )
+    best = int(np.argmin(score))
+    best_choice, best_price, best_score = (
+        choice[best].copy(),
+        price[best].copy(),
+        score[best],
+    )
+
+    deadline = time.perf_counter() + time_budget
+    iteration = 0
+    with np.errstate(invalid="ignore", over="ignore"):
+        while not (max_iterations > 0 and iteration >= max_iterations) and not (
+            time_budget > 0 and time.perf_counter() >= deadline
+        ):
+            iteration += 1
+            new_choice, new_price = propose(
+                encoding, choice, price, money_won, rng, tweak_scale
+            )
+            new_score = evaluate_population(
+                encoding, new_choice, new_price, time_minutes, money_won, mask_relief
+            )
+            accept = (new_score < score) | (
+                rng.random(chains) < np.exp(-(new_score - score) / chain_temperature)
+            )
+            choice[accept] = new_choice[accept]
+            price[accept] = new_price[accept]
+            score[accept] = new_score[accept]
+
+            current = int(np.argmin(score))
+            if score[current] < best_score:
+                best_choice = choice[current].copy()
+                best_price = price[current].copy()
+                best_score = score[current]
+
+            if iteration % swap_interval == 0:
+                _swap_replicas(
+                    choice,
+                    price,
+                    score,
+                    ladder,
+                    per_temperature,
+                    (iteration // swap_interval) % 2,
+                    rng,
+                )
+
+    return best_choice, best_price, float(best_score)
+
+
+def _swap_replicas(choice, price, score, ladder, per_temperature, parity, rng):
+    """이웃한 온도 (k, k+1) 의 같은 열 체인끼리 교환. parity 로 짝/홀 쌍을 번갈아 시도합니다."""
+    levels = len(ladder)
+    lower = np.arange(parity, levels - 1, 2)
+    if len(lower) == 0:
+        return
+    shaped_score = score.reshape(levels, per_temperature)
+    energy_low = shaped_score[lower]
+    energy_high = shaped_score[lower + 1]
+    beta_gap = (1.0 / ladder[lower] - 1.0 / ladder[lower + 1])[:, None]
+    log_accept = (energy_low - energy_high) * beta_gap
+    swap = (log_accept > 0) | (rng.random(log_accept.shape) < np.exp(log_accept))
+
+    for array in (choice, price, score):
+        shaped = array.reshape(levels, per_temperature, -1)
+        a = shaped[lower].copy()
+        b = shaped[lower + 1].copy()
+        mask = swap[:, :, None]
+        shaped[lower] = np.where(mask, b, a)
+        shaped[lower + 1] = np.where(mask, a, b)
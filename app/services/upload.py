@@ -0,0 +1,154 @@
+# services/upload.py
+import io
+import json
+import math
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+
+from core.config import settings
+
+CHUNK_SIZE = 64 * 1024
+DRAFT_FACTORS = (8, 4, 2)
+
+
+async def read_upload(file: UploadFile, max_bytes: int = 0) -> bytes:
+    """
+    업로드 파일을 청크 단위로 읽고, 한도를 넘으면 끝까지 읽지 않고 바로 413 으로 거절합니다.
+    """
+    max_bytes = max_bytes or settings.upload_max_bytes
+    if file.size is not None and file.size > max_bytes:
+        raise HTTPException(status_code=413, detail="Uploaded file is too large")
+
+    buffer = bytearray()
+    while True:
+        chunk = await file.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        buffer.extend(chunk)
+        if len(buffer) > max_bytes:
+            raise HTTPException(status_code=413, detail="Uploaded file is too large")
+    return bytes(buffer)
+
+
+def open_image(contents: bytes) -> Image.Image:
+    """
+    이미지 헤더만 읽어 포맷과 크기를 확인한 뒤, 아직 디코딩하지 않은 PIL 이미지를 반환합니다.
+    """
+    try:
+        img = Image.open(io.BytesIO(contents))
+    except Exception:
+        raise ValueError("Invalid image format")
+    if img.format not in settings.upload_allowed_formats:
+        raise ValueError(f"Unsupported image format: {img.format}")
+    width, height = img.size
+    if width <= 0 or height <= 0 or width * height > settings.upload_max_pixels:
+        raise ValueError(f"Image dimensions out of range: {width}x{height}")
+    return img
+
+
+def decode_for_crops(
+    contents: bytes, bboxes: List[list], target_size: int
+) -> Tuple[np.ndarray, List[list]]:
+    """
+    crop 할 영역들이 target_size 보다 충분히 크면 JPEG 를 1/2, 1/4, 1/8 크기로 바로 디코딩합니다. (PIL draft)
+
+    가장 작은 crop 도 축소 후 target_size 이상이 되는 배율만 사용하며,
+    실제 적용된 배율에 맞춰 bbox 좌표를 변환해서 함께 반환합니다.
+    """
+    img = open_image(contents)
+    if settings.upload_jpeg_draft and img.format == "JPEG" and bboxes:
+        min_side = min(max(b[2] - b[0], b[3] - b[1]) for b in bboxes)
+        for factor in DRAFT_FACTORS:
+            if min_side / factor >= target_size:
+                width, height = img.size
+                img.draft(
+                    "RGB", (math.ceil(width / factor), math.ceil(height / factor))
+                )
+                scale = width / img.size[0]
+                bboxes = [[int(v / scale) for v in bbox] for bbox in bboxes]
+                break
+    try:
+        return np.asarray(img.convert("RGB")), bboxes
+    except Exception:
+        raise ValueError("Invalid image format")
+
+
+class UploadLimitMiddleware:
+    """
+    이미지 업로드 경로의 요청 본문 크기를 제한하는 ASGI 미들웨어.
+
+    Content-Length 가 한도를 넘으면 본문을 읽지 않고 바로 413 을 반환하고,
+    chunked 전송처럼 길이를 모르는 경우에는 받은 만큼 세다가 한도를 넘는 순간 중단합니다.
+    path_limits 에 있는 경로(배치 업로드 등)는 해당 한도를 대신 사용합니다.
+    """
+
+    def __init__(
+        self,
+        app,
+        max_bytes: int,
+        paths: List[str],
+        path_limits: Optional[Dict[str, int]] = None,
+    ):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = tuple(paths)
+        # 더 긴(구체적인) 경로가 먼저 매칭되도록 정렬
+        self.path_limits = sorted(
+            (path_limits or {}).items(), key=lambda item: len(item[0]), reverse=True
+        )
+
+    def limit_for(self, path: str) -> int:
+        for prefix, limit in self.path_limits:
+            if path.startswith(prefix):
+                return limit
+        return self.max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes = self.limit_for(scope["path"])
+        for name, value in scope.get("headers", []):
+            if name != b"content-length":
+                continue
+            # 숫자가 아닌 Content-Length 는 int() 에서 500 이 나지 않도록 먼저 400 으로 거절
+            if not value.strip().isdigit():
+                await self._reject(send, 400, "Invalid Content-Length header")
+                return
+            if int(value) > max_bytes:
+                await self._reject(send, 413, "Request body is too large")
+                return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    # FastAPI 가 HTTPException 은 그대로 전달하므로 413 응답이 됩니다.
+                    raise HTTPException(
+                        status_code=413, detail="Request body is too large"
+                    )
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    async def _reject(self, send, status: int, detail: str):
+        body = json.dumps({"detail": detail}).encode("utf-8")
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
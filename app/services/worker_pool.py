@@ -0,0 +1,109 @@
+# services/worker_pool.py
+import asyncio
+import functools
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Optional
+
+from core.config import settings
+
+
+class PoolSaturatedError(Exception):
+    """엔드포인트의 동시 처리 한도를 넘은 요청. API 레이어에서 503으로 변환합니다."""
+
+    def __init__(self, endpoint: str, limit: int):
+        super().__init__(f"Too many concurrent requests for {endpoint} (limit {limit})")
+        self.endpoint = endpoint
+        self.limit = limit
+
+
+class WorkerPool:
+    """
+    CPU를 많이 쓰는 작업(이미지 디코딩, 전처리, OpenCV 연산 등)을 이벤트 루프 밖에서 실행하는 풀입니다.
+
+    - kind 가 "thread" 이면 ThreadPoolExecutor, "process" 이면 spawn 방식의 ProcessPoolExecutor 를 사용합니다.
+      (torch/cv2 는 연산 중 GIL을 놓기 때문에 대부분의 경우 thread 로 충분합니다.)
+    - admit(endpoint) 로 엔드포인트별 동시 처리 요청 수를 제한하며, 한도를 넘으면 대기하지 않고
+      바로 PoolSaturatedError 를 발생시킵니다.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        max_workers: int,
+        default_limit: int,
+        endpoint_limits: Optional[Dict[str, int]] = None,
+    ):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown worker pool kind: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.default_limit = default_limit
+        self.endpoint_limits = endpoint_limits or {}
+        self.in_flight: Dict[str, int] = defaultdict(int)
+        self.rejected: Dict[str, int] = defaultdict(int)
+        self._executor: Optional[Executor] = None
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="cpu-worker"
+                )
+        return self._executor
+
+    def limit_for(self, endpoint: str) -> int:
+        return self.endpoint_limits.get(endpoint, self.default_limit)
+
+    @asynccontextmanager
+    async def admit(self, endpoint: str):
+        """엔드포인트의 동시 처리 슬롯을 하나 점유합니다. 남은 슬롯이 없으면 PoolSaturatedError."""
+        limit = self.limit_for(endpoint)
+        if self.in_flight[endpoint] >= limit:
+            self.rejected[endpoint] += 1
+            raise PoolSaturatedError(endpoint, limit)
+        self.in_flight[endpoint] += 1
+        try:
+            yield
+        finally:
+            self.in_flight[endpoint] -= 1
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """fn(*args, **kwargs) 를 풀에서 실행하고 결과를 기다립니다. process 풀이면 인자와 결과는 pickle 가능해야 합니다."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(fn, *args, **kwargs)
+        )
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "in_flight": dict(self.in_flight),
+            "rejected": dict(self.rejected),
+            "limits": {
+                endpoint: self.limit_for(endpoint)
+                for endpoint in set(self.in_flight) | set(self.endpoint_limits)
+            },
+        }
+
+
+worker_pool = WorkerPool(
+    kind=settings.worker_pool_kind,
+    max_workers=settings.worker_pool_size,
+    default_limit=settings.worker_pool_max_in_flight,
+    endpoint_limits=settings.worker_pool_endpoint_limits,
+)
@@ -0,0 +1,13 @@
+# tests/conftest.py
+import os
+
+# core.config.Settings 의 필수 값 (테스트는 MongoDB/OpenAI 에 접속하지 않음)
+for name, value in {
+    "MONGO_URI": "mongodb://localhost:1",
+    "TOKEN_SECRET": "test-secret",
+    "TOKEN_ALGORITHM": "HS256",
+    "GOOGLE_CLIENT_ID": "test-client",
+    "GOOGLE_CLIENT_KEY": "test-key",
+    "OPENAI_KEY": "test-openai-key",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,64 @@
+# tests/test_cosmetic_scoring.py
+"""
+추천 점수 계산의 NumPy 구현이 이전 pandas/sklearn 구현과 같은 결과를 내는지 확인합니다.
+
+- minmax_scale 은 MinMaxScaler().fit_transform 과 비트 단위로 같아야 합니다.
+- top_k_positions 는 sort_values(ascending=False).head(k) 와 같은 제품을 같은 순서로 골라야 합니다.
+  (pandas 기본 quicksort 는 동점 순서가 정해져 있지 않으므로 동점은 stable 정렬 결과와 비교)
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import MinMaxScaler
+
+from services.cosmetic_recommend import minmax_scale, top_k_positions
+
+
+def sklearn_minmax(values: np.ndarray) -> np.ndarray:
+    return MinMaxScaler().fit_transform(pd.DataFrame(values))[:, 0]
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        np.random.default_rng(0).integers(1, 5000, size=300),  # 순위
+        np.random.default_rng(1).integers(1000, 120000, size=57),  # 가격
+        np.random.default_rng(2).random(200) * 3.7,  # 고민 점수 합
+        np.array([7, 7, 7, 7]),  # 범위가 0
+        np.array([0.0, 1e-17, 2e-17]),  # 범위가 eps 보다 작음
+        np.array([42]),
+    ],
+)
+def test_minmax_scale_matches_sklearn(values):
+    actual = minmax_scale(values, values.min(), values.max())
+    np.testing.assert_array_equal(actual, sklearn_minmax(values))
+
+
+def pandas_top_k(scores: np.ndarray, k: int, kind: str = "stable") -> np.ndarray:
+    frame = pd.DataFrame({"total_score": scores})
+    return (
+        frame.sort_values(by="total_score", ascending=False, kind=kind)
+        .head(k)
+        .index.to_numpy()
+    )
+
+
+@pytest.mark.parametrize("k", [1, 3, 10, 50, 500])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_top_k_positions_matches_pandas(seed, k):
+    rng = np.random.default_rng(seed)
+    # 동점이 많이 생기도록 소수 둘째 자리로 반올림
+    scores = np.round(rng.random(400) * 100, 2)
+    np.testing.assert_array_equal(top_k_positions(scores, k), pandas_top_k(scores, k))
+    # 기본 quicksort 와는 같은 점수들이 골라져야 함
+    np.testing.assert_array_equal(
+        scores[top_k_positions(scores, k)],
+        scores[pandas_top_k(scores, k, kind="quicksort")],
+    )
+
+
+def test_top_k_positions_all_ties_follow_catalog_order():
+    scores = np.full(20, 55.5)
+    np.testing.assert_array_equal(top_k_positions(scores, 5), np.arange(5))
+    np.testing.assert_array_equal(top_k_positions(scores, 30), np.arange(20))
@@ -0,0 +1,177 @@
+# tests/test_detect_acne.py
+"""
+AcneDetector 로 바꾼 여드름 감지가 기존 파이프라인과 같은 결과를 내는지 확인합니다.
+
+reference_detect_acne 는 라벨 한 번으로 테두리를 계산하기 전(윤곽선마다 마스크를 그리던)
+detect_acne 를 그대로 옮긴 것입니다. 점수와 오버레이 픽셀, 기본 JPEG 응답 바이트가 모두 같아야 합니다.
+"""
+
+import base64
+import io
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+from services.detect_acne import detect_acne, process_acne_image, to_json_result
+
+
+def reference_find_red_hue_ranges(hue_channel: np.ndarray) -> Tuple[int, int, int, int]:
+    hist = cv2.calcHist([hue_channel], [0], None, [180], [0, 180]).flatten()
+    hist_smooth = cv2.GaussianBlur(hist, (9, 9), 0)
+    peaks = []
+    threshold = np.max(hist_smooth) * 0.1
+    for i in range(1, len(hist_smooth) - 1):
+        if (
+            hist_smooth[i] > hist_smooth[i - 1]
+            and hist_smooth[i] > hist_smooth[i + 1]
+            and hist_smooth[i] > threshold
+        ):
+            peaks.append(i)
+    lower_red_hue1 = max(peaks[0] - 10, 0) if len(peaks) > 0 else 0
+    upper_red_hue1 = min(peaks[0] * 2 // 3, 180) if len(peaks) > 0 else 10
+    lower_red_hue2 = max(peaks[1] - 10, 170) if len(peaks) > 1 else 170
+    return lower_red_hue1, upper_red_hue1, lower_red_hue2, 180
+
+
+def reference_get_skin_mask(ycrcb_image: np.ndarray) -> np.ndarray:
+    lower = np.array([0, 133, 77], dtype=np.uint8)
+    upper = np.array([255, 173, 127], dtype=np.uint8)
+    skin_mask = cv2.inRange(ycrcb_image, lower, upper)
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+    skin_mask = cv2.morphologyEx(skin_mask, cv2.MORPH_OPEN, kernel, iterations=2)
+    skin_mask = cv2.morphologyEx(skin_mask, cv2.MORPH_DILATE, kernel, iterations=1)
+    return skin_mask
+
+
+def reference_detect_acne(
+    image: Image.Image, bbox: List[int]
+) -> Tuple[Image.Image, int]:
+    raw_image_cv = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+    x1, y1, x2, y2 = bbox
+    image_cv = raw_image_cv[y1:y2, x1:x2]
+
+    skin_mask = reference_get_skin_mask(cv2.cvtColor(image_cv, cv2.COLOR_BGR2YCrCb))
+    r_channel = image_cv[:, :, 2]
+    skin_r_values = r_channel[skin_mask > 0]
+    if len(skin_r_values) == 0:
+        return image, 100
+
+    num_values = min(5, len(skin_r_values))
+    sorted_r = np.sort(skin_r_values)
+    average_red_threshold = (
+        float(np.mean(sorted_r[:num_values])) + float(np.mean(sorted_r[-num_values:]))
+    ) / 2.0
+
+    hsv_initial = cv2.cvtColor(cv2.GaussianBlur(image_cv, (5, 5), 0), cv2.COLOR_BGR2HSV)
+    lower1, upper1, lower2, upper2 = reference_find_red_hue_ranges(hsv_initial[:, :, 0])
+    red_mask = cv2.bitwise_or(
+        cv2.inRange(
+            hsv_initial, np.array([lower1, 70, 50]), np.array([upper1, 255, 255])
+        ),
+        cv2.inRange(
+            hsv_initial, np.array([lower2, 70, 50]), np.array([upper2, 255, 255])
+        ),
+    )
+
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+    acne_mask = cv2.morphologyEx(red_mask, cv2.MORPH_OPEN, kernel)
+    acne_mask = cv2.morphologyEx(acne_mask, cv2.MORPH_CLOSE, kernel)
+    acne_mask = cv2.GaussianBlur(acne_mask, (5, 5), 0)
+    contours, _ = cv2.findContours(
+        acne_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
+    )
+
+    filtered_contours = []
+    for cnt in contours:
+        area = cv2.contourArea(cnt)
+        if not (30 < area < 7000):
+            continue
+        perimeter = cv2.arcLength(cnt, True)
+        if perimeter == 0:
+            continue
+        if 4 * np.pi * (area / (perimeter * perimeter)) < 0.1:
+            continue
+        contour_mask = np.zeros(acne_mask.shape, dtype=np.uint8)
+        cv2.drawContours(contour_mask, [cnt], -1, 255, -1)
+        border_mask = cv2.subtract(
+            contour_mask, cv2.erode(contour_mask, kernel, iterations=1)
+        )
+        if float(cv2.mean(r_channel, mask=border_mask)[0]) > average_red_threshold:
+            filtered_contours.append(cnt)
+
+    result_image = image_cv.copy()
+    cv2.drawContours(result_image, filtered_contours, -1, (0, 255, 0), 2)
+    result_pil = Image.fromarray(cv2.cvtColor(result_image, cv2.COLOR_BGR2RGB))
+    total_area = image_cv.shape[0] * image_cv.shape[1]
+    percentage = (
+        sum([cv2.contourArea(cnt) for cnt in filtered_contours]) / total_area * 100
+    )
+    return result_pil, 100 - min(50, int(percentage * 20))
+
+
+def synthetic_face(seed: int, size: Tuple[int, int] = (320, 240)) -> Image.Image:
+    """피부색 바탕에 크기와 색이 다른 붉은 점(여드름) 몇 개와 밝기 잡음을 넣은 이미지"""
+    rng = np.random.default_rng(seed)
+    width, height = size
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[:] = (210, 175, 160)
+    for _ in range(5):
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        radius = int(rng.integers(3, 9))
+        color = (int(rng.integers(170, 230)), int(rng.integers(40, 110)), 80)
+        cv2.circle(image, center, radius, color, -1)
+    noise = rng.normal(0, 4, image.shape)
+    return Image.fromarray(np.clip(image + noise, 0, 255).astype(np.uint8))
+
+
+CASES = [
+    (0, [0, 0, 320, 240]),
+    (1, [20, 10, 300, 230]),
+    (2, [37, 41, 251, 199]),
+    (3, [0, 0, 160, 120]),
+]
+
+
+@pytest.mark.parametrize("seed,bbox", CASES)
+def test_overlay_and_score_match_reference(seed, bbox):
+    image = synthetic_face(seed)
+    expected_image, expected_score = reference_detect_acne(image, bbox)
+    actual_image, actual_score = detect_acne(image, bbox)
+
+    assert actual_score == expected_score
+    assert np.array_equal(np.asarray(actual_image), np.asarray(expected_image))
+
+
+def test_fixtures_detect_acne():
+    # 모든 경우가 "여드름 없음"(100) 이거나 하한(50)이면 비교가 의미 없으므로 그 사이 점수가 있어야 함
+    scores = [
+        reference_detect_acne(synthetic_face(seed), bbox)[1] for seed, bbox in CASES
+    ]
+    assert any(50 < score < 100 for score in scores)
+
+
+@pytest.mark.parametrize("seed,bbox", CASES)
+def test_default_jpeg_response_is_byte_identical(seed, bbox):
+    buffered = io.BytesIO()
+    synthetic_face(seed).save(buffered, format="PNG")
+    contents = buffered.getvalue()
+
+    expected_image, expected_score = reference_detect_acne(
+        Image.open(io.BytesIO(contents)).convert("RGB"), bbox
+    )
+    expected_jpeg = io.BytesIO()
+    expected_image.save(expected_jpeg, format="JPEG")
+
+    result = to_json_result(process_acne_image(contents, bbox))
+    assert result["score"] == expected_score
+    assert base64.b64decode(result["processed_image"]) == expected_jpeg.getvalue()
+
+
+def test_no_skin_returns_original_image():
+    image = Image.new("RGB", (64, 64), (20, 40, 200))
+    result_image, score = detect_acne(image, [0, 0, 64, 64])
+    assert score == 100
+    assert np.array_equal(np.asarray(result_image), np.asarray(image))
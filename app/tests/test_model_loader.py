@@ -0,0 +1,70 @@
+# tests/test_model_loader.py
+"""지연 로딩에서 체크포인트 로드가 실패한 head 는 기록하지 않고 다음 요청에서 다시 로드하는지 확인합니다."""
+
+import pytest
+import torch
+import torch.nn as nn
+
+from services import model_loader
+
+
+class TinyModel(nn.Module):
+    """add_model 이 쓰는 구조(마지막 자식이 fc)만 갖춘 작은 모델"""
+
+    def __init__(self, output_size: int):
+        super().__init__()
+        self.pool = nn.AdaptiveAvgPool2d(1)
+        self.fc = nn.Linear(3, output_size)
+
+
+@pytest.fixture
+def fresh_loader(monkeypatch):
+    monkeypatch.setattr(
+        model_loader, "inference_engine", model_loader.SharedBackboneEngine()
+    )
+    monkeypatch.setattr(model_loader, "_attempted", set())
+    monkeypatch.setattr(model_loader, "regression_models", {})
+    monkeypatch.setattr(model_loader, "classification_models", {})
+    calls = []
+
+    def fake_load(kind, label, device):
+        calls.append((kind, label))
+        if (kind, label) == ("regression", "elasticity") and calls.count(
+            (kind, label)
+        ) == 1:
+            raise OSError("No space left on device")
+        if (kind, label) == ("regression", "moisture"):
+            return None  # 체크포인트 없음
+        return TinyModel(2 if kind == "classification" else 1)
+
+    monkeypatch.setattr(model_loader, "_load_checkpoint_model", fake_load)
+    return calls
+
+
+def test_failed_load_is_retried_on_next_call(fresh_loader):
+    calls = fresh_loader
+    # chin: regression moisture/elasticity, classification sagging
+    with pytest.raises(OSError):
+        model_loader.ensure_models_for_areas(["chin"])
+    assert model_loader.inference_engine.area_heads("chin") == [
+        ("classification", "sagging")
+    ]
+    assert ("regression", "elasticity") not in model_loader._attempted
+
+    model_loader.ensure_models_for_areas(["chin"])
+    assert model_loader.inference_engine.area_heads("chin") == [
+        ("regression", "elasticity"),
+        ("classification", "sagging"),
+    ]
+    # 성공했거나 체크포인트가 없던 head 는 다시 읽지 않음
+    assert calls.count(("regression", "elasticity")) == 2
+    assert calls.count(("regression", "moisture")) == 1
+    assert calls.count(("classification", "sagging")) == 1
+
+    outputs = model_loader.inference_engine.run_batch(["chin"], torch.rand(1, 3, 8, 8))
+    assert set(outputs[0]["regression"]) == {"elasticity"}
+    assert set(outputs[0]["classification"]) == {"sagging"}
+
+    # 모두 시도한 뒤에는 더 이상 로드하지 않음
+    model_loader.ensure_models_for_areas(["chin"])
+    assert len(calls) == 4
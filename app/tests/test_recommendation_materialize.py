@@ -0,0 +1,118 @@
+# tests/test_recommendation_materialize.py
+"""
+세그먼트 사전 계산(RecommendationMaterializer)을 켠 추천 결과가 전체 계산과 같은지 확인합니다.
+
+지배 관계로 줄인 후보 목록과 가격 오름차순 누적 최소/최대로 구한 정규화 범위를 쓰더라도
+같은 제품을 같은 순서, 같은 점수로 반환해야 합니다. (동점, 최저가보다 낮은 예산 포함)
+"""
+
+import asyncio
+import random
+
+import pytest
+from fastapi import HTTPException
+
+from services import cosmetic_recommend, product_catalog
+from services.product_catalog import ProductCatalog
+from services.recommendation_materialize import RecommendationMaterializer
+
+CONCERNS = ["여드름", "건조", "미백", "주름"]
+SKIN_TYPES = ["건성", "지성", "복합성", "민감성"]
+COSMETIC_TYPES = ["toner", "cream", "serum"]
+VOCABULARY = [f"성분{i}" for i in range(60)]
+DEPTH = 10
+
+
+def synthetic_documents(seed: int):
+    rng = random.Random(seed)
+    products = []
+    for i in range(160):
+        products.append(
+            {
+                "_id": f"p{i}",
+                "name": f"제품{i}",
+                "brand": f"브랜드{i % 7}",
+                "original_price": 40000,
+                # 가격/순위 값을 적게 두어 동점이 많이 생기게 함
+                "selling_price": rng.choice([9000, 12000, 15000, 21000, 33000]),
+                "review_count": rng.randint(0, 500),
+                "rank": rng.randint(1, 30),
+                "link": f"https://example.com/{i}",
+                "skin_type": rng.choice(SKIN_TYPES + ["전체"]),
+                "cosmetic_type": rng.sample(COSMETIC_TYPES, rng.randint(1, 2)),
+                "ingredients": "|".join(rng.sample(VOCABULARY, rng.randint(2, 8))),
+                "image_url": f"https://example.com/{i}.jpg",
+            }
+        )
+    # 내용이 완전히 같은 제품 (동점은 카탈로그 순서로 정렬되어야 함)
+    for i in range(15):
+        products.append({**products[i * 3], "_id": f"dup{i}"})
+
+    concern_ingredients = []
+    for name in rng.sample(VOCABULARY, 40):
+        document = {"_id": name, "Korean Name": name}
+        for concern in CONCERNS:
+            document[concern] = rng.choice([0, 0, 1, 2, 3])
+        concern_ingredients.append(document)
+    return products, concern_ingredients
+
+
+def random_queries(seed: int, count: int):
+    rng = random.Random(seed)
+    for _ in range(count):
+        concerns = rng.sample(CONCERNS, rng.randint(0, 2))
+        if rng.random() < 0.1:
+            concerns.append("효능 데이터에 없는 고민")
+        yield (
+            rng.choice(SKIN_TYPES),
+            concerns,
+            rng.choice(COSMETIC_TYPES),
+            # 최저가(9000)보다 낮은 예산 포함
+            rng.choice([5000, 9000, 12000, 14999, 21000, 40000]),
+            rng.randint(1, DEPTH),
+        )
+
+
+async def recommend(query):
+    skin_type, concerns, cosmetic_type, budget, top_k = query
+    try:
+        recommendations = await cosmetic_recommend.recommend_cosmetics(
+            skin_type, concerns, cosmetic_type, [], budget, top_k
+        )
+    except HTTPException as e:
+        return e.status_code
+    return [
+        (
+            r.id,
+            r.skin_type_score,
+            r.concern_score,
+            r.rank_score,
+            r.price_score,
+            r.total_score,
+        )
+        for r in recommendations
+    ]
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_materialized_recommendations_match_full_path(seed, monkeypatch):
+    catalog = ProductCatalog(*synthetic_documents(seed))
+    monkeypatch.setattr(product_catalog, "_catalog", catalog)
+    materializer = RecommendationMaterializer(True, DEPTH, 2)
+    monkeypatch.setattr(cosmetic_recommend, "recommendation_materializer", materializer)
+    materializer.build(catalog)
+
+    async def run():
+        mismatches = []
+        for query in random_queries(seed, 150):
+            materializer.enabled = True
+            materialized = await recommend(query)
+            materializer.enabled = False
+            full = await recommend(query)
+            if materialized != full:
+                mismatches.append((query, materialized, full))
+        return mismatches
+
+    assert asyncio.run(run()) == []
+    # 사전 계산 경로를 실제로 탔는지 (예산이 최저가보다 낮은 경우 404 도 포함)
+    assert materializer.hits >= 100
@@ -0,0 +1,137 @@
+# tests/test_recommendation_reason.py
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from core.config import settings
+from services import recommendation_reason
+from services.recommendation_reason import ReasonGenerator
+from services.result_cache import reason_cache
+
+
+class StubOpenAI(BaseHTTPRequestHandler):
+    """chat.completions 를 흉내 내는 stub. 동시에 처리 중인 요청 수의 최댓값을 기록합니다."""
+
+    lock = threading.Lock()
+    in_flight = 0
+    max_in_flight = 0
+    calls = 0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        cls = type(self)
+        with cls.lock:
+            cls.calls += 1
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        time.sleep(0.2)
+        with cls.lock:
+            cls.in_flight -= 1
+
+        prompt = body["messages"][1]["content"]
+        name = next(line for line in prompt.splitlines() if "제품명" in line)
+        payload = json.dumps(
+            {
+                "id": "stub",
+                "object": "chat.completion",
+                "created": 0,
+                "model": body["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {
+                            "role": "assistant",
+                            "content": None,
+                            "function_call": {
+                                "name": "generate_recommendation_reason",
+                                "arguments": json.dumps(
+                                    {"reason": name.split(":")[1].strip()},
+                                    ensure_ascii=False,
+                                ),
+                            },
+                        },
+                    }
+                ],
+            }
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_openai(monkeypatch):
+    StubOpenAI.in_flight = StubOpenAI.max_in_flight = StubOpenAI.calls = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOpenAI)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(
+        settings, "openai_base_url", f"http://127.0.0.1:{server.server_port}/v1"
+    )
+    # 메모리 캐시만 사용 (MongoDB 에 접속하지 않음)
+    monkeypatch.setattr(reason_cache, "mongo_ttl_seconds", 0)
+    reason_cache.clear()
+    reason_cache.hits = reason_cache.misses = 0
+    yield StubOpenAI
+    server.shutdown()
+    reason_cache.clear()
+
+
+def generate(generator, name, concerns=("여드름", "모공")):
+    return generator.generate(
+        name,
+        "brand",
+        0.5,
+        0.5,
+        0.5,
+        0.5,
+        {"여드름": {"살리실릭애씨드": 1}},
+        "건성",
+        list(concerns),
+        product_id=f"id-{name}",
+    )
+
+
+def test_concurrency_is_capped_and_repeats_hit_cache(stub_openai):
+    async def run():
+        generator = ReasonGenerator(max_concurrency=2)
+        first = await asyncio.gather(*(generate(generator, f"p{i}") for i in range(6)))
+        # 고민 순서만 다른 같은 요청은 캐시에서
+        again = await asyncio.gather(
+            *(generate(generator, f"p{i}", ("모공", "여드름")) for i in range(6))
+        )
+        return generator, first, again
+
+    generator, first, again = asyncio.run(run())
+    assert first == [f"p{i}" for i in range(6)]
+    assert again == first
+    assert stub_openai.max_in_flight == 2
+    assert stub_openai.calls == 6
+    assert generator.requests == 6
+    assert reason_cache.hits == 6
+
+
+def test_cache_key_ignores_inference_settings(monkeypatch):
+    args = ("id", "건성", ["여드름", "모공"], {"여드름": {"a": 1}})
+    key = ReasonGenerator.cache_key(*args)
+    monkeypatch.setattr(settings, "inference_backend", "onnx")
+    monkeypatch.setattr(settings, "inference_quantization", "static")
+    monkeypatch.setattr(settings, "model_version", "other")
+    assert ReasonGenerator.cache_key(*args) == key
+    # 고민 순서는 무시하고, 모델/프롬프트 버전은 반영
+    assert ReasonGenerator.cache_key("id", "건성", ["모공", "여드름"], args[3]) == key
+    monkeypatch.setattr(settings, "openai_model", "other-model")
+    assert ReasonGenerator.cache_key(*args) != key
+    monkeypatch.undo()
+    monkeypatch.setattr(recommendation_reason, "PROMPT_VERSION", 99)
+    assert ReasonGenerator.cache_key(*args) != key
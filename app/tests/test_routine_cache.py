@@ -0,0 +1,87 @@
+# tests/test_routine_cache.py
+"""루틴 생성 캐시의 키 정규화(예산 버킷, 보유 화장품 순서/중복)와 복사본 격리를 확인합니다."""
+
+from schemas.routine import RoutineCreate, SubProductType
+from services.routine_cache import RoutineCache
+
+
+def make_routine(cost: int) -> RoutineCreate:
+    step = SubProductType(
+        name="토너",
+        usage_time=["morning", "evening"],
+        frequency=1,
+        instructions="화장솜에 적셔 닦아냅니다.",
+        sequence=2,
+        time=1,
+        cost=cost,
+    )
+    return RoutineCreate(morning_routine=[step], evening_routine=[step.model_copy()])
+
+
+def test_money_is_floored_to_bucket():
+    cache = RoutineCache(max_entries=8, money_bucket=1000)
+    assert cache.bucket(54_999) == 54_000
+    assert cache.bucket(54_000) == 54_000
+    assert cache.bucket(999) == 0
+    assert cache.make_key(20, cache.bucket(54_100), []) == cache.make_key(
+        20, cache.bucket(54_900), []
+    )
+    assert cache.make_key(20, cache.bucket(54_900), []) != cache.make_key(
+        20, cache.bucket(55_000), []
+    )
+
+
+def test_disabled_cache_keeps_exact_money():
+    cache = RoutineCache(max_entries=0, money_bucket=1000)
+    assert cache.bucket(54_321) == 54_321
+    cache.set(cache.make_key(20, 54_321, []), make_routine(100))
+    assert cache.get(cache.make_key(20, 54_321, [])) is None
+
+
+def test_owned_cosmetics_are_canonicalized():
+    key = RoutineCache.make_key(30, 50_000, ["토너", "선크림"])
+    # 순서, 중복, 루틴과 관계없는 이름은 키에 영향이 없음
+    assert RoutineCache.make_key(30, 50_000, ["선크림", "토너"]) == key
+    assert RoutineCache.make_key(30, 50_000, ["토너", "선크림", "토너"]) == key
+    assert RoutineCache.make_key(30, 50_000, ["선크림", "없는 제품", "토너"]) == key
+    assert RoutineCache.make_key(30, 50_000, ["토너"]) != key
+
+
+def test_cached_routine_is_isolated_from_callers():
+    cache = RoutineCache(max_entries=8, money_bucket=1000)
+    key = cache.make_key(20, 30_000, [])
+    routine = make_routine(5_000)
+    cache.set(key, routine)
+
+    # 저장 후 원본을 바꿔도 캐시는 그대로
+    routine.morning_routine[0].cost = 1
+    first = cache.get(key)
+    assert first.morning_routine[0].cost == 5_000
+
+    # 꺼낸 값을 바꿔도 다음 조회에는 영향 없음
+    first.morning_routine[0].cost = 2
+    first.evening_routine.clear()
+    second = cache.get(key)
+    assert second.morning_routine[0].cost == 5_000
+    assert len(second.evening_routine) == 1
+    assert second is not first
+
+
+def test_lru_eviction_and_clear():
+    cache = RoutineCache(max_entries=2, money_bucket=1000)
+    keys = [cache.make_key(minutes, 10_000, []) for minutes in (10, 20, 30)]
+    cache.set(keys[0], make_routine(1))
+    cache.set(keys[1], make_routine(2))
+    assert cache.get(keys[0]) is not None  # keys[1] 이 가장 오래된 항목이 됨
+    cache.set(keys[2], make_routine(3))
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]).morning_routine[0].cost == 1
+    assert cache.get(keys[2]).morning_routine[0].cost == 3
+
+    cache.clear()
+    assert cache.get(keys[0]) is None
+    stats = cache.stats()
+    assert stats["entries"] == 0
+    assert stats["invalidations"] == 1
+    assert stats["hits"] == 3 and stats["misses"] == 2
@@ -0,0 +1,61 @@
+# tests/test_routine_solver.py
+"""
+분기 한정법(exact_optimization_step)이 담금질(cost_optimization_step)보다 나쁜 해를 내지 않는지
+고정된 가격 구간과 시나리오에서 확인합니다.
+"""
+
+import math
+import random
+
+import pytest
+
+from benchmarks.routine_solver import synthetic_price_segments
+from services import routine_generate
+from services.routine_generate import (
+    PRIORITY_STEPS,
+    cost_optimization_step,
+    evaluate_solution,
+    exact_optimization_step,
+    generate_minimal_solution,
+    routine_optimization_step,
+)
+
+# (시간, 예산, 보유 화장품)
+SCENARIOS = [
+    (3, 5000, []),
+    (8, 20000, ["클렌징폼", "토너"]),
+    (10, 50000, []),
+    (15, 100000, ["선크림", "크림", "세럼", "클렌징오일"]),
+    (20, 200000, []),
+    (30, 50000, ["클렌징폼", "토너"]),
+]
+PRIORITY_WEIGHTS = {step: i + 1 for i, (step, _) in enumerate(PRIORITY_STEPS)}
+
+
+@pytest.fixture(params=[0, 1])
+def price_segments(request, monkeypatch):
+    monkeypatch.setattr(
+        routine_generate, "PRICE_SEGMENTS", synthetic_price_segments(request.param)
+    )
+    return request.param
+
+
+@pytest.mark.parametrize("time_minutes,money_won,owned", SCENARIOS)
+def test_exact_is_never_worse_than_anneal(
+    price_segments, time_minutes, money_won, owned
+):
+    random.seed(price_segments)
+    minimal = generate_minimal_solution(PRIORITY_STEPS, owned, time_minutes)
+    solution = routine_optimization_step(
+        minimal, PRIORITY_STEPS, time_minutes, money_won
+    )
+    args = (PRIORITY_STEPS, time_minutes, money_won, PRIORITY_WEIGHTS)
+
+    exact = evaluate_solution(exact_optimization_step(solution, *args), *args)
+    random.seed(price_segments)
+    anneal = evaluate_solution(cost_optimization_step(solution, *args), *args)
+
+    if math.isfinite(anneal):
+        assert math.isfinite(exact)
+    # exact 는 1원 미만의 가격 차이를 무시하므로 그 정도 점수 차이는 같은 것으로 봄
+    assert exact <= anneal + 0.01